@@ -8,10 +8,10 @@ import json
 import re
 import logging
 import csv
-import requests
 from werkzeug.utils import secure_filename
-from generate_ontology import generate_ontology_from_directory
+from output_formats import stream_ontology_file, ENGINE_FORMATS
 from sheets_integration import SheetsIntegration
+from generation_jobs import JobQueue, JobRunner, DEFAULT_WORKERS
 
 # Configure logging
 logging.basicConfig(
@@ -49,18 +49,40 @@ app.config['SPREADSHEET_ID'] = os.environ.get('SPREADSHEET_ID', '')
 app.config['BLAZEGRAPH_ENDPOINT'] = os.environ.get('BLAZEGRAPH_ENDPOINT', 'http://167.172.143.162:9999/blazegraph/namespace/kb/sparql')
 app.config['BLAZEGRAPH_ENABLED'] = True
 
-# Initialize Google Sheets integration
-sheets_integration = None
-try:
-    # Directly use the service account file that we know works
-    sheets_integration = SheetsIntegration(service_account_file='service_account.json')
-    if sheets_integration.is_initialized():
-        logger.info("Google Sheets integration initialized successfully!")
-        logger.info(f"Service account email: {sheets_integration.credentials.service_account_email}")
-    else:
-        logger.warning("Failed to initialize Google Sheets integration.")
-except Exception as e:
-    logger.error(f"Error initializing Google Sheets integration: {str(e)}")
+# Consistency check after generation: off, structural, hermit or pellet (needs Java)
+app.config['REASONING_MODE'] = os.environ.get('REASONING_MODE', 'hermit')
+app.config['REASONER_TIMEOUT'] = int(os.environ.get('REASONER_TIMEOUT', '300'))
+
+# Quadstore of the generator: "memory", or "sqlite" to keep large ontologies on disk
+app.config['WORLD_BACKEND'] = os.environ.get('WORLD_BACKEND', 'memory')
+app.config['QUADSTORE_CACHE_MB'] = int(os.environ.get('QUADSTORE_CACHE_MB', '64'))
+
+# Processes reading the CSV files in parallel; 0 uses one per CPU
+app.config['GENERATION_WORKERS'] = int(os.environ.get('GENERATION_WORKERS', '1')) or None
+
+# Generations run in the background; at most this many at a time per app process
+app.config['GENERATION_JOB_WORKERS'] = int(os.environ.get('GENERATION_JOB_WORKERS', str(DEFAULT_WORKERS)))
+
+# Canonical output: the same ontology is always written as the same bytes
+app.config['CANONICAL_OUTPUT'] = os.environ.get('CANONICAL_OUTPUT', 'false').lower() == 'true'
+
+# Check of the uploaded CSV files before generation: off, report (missing columns stop the run) or strict (any issue does)
+app.config['INPUT_VALIDATION'] = os.environ.get('INPUT_VALIDATION', 'report')
+
+# Default output format; the forms can pick another one
+app.config['OUTPUT_FORMAT'] = os.environ.get('OUTPUT_FORMAT', 'rdfxml')
+OUTPUT_FORMAT_LABELS = {
+    'rdfxml': 'RDF/XML (.owl)',
+    'ntriples': 'N-Triples (.nt)',
+    'turtle': 'Turtle (.ttl)',
+    'rdfxml-gzip': 'RDF/XML, gzip (.owl.gz)',
+    'ntriples-gzip': 'N-Triples, gzip (.nt.gz)',
+    'turtle-gzip': 'Turtle, gzip (.ttl.gz)',
+}
+
+# Google Sheets integration; the credentials are loaded and the client
+# authorized by the first request that uses it, not at import
+sheets_integration = SheetsIntegration(service_account_file='service_account.json')
 
 # Ensure upload and metadata directories exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -71,13 +93,13 @@ def import_to_blazegraph(ontology_path, title, version):
     import requests
     
     try:
-        # Read the ontology file
-        with open(ontology_path, 'rb') as f:
-            ontology_data = f.read()
+        # The ontology is streamed from its file (decompressed if needed) on
+        # each attempt, never read into memory as a whole
+        _, content_type = stream_ontology_file(ontology_path)
         
         # Define endpoint and headers
         endpoint = app.config['BLAZEGRAPH_ENDPOINT']
-        headers = {'Content-Type': 'application/rdf+xml'}
+        headers = {'Content-Type': content_type}
         
         # Create a safe graph URI with no spaces
         safe_title = ''.join(c if c.isalnum() else '_' for c in title)
@@ -106,11 +128,12 @@ def import_to_blazegraph(ontology_path, title, version):
         
         while retry_count < max_retries and not success:
             try:
+                ontology_chunks, _ = stream_ontology_file(ontology_path)
                 response = requests.post(
                     endpoint,
                     headers=headers,
                     params=params,
-                    data=ontology_data,
+                    data=ontology_chunks,
                     timeout=30
                 )
                 
@@ -152,12 +175,32 @@ def import_to_blazegraph(ontology_path, title, version):
 
 def check_blazegraph_status():
     """Check if Blazegraph is accessible."""
+    import requests
+
     try:
         response = requests.get(app.config['BLAZEGRAPH_ENDPOINT'], timeout=5)
         return response.status_code == 200
     except:
         return False
 
+def quadstore_settings():
+    """Return the world backend arguments for generate_ontology_from_directory."""
+    if app.config['WORLD_BACKEND'] == 'sqlite':
+        return {'world_backend': 'sqlite', 'quadstore': {'cache_mb': app.config['QUADSTORE_CACHE_MB']}}
+    return {'world_backend': app.config['WORLD_BACKEND']}
+
+def selected_output_format():
+    """Return the output format chosen in the submitted form, or the configured default."""
+    output_format = request.form.get('output_format', '').strip() or app.config['OUTPUT_FORMAT']
+    if output_format not in ENGINE_FORMATS['owlready2']:
+        flash(f'Unknown output format {output_format}, using {app.config["OUTPUT_FORMAT"]} instead.', 'warning')
+        output_format = app.config['OUTPUT_FORMAT']
+    return output_format
+
+def output_format_choices():
+    """Return the template arguments of the output format selector."""
+    return {'output_formats': OUTPUT_FORMAT_LABELS, 'default_output_format': app.config['OUTPUT_FORMAT']}
+
 def allowed_file(filename):
     """Check if the file has a valid extension"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() == 'csv'
@@ -226,11 +269,248 @@ def log_to_google_sheets(metadata):
         logger.error(f"Error logging to Google Sheets: {str(e)}")
         return False
 
+def generation_arguments(session_dir, ontology_name, output_format, progress):
+    """Return the arguments of generate_ontology_from_directory for a session."""
+    return dict(
+        directory_path=session_dir,
+        config_path=os.path.join(os.path.dirname(__file__), 'ontology_config.json'),
+        ontology_name=ontology_name,
+        output_format=output_format,
+        workers=app.config['GENERATION_WORKERS'],
+        canonical=app.config['CANONICAL_OUTPUT'],
+        validation=app.config['INPUT_VALIDATION'],
+        reasoning=app.config['REASONING_MODE'],
+        reasoner_timeout=app.config['REASONER_TIMEOUT'],
+        progress=lambda phase: progress(f"generation: {phase}"),
+        **quadstore_settings()
+    )
+
+def session_metadata(session_id, session_dir, ontology_file, ontology_name, input_files, generation_info):
+    """Return the metadata of a session whose ontology was generated."""
+    expiry_time = datetime.datetime.now() + datetime.timedelta(seconds=app.config['SESSION_EXPIRY'])
+    return {
+        'session_id': session_id,
+        'ontology_name': ontology_name,
+        'filename': ontology_file,
+        'file_size': os.path.getsize(os.path.join(session_dir, ontology_file)),
+        'uploaded_files': input_files,
+        'creation_time': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'expiry_time': expiry_time.strftime('%Y-%m-%d %H:%M:%S'),
+        'status': 'Success',
+        'output_format': generation_info.get('output_format'),
+        'consistency': generation_info.get('consistency'),
+        'validation': generation_info.get('validation'),
+        'profile': generation_info.get('profile'),
+        'content_hash': generation_info.get('content_hash'),
+        'blazegraph_import': 'Not attempted',
+        'blazegraph_message': '',
+        'graph_uri': ''
+    }
+
+def run_upload_job(session_id, payload, progress):
+    """Generate the ontology of uploaded CSV files (a background job, see generation_jobs)."""
+    from generate_ontology import generate_ontology_from_directory
+    session_dir = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
+    ontology_name = payload['ontology_name']
+    try:
+        logger.info(f"Generating ontology {ontology_name} for session {session_id}")
+        generation_info = {}
+        ontology_file = generate_ontology_from_directory(
+            metadata=generation_info,
+            **generation_arguments(session_dir, ontology_name, payload['output_format'], progress)
+        )
+        metadata = session_metadata(session_id, session_dir, ontology_file, ontology_name,
+                                    payload['uploaded_files'], generation_info)
+    except Exception:
+        # Clean up the session directory if an error occurs
+        shutil.rmtree(session_dir, ignore_errors=True)
+        raise
+
+    # Import to Blazegraph if enabled
+    if app.config['BLAZEGRAPH_ENABLED']:
+        progress("blazegraph import")
+        logger.info("Attempting to import ontology to Blazegraph...")
+        success, message, uri = import_to_blazegraph(
+            os.path.join(session_dir, ontology_file),
+            ontology_name,
+            datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        )
+        metadata['blazegraph_import'] = "Success" if success else "Failed"
+        metadata['blazegraph_message'] = message
+        metadata['graph_uri'] = uri or ""
+
+    save_metadata(session_id, metadata)
+
+    # Log to Google Sheets if enabled
+    if app.config['USE_GOOGLE_SHEETS']:
+        progress("sheets logging")
+        if log_to_google_sheets(metadata):
+            logger.info(f"Successfully logged to Google Sheets: {session_id}")
+        else:
+            logger.warning(f"Failed to log to Google Sheets: {session_id}")
+
+    logger.info(f"Ontology generated successfully: {ontology_file} ({metadata['file_size']} bytes)")
+    return {'generated': True, 'filename': ontology_file}
+
+def run_sheets_job(session_id, payload, progress):
+    """Generate the ontology of a Google Sheets spreadsheet (a background job, see generation_jobs)."""
+    from generate_ontology import generate_ontology_from_directory
+    if not sheets_integration.is_initialized():
+        raise RuntimeError('Google Sheets integration is not enabled or properly configured.')
+
+    progress("opening spreadsheet")
+    if payload.get('spreadsheet_id'):
+        spreadsheet = sheets_integration.open_spreadsheet(spreadsheet_id=payload['spreadsheet_id'])
+    else:
+        spreadsheet = sheets_integration.open_spreadsheet(spreadsheet_name=payload['spreadsheet_name'])
+
+    # Check for changes before processing. The check updates the saved state
+    # of the spreadsheet, so its result is kept with the session for a retry
+    # of an interrupted job
+    session_dir = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
+    os.makedirs(session_dir, exist_ok=True)
+    changes_path = os.path.join(session_dir, 'changes.json')
+    if os.path.exists(changes_path):
+        with open(changes_path, 'r') as f:
+            has_changes, change_info = json.load(f)
+    else:
+        progress("checking changes")
+        has_changes, change_info = check_spreadsheet_changes(spreadsheet)
+        with open(changes_path, 'w') as f:
+            json.dump([has_changes, change_info], f)
+    if not has_changes and not payload.get('force_generation'):
+        shutil.rmtree(session_dir, ignore_errors=True)
+        return {'generated': False,
+                'message': 'No changes detected in the spreadsheet since last generation. '
+                           'Use "Force Generation" to proceed anyway.'}
+
+    try:
+        progress("fetching worksheets")
+        available_worksheets = [worksheet.title for worksheet in spreadsheet.worksheets()]
+        logger.info(f"Found {len(available_worksheets)} worksheets: {', '.join(available_worksheets)}")
+
+        files_imported = []
+
+        # Process each available worksheet
+        for sheet_name in available_worksheets:
+            try:
+                # Try to get the data
+                data = sheets_integration.get_worksheet_data(spreadsheet, worksheet_name=sheet_name)
+
+                if data:
+                    # Write to CSV file
+                    csv_path = os.path.join(session_dir, f"{sheet_name}.csv")
+                    with open(csv_path, 'w', newline='') as f:
+                        writer = csv.DictWriter(f, fieldnames=data[0].keys())
+                        writer.writeheader()
+                        writer.writerows(data)
+
+                    files_imported.append(f"{sheet_name}.csv")
+                    logger.info(f"Imported {sheet_name} from Google Sheets with {len(data)} rows")
+            except Exception as e:
+                logger.warning(f"Could not import {sheet_name} from Google Sheets: {str(e)}")
+
+        if not files_imported:
+            raise ValueError('No valid data could be imported from Google Sheets. Please make sure your '
+                             'spreadsheet contains at least one worksheet with data.')
+
+        ontology_name = payload['ontology_name']
+        logger.info(f"Generating ontology {ontology_name} for session {session_id} from Google Sheets data")
+        generation_info = {}
+        ontology_file = generate_ontology_from_directory(
+            metadata=generation_info,
+            **generation_arguments(session_dir, ontology_name, payload['output_format'], progress)
+        )
+        metadata = session_metadata(session_id, session_dir, ontology_file, ontology_name,
+                                    files_imported, generation_info)
+    except Exception:
+        # Clean up the session directory
+        shutil.rmtree(session_dir, ignore_errors=True)
+        raise
+
+    # Get current version
+    current_metadata = sheets_integration.get_spreadsheet_metadata(spreadsheet)
+    current_version = current_metadata.get('version_info', {}).get('version', '1.0.0')
+    metadata.update({
+        'source': 'google_sheets',
+        'spreadsheet_name': spreadsheet.title,
+        'spreadsheet_id': spreadsheet.id,
+        'version': current_version,
+        'changes_detected': has_changes,
+        'change_info': change_info
+    })
+
+    # Import to Blazegraph if enabled
+    if app.config['BLAZEGRAPH_ENABLED']:
+        progress("blazegraph import")
+        logger.info("Attempting to import ontology to Blazegraph...")
+        success, message, uri = import_to_blazegraph(
+            os.path.join(session_dir, ontology_file),
+            spreadsheet.title,
+            current_version
+        )
+        metadata['blazegraph_import'] = "Success" if success else "Failed"
+        metadata['blazegraph_message'] = message
+        metadata['graph_uri'] = uri or ""
+
+        # Update version if import was successful and changes were detected
+        if success and has_changes and app.config['USE_GOOGLE_SHEETS']:
+            progress("version update")
+            try:
+                new_version = increment_version(current_version)
+                sheets_integration.update_spreadsheet_version(
+                    spreadsheet=spreadsheet,
+                    new_version=new_version,
+                    modified_by="Ontology Generator",
+                    changelog=f"Generated ontology with {len(files_imported)} worksheets. Changes: {change_info}"
+                )
+                metadata['version'] = new_version
+                logger.info(f"Updated spreadsheet version from {current_version} to {new_version}")
+            except Exception as version_error:
+                logger.error(f"Error updating version: {version_error}")
+
+    save_metadata(session_id, metadata)
+
+    # Log to Google Sheets
+    progress("sheets logging")
+    log_to_google_sheets(metadata)
+
+    logger.info(f"Ontology generated successfully from Google Sheets: {ontology_file} ({metadata['file_size']} bytes)")
+    return {'generated': True, 'filename': ontology_file}
+
+# Background generation jobs, kept in a SQLite queue next to the session
+# metadata so queued and interrupted jobs are picked up again after a restart
+job_queue = JobQueue(os.path.join(app.config['METADATA_DIR'], 'jobs.sqlite3'))
+job_runner = JobRunner(job_queue, {'upload': run_upload_job, 'sheets': run_sheets_job},
+                       workers=app.config['GENERATION_JOB_WORKERS'])
+
+@app.before_request
+def start_job_runner():
+    """Start the generation job workers with the first request of this process."""
+    job_runner.start()
+
+def enqueue_generation(session_id, kind, payload):
+    """Queue a generation job and answer with where to follow it."""
+    job = job_queue.enqueue(session_id, kind, payload)
+    job_runner.notify()
+    logger.info(f"Queued {kind} job {session_id} (position {job['position']})")
+    status_url = url_for('check_status', session_id=session_id)
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        return jsonify({'job_id': session_id, 'status': job['status'], 'position': job['position'],
+                        'status_url': status_url}), 202
+    return render_template('job_status.html', session_id=session_id, status_url=status_url,
+                           result_url=url_for('job_result', session_id=session_id),
+                           back_url=url_for('import_from_sheets' if kind == 'sheets' else 'index')), 202
+
+def format_job_time(timestamp):
+    """Format a job timestamp (epoch seconds) like the session metadata times."""
+    return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else None
+
 @app.route('/')
 def index():
     """Render the main page."""
     blazegraph_status = check_blazegraph_status() if app.config['BLAZEGRAPH_ENABLED'] else False
-    return render_template('index.html', blazegraph_status=blazegraph_status)
+    return render_template('index.html', blazegraph_status=blazegraph_status, **output_format_choices())
 
 @app.route('/blazegraph-status')
 def blazegraph_status():
@@ -273,7 +553,7 @@ def sheets_status():
 
 @app.route('/upload', methods=['POST'])
 def upload_files():
-    """Handle file uploads and ontology generation."""
+    """Save the uploaded files and queue the generation of their ontology."""
     if request.method == 'POST':
         try:
             # Create a unique directory for this session
@@ -300,6 +580,7 @@ def upload_files():
                     uploaded_file_names.append(filename) 
 
             if not files_uploaded:
+                shutil.rmtree(session_dir, ignore_errors=True)
                 flash("No files were uploaded. Please select at least one CSV file.", 'error')
                 return redirect(url_for('index'))
 
@@ -311,89 +592,12 @@ def upload_files():
             # Sanitize ontology name
             ontology_name = sanitize_filename(ontology_name)
 
-            # Generate the ontology
-            try:
-                logger.info(f"Generating ontology {ontology_name} for session {session_id}")
-                ontology_file = generate_ontology_from_directory(
-                    session_dir,
-                    config_path=os.path.join(os.path.dirname(__file__), 'ontology_config.json'),
-                    ontology_name=ontology_name
-                )
-
-                # Store the path for download
-                download_path = os.path.join(session_dir, ontology_file)
-
-                # Calculate file size
-                file_size = os.path.getsize(download_path)
-
-                # Save metadata about the ontology generation
-                expiry_time = datetime.datetime.now() + datetime.timedelta(seconds=app.config['SESSION_EXPIRY'])
-
-                metadata = {
-                    'session_id': session_id,
-                    'ontology_name': ontology_name,
-                    'filename': ontology_file,
-                    'file_size': file_size,
-                    'uploaded_files': uploaded_file_names,
-                    'creation_time': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'expiry_time': expiry_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    'status': 'Success'
-                }
-
-                # Import to Blazegraph if enabled
-                blazegraph_import_status = "Not attempted"
-                blazegraph_message = ""
-                graph_uri = ""
-                
-                if app.config['BLAZEGRAPH_ENABLED']:
-                    logger.info("Attempting to import ontology to Blazegraph...")
-                    success, message, uri = import_to_blazegraph(
-                        download_path, 
-                        ontology_name,
-                        datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-                    )
-                    blazegraph_import_status = "Success" if success else "Failed"
-                    blazegraph_message = message
-                    graph_uri = uri or ""
-                    
-                    metadata['blazegraph_import'] = blazegraph_import_status
-                    metadata['blazegraph_message'] = blazegraph_message
-                    metadata['graph_uri'] = graph_uri
-
-                save_metadata(session_id, metadata)
-
-                # Log to Google Sheets if enabled
-                if app.config['USE_GOOGLE_SHEETS']:
-                    sheets_logged = log_to_google_sheets(metadata)
-                    if sheets_logged:
-                        logger.info(f"Successfully logged to Google Sheets: {session_id}")
-                    else:
-                        logger.warning(f"Failed to log to Google Sheets: {session_id}")
-
-                logger.info(f"Ontology generated successfully: {ontology_file} ({file_size} bytes)")
-
-                return render_template('success.html',
-                                       session_id=session_id,
-                                       filename=ontology_file,
-                                       file_size=file_size,
-                                       file_count=len(uploaded_file_names),
-                                       creation_time=datetime.datetime.now().strftime('%H:%M'),
-                                       expiry_minutes=app.config['SESSION_EXPIRY'] // 60,
-                                       sheets_logging=app.config['USE_GOOGLE_SHEETS'],
-                                       blazegraph_enabled=app.config['BLAZEGRAPH_ENABLED'],
-                                       blazegraph_status=blazegraph_import_status,
-                                       blazegraph_message=blazegraph_message,
-                                       graph_uri=graph_uri)
-
-            except Exception as e:
-                logger.error(f"Error generating ontology: {str(e)}", exc_info=True)
-                flash(f'Error generating ontology: {str(e)}', 'error')
-                # Clean up the session directory if an error occurs
-                try:
-                    shutil.rmtree(session_dir)
-                except Exception as cleanup_error:
-                    logger.error(f"Error cleaning up session directory: {str(cleanup_error)}")
-                return redirect(url_for('index'))
+            # The generation runs in the background (see run_upload_job)
+            return enqueue_generation(session_id, 'upload', {
+                'ontology_name': ontology_name,
+                'output_format': selected_output_format(),
+                'uploaded_files': uploaded_file_names
+            })
 
         except Exception as e:
             logger.error(f"Unexpected error in upload process: {str(e)}", exc_info=True)
@@ -434,8 +638,8 @@ def download(session_id, filename):
         # Log the download
         logger.info(f"File download: {session_id}/{filename}")
 
-        # Serve the file
-        return send_file(path, as_attachment=True)
+        # Serve the file; canonical output is tagged with its content hash
+        return send_file(path, as_attachment=True, etag=(metadata or {}).get('content_hash') or True)
     except Exception as e:
         logger.error(f"Error downloading file: {str(e)}", exc_info=True)
         flash(f'Error downloading file: {str(e)}', 'error')
@@ -451,7 +655,7 @@ def import_from_sheets():
     if request.method == 'GET':
         # Render the import form
         blazegraph_status = check_blazegraph_status() if app.config['BLAZEGRAPH_ENABLED'] else False
-        return render_template('import_sheets.html', blazegraph_status=blazegraph_status)
+        return render_template('import_sheets.html', blazegraph_status=blazegraph_status, **output_format_choices())
 
     elif request.method == 'POST':
         try:
@@ -463,58 +667,6 @@ def import_from_sheets():
                 flash('Please provide either a spreadsheet ID or name.', 'error')
                 return redirect(url_for('import_from_sheets'))
 
-            # Open the spreadsheet
-            try:
-                if spreadsheet_id:
-                    spreadsheet = sheets_integration.open_spreadsheet(spreadsheet_id=spreadsheet_id)
-                else:
-                    spreadsheet = sheets_integration.open_spreadsheet(spreadsheet_name=spreadsheet_name)
-            except Exception as e:
-                flash(f'Error opening spreadsheet: {str(e)}', 'error') 
-                return redirect(url_for('import_from_sheets'))
-
-            # Check for changes before processing
-            has_changes, change_info = check_spreadsheet_changes(spreadsheet)
-            if not has_changes and not request.form.get('force_generation'):
-                flash('No changes detected in the spreadsheet since last generation. Use "Force Generation" to proceed anyway.', 'info')
-                return redirect(url_for('import_from_sheets'))
-
-            # Create a unique session directory
-            session_id = str(uuid.uuid4())
-            session_dir = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
-            os.makedirs(session_dir, exist_ok=True)
-
-            # Get all available worksheets
-            available_worksheets = [worksheet.title for worksheet in spreadsheet.worksheets()]
-            logger.info(f"Found {len(available_worksheets)} worksheets: {', '.join(available_worksheets)}")
-
-            files_imported = []
-
-            # Process each available worksheet
-            for sheet_name in available_worksheets:
-                try:
-                    # Try to get the data
-                    data = sheets_integration.get_worksheet_data(spreadsheet, worksheet_name=sheet_name)
-
-                    if data:
-                        # Write to CSV file
-                        csv_path = os.path.join(session_dir, f"{sheet_name}.csv")
-                        with open(csv_path, 'w', newline='') as f:
-                            writer = csv.DictWriter(f, fieldnames=data[0].keys())
-                            writer.writeheader()
-                            writer.writerows(data)
-
-                        files_imported.append(f"{sheet_name}.csv")
-                        logger.info(f"Imported {sheet_name} from Google Sheets with {len(data)} rows")
-                except Exception as e:
-                    logger.warning(f"Could not import {sheet_name} from Google Sheets: {str(e)}")            
-            
-            if not files_imported:
-                flash('No valid data could be imported from Google Sheets. Please make sure your spreadsheet contains at least one worksheet with data.', 'error')
-                # Clean up the session directory
-                shutil.rmtree(session_dir)
-                return redirect(url_for('import_from_sheets'))
-
             # Get ontology name
             ontology_name = request.form.get('ontology_name', '').strip()
             if not ontology_name:
@@ -523,108 +675,16 @@ def import_from_sheets():
             # Sanitize ontology name
             ontology_name = sanitize_filename(ontology_name)
 
-            # Generate the ontology
-            try:
-                logger.info(f"Generating ontology {ontology_name} for session {session_id} from Google Sheets data")
-                ontology_file = generate_ontology_from_directory(
-                    session_dir,
-                    config_path=os.path.join(os.path.dirname(__file__), 'ontology_config.json'),
-                    ontology_name=ontology_name
-                )    
-
-                # Store the path for download
-                download_path = os.path.join(session_dir, ontology_file)
-
-                # Calculate file size
-                file_size = os.path.getsize(download_path)
-
-                # Save metadata
-                expiry_time = datetime.datetime.now() + datetime.timedelta(seconds=app.config['SESSION_EXPIRY'])
-
-                # Get current version
-                current_metadata = sheets_integration.get_spreadsheet_metadata(spreadsheet)
-                current_version = current_metadata.get('version_info', {}).get('version', '1.0.0')
-
-                metadata = {
-                    'session_id': session_id,
-                    'ontology_name': ontology_name,
-                    'filename': ontology_file,
-                    'file_size': file_size,
-                    'uploaded_files': files_imported,
-                    'source': 'google_sheets',
-                    'spreadsheet_name': spreadsheet.title,
-                    'spreadsheet_id': spreadsheet.id,
-                    'creation_time': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'expiry_time': expiry_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    'status': 'Success',
-                    'version': current_version,
-                    'changes_detected': has_changes,
-                    'change_info': change_info
-                }
-
-                # Import to Blazegraph if enabled
-                blazegraph_import_status = "Not attempted"
-                blazegraph_message = ""
-                graph_uri = ""
-                
-                if app.config['BLAZEGRAPH_ENABLED']:
-                    logger.info("Attempting to import ontology to Blazegraph...")
-                    success, message, uri = import_to_blazegraph(
-                        download_path, 
-                        spreadsheet.title,
-                        current_version
-                    )
-                    blazegraph_import_status = "Success" if success else "Failed"
-                    blazegraph_message = message
-                    graph_uri = uri or ""
-                    
-                    metadata['blazegraph_import'] = blazegraph_import_status
-                    metadata['blazegraph_message'] = blazegraph_message
-                    metadata['graph_uri'] = graph_uri
-
-                    # Update version if import was successful and changes were detected
-                    if success and has_changes and app.config['USE_GOOGLE_SHEETS']:
-                        try:
-                            new_version = increment_version(current_version)
-                            sheets_integration.update_spreadsheet_version(
-                                spreadsheet=spreadsheet,
-                                new_version=new_version,
-                                modified_by="Ontology Generator",
-                                changelog=f"Generated ontology with {len(files_imported)} worksheets. Changes: {change_info}"
-                            )
-                            metadata['version'] = new_version
-                            logger.info(f"Updated spreadsheet version from {current_version} to {new_version}")
-                        except Exception as version_error:
-                            logger.error(f"Error updating version: {version_error}")
-
-                save_metadata(session_id, metadata)
-
-                # Log to Google Sheets
-                log_to_google_sheets(metadata)
-
-                logger.info(f"Ontology generated successfully from Google Sheets: {ontology_file} ({file_size} bytes)")
-
-                return render_template('success.html',
-                                       session_id=session_id,
-                                       filename=ontology_file,
-                                       file_size=file_size,
-                                       file_count=len(files_imported),
-                                       creation_time=datetime.datetime.now().strftime('%H:%M'),
-                                       expiry_minutes=app.config['SESSION_EXPIRY'] // 60,
-                                       source='Google Sheets',
-                                       sheets_logging=True,
-                                       blazegraph_enabled=app.config['BLAZEGRAPH_ENABLED'],
-                                       blazegraph_status=blazegraph_import_status,
-                                       blazegraph_message=blazegraph_message,
-                                       graph_uri=graph_uri)
-            
-            except Exception as e:
-                logger.error(f"Error generating ontology from Google Sheets: {str(e)}", exc_info=True)
-                flash(f'Error generating ontology: {str(e)}', 'error')
-                # Clean up the session directory
-                shutil.rmtree(session_dir)
-                return redirect(url_for('import_from_sheets'))
-                
+            # Opening the spreadsheet, the change check and the generation run
+            # in the background (see run_sheets_job)
+            return enqueue_generation(str(uuid.uuid4()), 'sheets', {
+                'spreadsheet_id': spreadsheet_id,
+                'spreadsheet_name': spreadsheet_name,
+                'ontology_name': ontology_name,
+                'output_format': selected_output_format(),
+                'force_generation': bool(request.form.get('force_generation'))
+            })
+
         except Exception as e:
             logger.error(f"Unexpected error in Google Sheets import: {str(e)}", exc_info=True)
             flash(f'An unexpected error occurred: {str(e)}', 'error')
@@ -712,7 +772,40 @@ def increment_version(version_str):
 
 @app.route('/status/<session_id>')
 def check_status(session_id):
-    """API endpoint to check the status of a session."""
+    """
+    API endpoint to check the status of a session.
+
+    While its generation job is queued or running, the status is "queued"
+    (with the position in the queue) or "running" (with the phase it is in);
+    a failed job reports "failed" and its error. Once the ontology is
+    generated the status is "done", until the session expires.
+    """
+    job = job_queue.get(session_id)
+    if job and job['status'] != 'done':
+        status = {
+            'status': job['status'],
+            'job_id': job['id'],
+            'queued_at': format_job_time(job['created']),
+            'started_at': format_job_time(job['started']),
+            'time_remaining': 0
+        }
+        if job['status'] == 'queued':
+            status['position'] = job['position']
+        elif job['status'] == 'running':
+            status['phase'] = job['phase']
+        else:
+            status['error'] = job['error']
+        return jsonify(status)
+    if job and not job['result'].get('generated'):
+        # A spreadsheet without changes since its last generation
+        return jsonify({
+            'status': 'done',
+            'job_id': job['id'],
+            'generated': False,
+            'message': job['result'].get('message'),
+            'time_remaining': 0
+        })
+
     metadata = load_metadata(session_id)
     if metadata:
         # Calculate time remaining
@@ -725,13 +818,15 @@ def check_status(session_id):
                 time_remaining = int((expiry_time - now).total_seconds())
 
             return jsonify({
-                'status': 'active',
+                'status': 'done' if time_remaining else 'expired',
+                'generated': True,
                 'time_remaining': time_remaining,
                 'filename': metadata.get('filename'),
                 'file_size': metadata.get('file_size', 0),
                 'source': metadata.get('source', 'upload'),
                 'blazegraph_import': metadata.get('blazegraph_import', 'N/A'),
-                'graph_uri': metadata.get('graph_uri', '')
+                'graph_uri': metadata.get('graph_uri', ''),
+                'result_url': url_for('job_result', session_id=session_id)
             })                    
         except (KeyError, ValueError) as e:
             logger.error(f"Error calculating time remaining for session {session_id}: {str(e)}")
@@ -741,6 +836,38 @@ def check_status(session_id):
         'time_remaining': 0
     })
 
+@app.route('/result/<session_id>')
+def job_result(session_id):
+    """Show the generated ontology of a finished session."""
+    metadata = load_metadata(session_id)
+    if not metadata:
+        job = job_queue.get(session_id)
+        if job and job['status'] in ('queued', 'running'):
+            flash('The ontology is still being generated.', 'info')
+        elif job and job['status'] == 'failed':
+            flash(f'Error generating ontology: {job["error"]}', 'error')
+        elif job and job['result']:
+            flash(job['result'].get('message', 'No ontology was generated.'), 'info')
+        else:
+            flash('This session has expired or does not exist.', 'warning')
+        return redirect(url_for('import_from_sheets' if job and job['kind'] == 'sheets' else 'index'))
+
+    from_sheets = metadata.get('source') == 'google_sheets'
+    creation_time = datetime.datetime.strptime(metadata['creation_time'], '%Y-%m-%d %H:%M:%S')
+    return render_template('success.html',
+                           session_id=session_id,
+                           filename=metadata['filename'],
+                           file_size=metadata['file_size'],
+                           file_count=len(metadata.get('uploaded_files', [])),
+                           creation_time=creation_time.strftime('%H:%M'),
+                           expiry_minutes=app.config['SESSION_EXPIRY'] // 60,
+                           source='Google Sheets' if from_sheets else None,
+                           sheets_logging=app.config['USE_GOOGLE_SHEETS'],
+                           blazegraph_enabled=app.config['BLAZEGRAPH_ENABLED'],
+                           blazegraph_status=metadata.get('blazegraph_import', 'Not attempted'),
+                           blazegraph_message=metadata.get('blazegraph_message', ''),
+                           graph_uri=metadata.get('graph_uri', ''))
+
 @app.route('/cleanup', methods=['POST'])
 def cleanup():
     """Scheduled task to clean up expired files."""
@@ -767,8 +894,11 @@ def cleanup():
                 except Exception as e:
                     logger.error(f"Error cleaning up directory {dir_path}: {str(e)}")
 
-    logger.info(f"Cleanup complete. Removed {cleanup_count} expired sessions.")
-    return f"Cleanup complete. Removed {cleanup_count} expired sessions.", 200
+    # Forget finished generation jobs of the expired sessions
+    job_count = job_queue.delete_finished(app.config['SESSION_EXPIRY'])
+
+    logger.info(f"Cleanup complete. Removed {cleanup_count} expired sessions and {job_count} finished jobs.")
+    return f"Cleanup complete. Removed {cleanup_count} expired sessions and {job_count} finished jobs.", 200
 
 @app.errorhandler(413)
 def request_entity_too_large(error):
@@ -1056,17 +1186,7 @@ if not os.path.exists('service_account.json'):
     print("WARNING: service_account.json not found. Google Sheets integration will not work.")
     print("Please follow the Google Sheets API Setup Guide to create your service account.")
 else:
-    print("Found service_account.json - Initializing Google Sheets integration")
-    try:
-        # Re-initialize sheets integration
-        sheets_integration = SheetsIntegration(service_account_file='service_account.json')
-        if sheets_integration.is_initialized():
-            print("Google Sheets integration initialized successfully!")
-            print(f"Service account email: {sheets_integration.credentials.service_account_email}")
-        else:
-            print("Failed to initialize Google Sheets integration. Check service_account.json.")
-    except Exception as e:
-        print(f"Error initializing Google Sheets integration: {str(e)}")   
+    print("Found service_account.json - Google Sheets integration is initialized on first use")
 
 
 if __name__ == '__main__':
@@ -1079,4 +1199,7 @@ if __name__ == '__main__':
     print(f"Blazegraph endpoint: {app.config['BLAZEGRAPH_ENDPOINT']}")
     print(f"Google Sheets: {'Enabled' if app.config['USE_GOOGLE_SHEETS'] else 'Disabled'}")
     print(f"{'='*50}\n")
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # The serving process of the reloader: resume the queued jobs right away
+        job_runner.start()
     app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
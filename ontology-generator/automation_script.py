@@ -19,15 +19,20 @@ import json
 import hashlib
 import argparse
 import datetime
-import requests
 import logging
 import tempfile
+import io
+import glob
 import shutil
+import itertools
+from contextlib import ExitStack
 from pathlib import Path
 
 # Import required modules from your application
 from sheets_integration import SheetsIntegration
-from generate_ontology import generate_ontology_from_directory
+from output_formats import output_extension, stream_ontology_file
+from ontology_diff import diff_ontologies, format_diff_summary, sparql_update_requests
+from ontology_triples import load_shard_manifest
 
 # Configure logging
 logging.basicConfig(
@@ -49,6 +54,7 @@ CONFIG = {
     "blazegraph_endpoint": "http://localhost:9999/blazegraph/namespace/biodiversity/sparql",
     'ontology_output_dir': 'generated_ontologies',
     'blazegraph_update_auth': None,  # Set if Blazegraph requires authentication
+    'blazegraph_incremental': False,  # Build the new graph from the previous one and the triple diff
     'notify_email': None,  # Set to enable email notifications
     'smtp_server': None,  # For email notifications
     'smtp_port': 587,  # For email notifications
@@ -58,6 +64,18 @@ CONFIG = {
     'history_dir': 'ontology_history',
     'auto_update_version': True,  # Automatically update spreadsheet version
     'version_update_user': 'Automation System',  # User who makes version updates
+    'ontology_engine': 'owlready2',  # "triples" writes N-Triples directly and can reuse cached fragments
+    'fragment_cache_dir': 'fragment_cache',  # Per-worksheet fragment cache used by the triples engine
+    'reasoning_mode': 'hermit',  # Consistency check: off, structural, hermit or pellet
+    'reasoner_timeout': 300,  # Wall-clock budget of a HermiT/Pellet run (in seconds)
+    'world_backend': 'memory',  # "sqlite" keeps the owlready2 quadstore on disk for large sheets
+    'quadstore_cache_mb': 64,  # SQLite page cache of the disk-backed quadstore
+    'output_format': None,  # rdfxml, ntriples or turtle, optionally with "-gzip"; None uses the engine's default
+    'generation_workers': 1,  # processes reading the CSV files in parallel; null uses one per CPU
+    'canonical_output': False,  # byte-stable output; unchanged regenerations and history duplicates are skipped
+    'input_validation': 'report',  # check the worksheets first: off, report (missing columns skip the spreadsheet) or strict (any issue does)
+    'name_table_dir': 'name_tables',  # per-spreadsheet entity names, kept stable between runs; None mints them afresh
+    'sharded_output': False,  # needs the triples engine and N-Triples or Turtle output: one file and named graph per worksheet; only changed shards are reloaded
 }
 
 def load_config_file(config_path):
@@ -83,6 +101,26 @@ def calculate_checksum(data):
         data_str = str(data)
     return hashlib.md5(data_str.encode()).hexdigest()
 
+class TeeWriter(io.RawIOBase):
+    """Binary stream that writes everything to several files at once."""
+
+    def __init__(self, files):
+        self.files = files
+        # The Java reasoners check the file named by the stream
+        self.name = files[0].name
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        for f in self.files:
+            f.write(data)
+        return len(data)
+
+    def flush(self):
+        for f in self.files:
+            f.flush()
+
 def get_last_processed_state(spreadsheet_id):
     """Get the last processed state for a spreadsheet."""
     state_file = f"state_{spreadsheet_id}.json"
@@ -94,13 +132,24 @@ def get_last_processed_state(spreadsheet_id):
             logger.warning(f"Could not read state file: {e}")
     return {"last_checksum": None, "last_processed": None, "version": None}
 
-def save_processed_state(spreadsheet_id, checksum, version):
-    """Save the processed state for a spreadsheet."""
+def save_processed_state(spreadsheet_id, checksum, version, profile=None, diff=None, graph_uri=None,
+                         content_hash=None, shards=None):
+    """
+    Save the processed state for a spreadsheet, with the profile, triple diff
+    summary and content hash (canonical output only) of its last generation
+    and the Blazegraph graph it was imported into, or for sharded output the
+    SHA-256 of each shard loaded into its graph.
+    """
     state_file = f"state_{spreadsheet_id}.json"
     state = {
         "last_checksum": checksum,
         "last_processed": datetime.datetime.now().isoformat(),
-        "version": version
+        "version": version,
+        "last_profile": profile,
+        "last_diff": diff,
+        "graph_uri": graph_uri,
+        "content_hash": content_hash,
+        "shards": shards
     }
     try:
         with open(state_file, 'w') as f:
@@ -109,6 +158,40 @@ def save_processed_state(spreadsheet_id, checksum, version):
     except Exception as e:
         logger.error(f"Error saving state: {e}")
 
+def publish_shards(shard_dir, target_dir, history_dir=None):
+    """
+    Move a newly generated shard directory over the previous one, keeping a
+    copy in the history if ``history_dir`` is given.
+    """
+    if history_dir:
+        shutil.copytree(shard_dir, history_dir)
+    previous_dir = f"{target_dir}.previous"
+    if os.path.exists(target_dir):
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        os.replace(target_dir, previous_dir)
+    shutil.move(shard_dir, target_dir)
+    shutil.rmtree(previous_dir, ignore_errors=True)
+
+def diff_previous_ontology(previous_path, new_path, work_dir):
+    """
+    Compare a new ontology with the previous one, triple by triple.
+
+    Returns:
+        dict: "summary" (see ontology_diff.diff_ontologies) and the N-Triples
+        files of the "added" and "removed" triples in ``work_dir``, or None
+        if there is no previous ontology or it cannot be compared.
+    """
+    if not os.path.exists(previous_path):
+        return None
+    diff = {"added": os.path.join(work_dir, "added.nt"), "removed": os.path.join(work_dir, "removed.nt")}
+    try:
+        diff["summary"] = diff_ontologies(previous_path, new_path, added=diff["added"], removed=diff["removed"])
+    except Exception as e:
+        logger.warning(f"Could not compare with the previous ontology: {e}")
+        return None
+    logger.info(f"Changes since the previous ontology: {format_diff_summary(diff['summary'])}")
+    return diff
+
 def get_spreadsheet_data(sheets_integration, spreadsheet_id=None, spreadsheet_name=None):
     """Get the data and metadata from a spreadsheet."""
     try:
@@ -209,8 +292,10 @@ def process_spreadsheet(sheets_integration, spreadsheet_id=None, spreadsheet_nam
             logger.warning(f"No valid data found in spreadsheet {spreadsheet_data['title']}")
             return False
         
-        # Generate ontology
+        # Generate ontology; owlready2 is only loaded once a spreadsheet changed
         try:
+            from generate_ontology import generate_ontology_from_directory
+
             # Make a safe filename from the spreadsheet title
             safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in spreadsheet_data["title"])
             ontology_name = f"{safe_name}_{datetime.datetime.now().strftime('%Y%m%d')}"
@@ -224,27 +309,131 @@ def process_spreadsheet(sheets_integration, spreadsheet_id=None, spreadsheet_nam
                 logger.error(f"Ontology config file not found at: {config_path}")
                 raise FileNotFoundError(f"Ontology config file not found at: {config_path}")
             
-            ontology_file = generate_ontology_from_directory(
-                temp_dir,
-                config_path=config_path,
-                ontology_name=ontology_name
-            )
+            # Only the triples engine keeps a fragment cache; unchanged worksheets
+            # are then replayed from it instead of being processed again
+            engine = CONFIG['ontology_engine']
+            cache_dir = None
+            if engine == 'triples' and CONFIG['fragment_cache_dir']:
+                cache_dir = os.path.join(CONFIG['fragment_cache_dir'], spreadsheet_id)
             
-            # Full path to the generated ontology
-            ontology_path = os.path.join(temp_dir, ontology_file)
+            # Entity names minted in earlier runs are kept, so IRIs do not
+            # change when rows are reordered or new names collide with them
+            name_table = None
+            if CONFIG['name_table_dir']:
+                name_table = os.path.join(CONFIG['name_table_dir'], f"{spreadsheet_id}.json")
             
-            # Ensure output directory exists
-            os.makedirs(CONFIG['ontology_output_dir'], exist_ok=True)
+            # The quadstore settings only apply to the owlready2 engine
+            world_settings = {}
+            if engine == 'owlready2' and CONFIG['world_backend'] == 'sqlite':
+                world_settings = {'world_backend': 'sqlite',
+                                  'quadstore': {'cache_mb': CONFIG['quadstore_cache_mb']}}
             
-            # Copy to output directory (latest version)
-            output_path = os.path.join(CONFIG['ontology_output_dir'], f"{safe_name}_latest.owl")
-            shutil.copy2(ontology_path, output_path)
+            generation_info = {}
+            graph_uri = None
+            if CONFIG['sharded_output']:
+                # One file per worksheet, moved over the previous shards once the
+                # generation succeeded; a Java reasoner cannot check shards
+                reasoning = CONFIG['reasoning_mode']
+                if reasoning in ('hermit', 'pellet'):
+                    logger.info(f"Sharded output is checked structurally instead of with {reasoning}")
+                    reasoning = 'structural'
+                ontology_file = generate_ontology_from_directory(
+                    temp_dir,
+                    config_path=config_path,
+                    ontology_name=safe_name,
+                    engine=engine,
+                    output_format=CONFIG['output_format'],
+                    cache_dir=cache_dir,
+                    reasoning=reasoning,
+                    metadata=generation_info,
+                    workers=CONFIG['generation_workers'],
+                    validation=CONFIG['input_validation'],
+                    name_table=name_table,
+                    sharded=True
+                )
+                os.makedirs(CONFIG['ontology_output_dir'], exist_ok=True)
+                output_path = os.path.join(CONFIG['ontology_output_dir'], ontology_file)
+                history_path = None
+                if CONFIG['save_history']:
+                    os.makedirs(CONFIG['history_dir'], exist_ok=True)
+                    history_path = os.path.join(CONFIG['history_dir'], f"{safe_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_v{current_version}_shards")
+                publish_shards(os.path.join(temp_dir, ontology_file), output_path, history_path)
+                triple_diff = None
+            else:
+                # The ontology is serialized straight into the latest copy and the
+                # history archive; both are written under temporary names and only
+                # replace the previous files once the generation succeeded
+                extension = output_extension(engine, CONFIG['output_format'])
+                os.makedirs(CONFIG['ontology_output_dir'], exist_ok=True)
+                output_path = os.path.join(CONFIG['ontology_output_dir'], f"{safe_name}_latest{extension}")
+                target_paths = [output_path]
+                if CONFIG['save_history']:
+                    os.makedirs(CONFIG['history_dir'], exist_ok=True)
+                    history_path = os.path.join(CONFIG['history_dir'], f"{safe_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_v{current_version}{extension}")
+                    target_paths.append(history_path)
+                partial_paths = [f"{path[:-len(extension)]}.partial{extension}" for path in target_paths]
+            
+                try:
+                    with ExitStack() as stack:
+                        files = [stack.enter_context(open(path, 'wb')) for path in partial_paths]
+                        ontology_file = generate_ontology_from_directory(
+                            temp_dir,
+                            config_path=config_path,
+                            ontology_name=ontology_name,
+                            engine=engine,
+                            output_format=CONFIG['output_format'],
+                            cache_dir=cache_dir,
+                            reasoning=CONFIG['reasoning_mode'],
+                            reasoner_timeout=CONFIG['reasoner_timeout'],
+                            metadata=generation_info,
+                            output=TeeWriter(files),
+                            workers=CONFIG['generation_workers'],
+                            canonical=CONFIG['canonical_output'],
+                            validation=CONFIG['input_validation'],
+                            name_table=name_table,
+                            **world_settings
+                        )
+                
+                    # With canonical output the same content has the same hash: an
+                    # unchanged ontology is neither archived nor imported again
+                    content_hash = generation_info.get('content_hash')
+                    if content_hash and not force and content_hash == last_state.get('content_hash'):
+                        logger.info(f"Regenerated ontology for {spreadsheet_data['title']} is unchanged; skipping import")
+                        save_processed_state(spreadsheet_id, checksum, last_state['version'], generation_info.get('profile'),
+                                             last_state.get('last_diff'), last_state.get('graph_uri'), content_hash)
+                        return False
+                    if content_hash and CONFIG['save_history']:
+                        pattern = f"{glob.escape(safe_name)}_*_{content_hash[:16]}{extension}"
+                        archived = glob.glob(os.path.join(glob.escape(CONFIG['history_dir']), pattern))
+                        if archived:
+                            logger.info(f"Ontology is identical to {archived[0]}; not archived again")
+                            target_paths.pop()
+                        else:
+                            target_paths[-1] = f"{history_path[:-len(extension)]}_{content_hash[:16]}{extension}"
+                    # Compare with the previous ontology before it is replaced
+                    triple_diff = diff_previous_ontology(output_path, partial_paths[0], temp_dir)
+                    for partial_path, path in zip(partial_paths, target_paths):
+                        os.replace(partial_path, path)
+                finally:
+                    for partial_path in partial_paths:
+                        if os.path.exists(partial_path):
+                            os.remove(partial_path)
             
-            # Copy to history directory if enabled
-            if CONFIG['save_history']:
-                os.makedirs(CONFIG['history_dir'], exist_ok=True)
-                history_path = os.path.join(CONFIG['history_dir'], f"{safe_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_v{current_version}.owl")
-                shutil.copy2(ontology_path, history_path)
+            validation = generation_info.get('validation') or {}
+            for issue in validation.get('issues', []):
+                logger.warning(f"Input validation {issue['severity']}: {issue['message']}")
+            consistency = generation_info.get('consistency') or {}
+            if consistency.get('error'):
+                logger.warning(f"Consistency check did not complete: {consistency['error']}")
+            elif consistency.get('consistent') is False:
+                logger.warning(f"Ontology {ontology_file} is inconsistent: {consistency['issues']}")
+            profile = generation_info.get('profile')
+            if profile:
+                total = profile['total']
+                memory = (f"traced peak memory {total['peak_memory_bytes']} bytes" if profile['memory'] == 'tracemalloc'
+                          else f"RSS change {total['rss_delta_bytes']} bytes")
+                logger.info(f"Generation took {total['wall_seconds']}s ({total['cpu_seconds']}s CPU), {memory}, "
+                            f"process peak RSS {total['process_peak_rss_bytes']} bytes")
             
             logger.info(f"Successfully generated ontology: {ontology_file}")
             
@@ -253,8 +442,17 @@ def process_spreadsheet(sheets_integration, spreadsheet_id=None, spreadsheet_nam
             
             # Import to Blazegraph
             blazegraph_success = True
-            if CONFIG['blazegraph_endpoint']:
-                blazegraph_success = import_to_blazegraph(ontology_path, spreadsheet_data['title'], current_version)
+            loaded_shards = last_state.get('shards')
+            if CONFIG['blazegraph_endpoint'] and CONFIG['sharded_output']:
+                blazegraph_success, loaded_shards = import_shards_to_blazegraph(
+                    output_path, spreadsheet_data['title'], current_version, loaded_shards)
+            elif CONFIG['blazegraph_endpoint']:
+                graph_uri = blazegraph_graph_uri(spreadsheet_data['title'], current_version)
+                blazegraph_success = False
+                if CONFIG['blazegraph_incremental'] and triple_diff and last_state.get('graph_uri'):
+                    blazegraph_success = update_blazegraph_incrementally(last_state['graph_uri'], graph_uri, triple_diff)
+                if not blazegraph_success:
+                    blazegraph_success = import_to_blazegraph(output_path, spreadsheet_data['title'], current_version)
                 if blazegraph_success:
                     logger.info(f"Successfully imported to Blazegraph: {ontology_file}")
                 else:
@@ -274,6 +472,8 @@ def process_spreadsheet(sheets_integration, spreadsheet_id=None, spreadsheet_nam
                     # Try to update version using enhanced SheetsIntegration
                     try:
                         changelog_message = f"Automated ontology generation - {len(file_paths)} worksheets processed"
+                        if triple_diff:
+                            changelog_message += f" ({format_diff_summary(triple_diff['summary'])})"
                         
                         # First try using the enhanced method
                         if hasattr(sheets_integration, 'update_spreadsheet_version'):
@@ -314,7 +514,9 @@ def process_spreadsheet(sheets_integration, spreadsheet_id=None, spreadsheet_nam
                     logger.error(f"Error opening spreadsheet for version update: {e}")
             
             # Save processed state
-            save_processed_state(spreadsheet_id, checksum, new_version)
+            save_processed_state(spreadsheet_id, checksum, new_version, generation_info.get('profile'),
+                                 triple_diff and triple_diff['summary'], graph_uri if blazegraph_success else None,
+                                 generation_info.get('content_hash'), loaded_shards)
             
             # Send notification if configured
             if CONFIG['notify_email']:
@@ -360,23 +562,66 @@ def increment_version(version_str):
         logger.warning(f"Error incrementing version {version_str}: {e}")
         return "0.0.1"  # Default if version can't be parsed
 
-def import_to_blazegraph(ontology_path, spreadsheet_title, version):
-    """Import the ontology into Blazegraph."""
+def blazegraph_auth():
+    """Return the (user, password) for Blazegraph updates, or None."""
+    if isinstance(CONFIG['blazegraph_update_auth'], list) and len(CONFIG['blazegraph_update_auth']) == 2:
+        return tuple(CONFIG['blazegraph_update_auth'])
+    return None
+
+def blazegraph_graph_uri(spreadsheet_title, version):
+    """Return the named graph an ontology version is imported into."""
+    safe_title = spreadsheet_title.replace(' ', '_')
+    return f"http://example.org/ontology/{safe_title}/v{version.replace(' ','')}"
+
+def shard_graph_uri(spreadsheet_title, shard_name):
+    """Return the named graph a shard of a sharded ontology is loaded into; it does not change between versions."""
+    safe_title = spreadsheet_title.replace(' ', '_')
+    return f"http://example.org/ontology/{safe_title}/shards/{shard_name}"
+
+def update_blazegraph_incrementally(previous_graph_uri, graph_uri, diff):
+    """
+    Build an ontology's named graph from the previous version's graph and the
+    triple diff between the two, instead of importing the whole ontology.
+
+    Returns False if any update fails; the graph should then be imported in full.
+    """
+    import requests
+    try:
+        updates = sparql_update_requests(diff['removed'], diff['added'], graph_uri)
+        if previous_graph_uri != graph_uri:
+            updates = itertools.chain([f"COPY <{previous_graph_uri}> TO <{graph_uri}>"], updates)
+        for update in updates:
+            r = requests.post(
+                CONFIG['blazegraph_endpoint'],
+                headers={'Content-Type': 'application/sparql-update'},
+                data=update.encode('utf-8'),
+                auth=blazegraph_auth()
+            )
+            if r.status_code < 200 or r.status_code >= 300:
+                logger.warning(f"Incremental update of {graph_uri} failed: {r.status_code} {r.text}")
+                return False
+        logger.info(f"Updated Blazegraph graph {graph_uri} from {previous_graph_uri}: "
+                    f"{format_diff_summary(diff['summary'])}")
+        return True
+    except Exception as e:
+        logger.warning(f"Incremental update of {graph_uri} failed: {e}")
+        return False
+
+def import_to_blazegraph(ontology_path, spreadsheet_title, version, graph_uri=None):
+    """Import the ontology into Blazegraph, into ``graph_uri`` or the graph of its version."""
+    # requests is only loaded by runs that import something
+    import requests
     try:
-        # Read the ontology file
-        with open(ontology_path, 'rb') as f:
-            ontology_data = f.read()
+        # Stream the ontology file; compressed files are sent decompressed
+        ontology_data, content_type = stream_ontology_file(ontology_path)
         
         # Define headers and query parameters
         headers = {
-            'Content-Type': 'application/rdf+xml'
+            'Content-Type': content_type
         }
         
         # Add authentication if configured
-        auth = None
-        if CONFIG['blazegraph_update_auth']:
-            if isinstance(CONFIG['blazegraph_update_auth'], list) and len(CONFIG['blazegraph_update_auth']) == 2:
-                auth = tuple(CONFIG['blazegraph_update_auth'])
+        auth = blazegraph_auth()
         
         # Construct the endpoint URL
         endpoint = CONFIG['blazegraph_endpoint']
@@ -388,8 +633,7 @@ def import_to_blazegraph(ontology_path, spreadsheet_title, version):
             update_endpoint = endpoint
         
         # Create a named graph URI based on spreadsheet title and version
-        safe_title = spreadsheet_title.replace(' ', '_')
-        graph_uri = f"http://example.org/ontology/{safe_title}/v{version.replace(' ','')}"
+        graph_uri = graph_uri or blazegraph_graph_uri(spreadsheet_title, version)
         params = {'context-uri': graph_uri}
         
         # First, try to clear the existing graph
@@ -428,6 +672,61 @@ def import_to_blazegraph(ontology_path, spreadsheet_title, version):
         logger.error(f"Error importing to Blazegraph: {e}", exc_info=True)
         return False
 
+def import_shards_to_blazegraph(shard_dir, spreadsheet_title, version, loaded=None):
+    """
+    Load each shard of a sharded ontology into a named graph of its own.
+
+    Only shards whose content changed since they were last loaded are sent;
+    the graphs of shards that no longer exist are dropped.
+
+    Args:
+        shard_dir (str): Directory of the shards and their manifest.
+        spreadsheet_title (str): Title of the spreadsheet, for the graph names.
+        version (str): Version of the ontology, for the log.
+        loaded (dict, optional): Shard name -> SHA-256 of the shards already
+            in Blazegraph, as returned by an earlier call.
+
+    Returns:
+        tuple: Whether every shard was loaded, and shard name -> SHA-256 of
+        the shards now in Blazegraph.
+    """
+    import requests
+    manifest = load_shard_manifest(shard_dir)
+    if manifest is None:
+        logger.error(f"No shard manifest in {shard_dir}")
+        return False, loaded
+    loaded = dict(loaded or {})
+    success = True
+    for shard in manifest['shards']:
+        if loaded.get(shard['name']) == shard['sha256']:
+            logger.info(f"Shard {shard['name']} is unchanged; not reloaded")
+            continue
+        graph_uri = shard_graph_uri(spreadsheet_title, shard['name'])
+        if import_to_blazegraph(os.path.join(shard_dir, shard['file']), spreadsheet_title, version, graph_uri):
+            loaded[shard['name']] = shard['sha256']
+        else:
+            loaded.pop(shard['name'], None)
+            success = False
+
+    current = {shard['name'] for shard in manifest['shards']}
+    for name in [name for name in loaded if name not in current]:
+        graph_uri = shard_graph_uri(spreadsheet_title, name)
+        try:
+            r = requests.post(
+                CONFIG['blazegraph_endpoint'],
+                headers={'Content-Type': 'application/sparql-update'},
+                data=f"DROP SILENT GRAPH <{graph_uri}>",
+                auth=blazegraph_auth()
+            )
+            if r.status_code < 200 or r.status_code >= 300:
+                raise Exception(f"{r.status_code} {r.text}")
+            logger.info(f"Dropped graph of removed shard: {graph_uri}")
+            del loaded[name]
+        except Exception as e:
+            logger.warning(f"Could not drop graph {graph_uri}: {e}")
+            success = False
+    return success, loaded
+
 def send_notification(spreadsheet_title, version, ontology_file, message):
     """Send a notification email about the processing result."""
     if not CONFIG['notify_email'] or not CONFIG['smtp_server']:
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Batch Ontology Generation
+=========================
+Generates many ontologies in one run from a manifest of input directories
+and Google Sheets spreadsheets, e.g. for a nightly regeneration of every
+regional ontology.
+
+All jobs run in one pool of worker processes that stays up for the whole
+batch: owlready2 and the generator are imported once per worker, and the
+config of every job is compiled into its plan (see generation_plan) once
+in the parent, to fail early on an invalid config, and once per worker.
+Each generation's log goes to ``<name>.log`` next to its output, and a
+report with the outcome, time and metrics of every job is written at the
+end. A worker process that dies, e.g. killed for running out of memory,
+breaks the pool; the jobs that did not finish are then run again one at a
+time, each in a process of its own, so only the job that kills its worker
+is reported as failed.
+
+Manifest (JSON):
+
+  {
+    "defaults": {"engine": "triples", "reasoning": "structural"},
+    "jobs": [
+      {"name": "europe", "directory": "regions/europe"},
+      {"name": "andes", "spreadsheet_id": "1AbC...", "output_format": "turtle"}
+    ]
+  }
+
+A job takes the keyword arguments of generate_ontology_from_directory
+(except ``directory_path``, ``output`` and ``metadata``) on top of the
+defaults; its ``ontology_name`` defaults to its name. Relative paths are
+resolved against the manifest's directory.
+
+Usage:
+  python batch_generate.py manifest.json --output-dir generated_ontologies --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import inspect
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stdout
+
+from generation_plan import load_plan
+from generate_ontology import generate_ontology_from_directory, output_extension, ENGINE_FORMATS
+
+# Keyword arguments of generate_ontology_from_directory a job may not set
+RESERVED_ARGUMENTS = ("directory_path", "output", "metadata")
+GENERATION_ARGUMENTS = [name for name in inspect.signature(generate_ontology_from_directory).parameters
+                        if name not in RESERVED_ARGUMENTS]
+
+# Keys of a job besides the generation arguments
+JOB_KEYS = ["name", "directory", "spreadsheet_id", "spreadsheet_name"]
+
+# Path arguments resolved against the manifest's directory
+PATH_ARGUMENTS = ["directory", "config_path", "cache_dir", "name_table"]
+
+# Metadata of a generation copied into the report
+REPORT_METADATA = ["engine", "output_format", "config_hash", "content_hash", "duplicate_edges",
+                   "joined_edges", "unresolved_references", "name_collisions", "fragments_reused"]
+
+
+def load_manifest(manifest_path):
+    """
+    Load a batch manifest and resolve it into one job per entry.
+
+    Returns:
+        list: One dict per job with its "name", where its inputs come from
+        ("directory", or "spreadsheet_id" / "spreadsheet_name") and the
+        keyword arguments of its generation ("arguments").
+
+    Raises:
+        ValueError: If the manifest cannot be read or a job is invalid; the
+            message lists every problem.
+    """
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except Exception as e:
+        raise ValueError(f"Failed to load batch manifest: {e}")
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("jobs"), list):
+        raise ValueError("Invalid batch manifest: expected an object with a \"jobs\" list")
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    defaults = manifest.get("defaults", {})
+    errors = []
+    jobs = []
+    names = set()
+    for position, entry in enumerate(manifest["jobs"]):
+        if not isinstance(entry, dict) or not entry.get("name"):
+            errors.append(f"job {position} has no name")
+            continue
+        name = entry["name"]
+        if name in names:
+            errors.append(f"job {name} is listed more than once")
+        names.add(name)
+        merged = {**defaults, **entry}
+        unknown = [key for key in merged if key not in JOB_KEYS and key not in GENERATION_ARGUMENTS]
+        if unknown:
+            errors.append(f"job {name} has unknown settings {', '.join(unknown)}")
+        if merged.get("engine", "owlready2") not in ENGINE_FORMATS:
+            errors.append(f"job {name} has unknown engine {merged['engine']}")
+        sources = [key for key in ("directory", "spreadsheet_id", "spreadsheet_name") if entry.get(key)]
+        if len(sources) != 1:
+            errors.append(f"job {name} needs exactly one of directory, spreadsheet_id and spreadsheet_name")
+        for key in PATH_ARGUMENTS:
+            if merged.get(key):
+                merged[key] = os.path.join(base_dir, merged[key])
+        merged.setdefault("config_path", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                      "ontology_config.json"))
+        merged.setdefault("ontology_name", name)
+        jobs.append({
+            "name": name,
+            "directory": merged.get("directory"),
+            "spreadsheet_id": merged.get("spreadsheet_id"),
+            "spreadsheet_name": merged.get("spreadsheet_name"),
+            "arguments": {key: value for key, value in merged.items() if key in GENERATION_ARGUMENTS},
+        })
+    if errors:
+        raise ValueError(f"Invalid batch manifest: {'; '.join(errors)}")
+    return jobs
+
+
+def fetch_spreadsheet(sheets_integration, target_dir, spreadsheet_id=None, spreadsheet_name=None):
+    """
+    Save every worksheet of a spreadsheet, except "metadata", as ``<title>.csv``.
+
+    Returns:
+        int: Number of worksheets saved.
+    """
+    import csv
+    spreadsheet = sheets_integration.open_spreadsheet(spreadsheet_id=spreadsheet_id,
+                                                      spreadsheet_name=spreadsheet_name)
+    os.makedirs(target_dir, exist_ok=True)
+    saved = 0
+    for worksheet in spreadsheet.worksheets():
+        if worksheet.title == "metadata":
+            continue
+        data = sheets_integration.get_worksheet_data(spreadsheet, worksheet_name=worksheet.title)
+        if not data:
+            continue
+        with open(os.path.join(target_dir, f"{worksheet.title}.csv"), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=data[0].keys())
+            writer.writeheader()
+            writer.writerows(data)
+        saved += 1
+    return saved
+
+
+def _warm_worker(config_paths):
+    """Pool initializer: compile the plans of the batch once per worker."""
+    for config_path in config_paths:
+        load_plan(config_path)
+
+
+def run_job(job, output_dir):
+    """
+    Run the generation of one job into ``output_dir``.
+
+    The ontology is written under a temporary name and renamed once the
+    generation succeeded; a shard directory is moved over the previous one.
+
+    Returns:
+        dict: The job's report entry: "name", "status" ("ok" or "error"),
+        "output", "seconds", "log", "error" and selected metadata of the
+        generation ("consistency", "validation" counts, "profile" totals).
+    """
+    arguments = dict(job["arguments"])
+    name = arguments["ontology_name"]
+    log_path = os.path.join(output_dir, f"{job['name']}.log")
+    result = {"name": job["name"], "status": "ok", "output": None, "seconds": None,
+              "log": log_path, "error": None}
+    metadata = {}
+    partial_path = None
+    start = time.perf_counter()
+    try:
+        with open(log_path, 'w') as log, redirect_stdout(log):
+            if not os.path.isdir(job["directory"]):
+                raise FileNotFoundError(f"Input directory not found: {job['directory']}")
+            if arguments.get("sharded"):
+                shard_dir = generate_ontology_from_directory(job["directory"], metadata=metadata, **arguments)
+                output_path = os.path.join(output_dir, shard_dir)
+                shutil.rmtree(output_path, ignore_errors=True)
+                shutil.move(os.path.join(job["directory"], shard_dir), output_path)
+            else:
+                extension = output_extension(arguments.get("engine", "owlready2"), arguments.get("output_format"))
+                output_path = os.path.join(output_dir, f"{name}{extension}")
+                partial_path = os.path.join(output_dir, f"{name}.partial{extension}")
+                with open(partial_path, 'wb') as output:
+                    generate_ontology_from_directory(job["directory"], metadata=metadata, output=output,
+                                                     **arguments)
+                os.replace(partial_path, output_path)
+        result["output"] = output_path
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    finally:
+        if partial_path and os.path.exists(partial_path):
+            os.remove(partial_path)
+    result["seconds"] = round(time.perf_counter() - start, 3)
+
+    result.update({key: metadata[key] for key in REPORT_METADATA if key in metadata})
+    if metadata.get("consistency"):
+        result["consistency"] = metadata["consistency"]
+    if metadata.get("validation"):
+        issues = metadata["validation"]["issues"]
+        result["validation"] = {"valid": metadata["validation"]["valid"],
+                                "errors": sum(1 for issue in issues if issue["severity"] == "error"),
+                                "warnings": sum(1 for issue in issues if issue["severity"] == "warning")}
+    if metadata.get("profile"):
+        result["profile"] = metadata["profile"].get("total")
+    return result
+
+
+def run_batch(jobs, output_dir, workers=None, sheets_integration=None):
+    """
+    Run every job of a batch in one warm pool of worker processes.
+
+    Spreadsheet jobs are first fetched into a temporary directory by this
+    process. A job that fails is reported and does not stop the others.
+
+    Args:
+        jobs (list): Jobs from load_manifest.
+        output_dir (str): Directory the ontologies, logs and report go to.
+        workers (int, optional): Number of worker processes; None uses one
+            per CPU and 0 runs the jobs in this process.
+        sheets_integration (SheetsIntegration, optional): Client for the
+            spreadsheet jobs; created from the default credentials if needed.
+
+    Returns:
+        dict: The batch report, with one entry per job in "jobs", in the
+        order of the manifest.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    report = {
+        "created": datetime.datetime.now().isoformat(),
+        "output_dir": os.path.abspath(output_dir),
+        "workers": workers,
+        "jobs": [],
+    }
+    # An invalid config fails the whole batch before anything runs
+    config_paths = list(dict.fromkeys(job["arguments"]["config_path"] for job in jobs))
+    for config_path in config_paths:
+        load_plan(config_path)
+
+    start = time.perf_counter()
+    fetch_dir = tempfile.mkdtemp(prefix="ontology-batch-")
+    try:
+        failed = {}
+        runnable = []
+        for job in jobs:
+            if job["directory"]:
+                runnable.append(job)
+                continue
+            if sheets_integration is None:
+                from sheets_integration import SheetsIntegration
+                sheets_integration = SheetsIntegration(service_account_file='service_account.json')
+            target_dir = os.path.join(fetch_dir, job["name"])
+            try:
+                if not fetch_spreadsheet(sheets_integration, target_dir, job["spreadsheet_id"],
+                                         job["spreadsheet_name"]):
+                    raise ValueError("The spreadsheet has no data")
+            except Exception as e:
+                print(f"{job['name']}: could not fetch the spreadsheet: {e}", flush=True)
+                failed[job["name"]] = {"name": job["name"], "status": "error", "output": None, "seconds": None,
+                                       "log": None, "error": f"Could not fetch the spreadsheet: {e}"}
+                continue
+            runnable.append({**job, "directory": target_dir})
+
+        results = {}
+        if workers == 0:
+            for job in runnable:
+                results[job["name"]] = run_job(job, output_dir)
+                _print_result(results[job["name"]])
+        else:
+            broken = []
+            with ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker,
+                                     initargs=(config_paths,)) as pool:
+                futures = {}
+                for job in runnable:
+                    try:
+                        futures[job["name"]] = pool.submit(run_job, job, output_dir)
+                    except BrokenProcessPool:
+                        broken.append(job)
+                for job in runnable:
+                    if job["name"] not in futures:
+                        continue
+                    try:
+                        results[job["name"]] = futures[job["name"]].result()
+                    except BrokenProcessPool:
+                        broken.append(job)
+                        continue
+                    except Exception as e:
+                        results[job["name"]] = _worker_error(job, output_dir, e)
+                    _print_result(results[job["name"]])
+            # A dead worker fails every job left in the pool: run them again
+            # one by one, so only the job that kills its worker fails
+            if broken:
+                print(f"A worker process died; running {len(broken)} unfinished jobs again one by one", flush=True)
+            for job in broken:
+                with ProcessPoolExecutor(max_workers=1, initializer=_warm_worker, initargs=(config_paths,)) as pool:
+                    try:
+                        results[job["name"]] = pool.submit(run_job, job, output_dir).result()
+                    except Exception as e:
+                        results[job["name"]] = _worker_error(job, output_dir, e)
+                _print_result(results[job["name"]])
+        results.update(failed)
+        report["jobs"] = [results[job["name"]] for job in jobs]
+    finally:
+        shutil.rmtree(fetch_dir, ignore_errors=True)
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    report["failed"] = sum(1 for result in report["jobs"] if result["status"] != "ok")
+    return report
+
+
+def _worker_error(job, output_dir, error):
+    """Return the report entry of a job whose worker process failed."""
+    if isinstance(error, BrokenProcessPool):
+        error = "The worker process died (e.g. killed for running out of memory)"
+    log_path = os.path.join(output_dir, f"{job['name']}.log")
+    return {"name": job["name"], "status": "error", "output": None, "seconds": None,
+            "log": log_path if os.path.exists(log_path) else None, "error": f"Worker failed: {error}"}
+
+
+def _print_result(result):
+    if result["status"] == "ok":
+        print(f"{result['name']}: {result['output']} in {result['seconds']}s", flush=True)
+    else:
+        see_log = f" (see {result['log']})" if result["log"] else ""
+        print(f"{result['name']}: {result['error']}{see_log}", flush=True)
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Generate the ontologies of a batch manifest in one warm process pool')
+    parser.add_argument('manifest', help='Batch manifest (JSON)')
+    parser.add_argument('--output-dir', default='generated_ontologies',
+                        help='Directory for the ontologies, logs and report (default: generated_ontologies)')
+    parser.add_argument('--workers', type=int,
+                        help='Number of worker processes (default: one per CPU; 0 runs the jobs in this process)')
+    parser.add_argument('--report', help='Report file (default: batch_report.json in the output directory)')
+    parser.add_argument('--service-account', default='service_account.json',
+                        help='Service account file for spreadsheet jobs (default: service_account.json)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        jobs = load_manifest(args.manifest)
+    except ValueError as e:
+        print(e)
+        sys.exit(2)
+
+    sheets_integration = None
+    if any(not job["directory"] for job in jobs):
+        from sheets_integration import SheetsIntegration
+        sheets_integration = SheetsIntegration(service_account_file=args.service_account)
+
+    report = run_batch(jobs, args.output_dir, args.workers, sheets_integration)
+    report_path = args.report or os.path.join(args.output_dir, "batch_report.json")
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"{len(jobs) - report['failed']} of {len(jobs)} ontologies generated in {report['seconds']}s; "
+          f"report written to {report_path}")
+    if report["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
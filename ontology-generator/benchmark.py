@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Ontology Generator Benchmark
+============================
+Generates synthetic input CSVs matching ontology_config.json
+(taxonomic_hierarchy, biomes, ecoregions, countries, object_properties and
+data_properties) at several sizes, runs generate_ontology_from_directory on
+them with each engine and mode, and records the wall time, peak RSS, output
+size and triple count of every run.
+
+Every run happens in a fresh Python process, so peak RSS is that of a single
+generation. Results are written as JSON; comparing them with a baseline
+written by an earlier commit reports (and fails on) regressions.
+
+With --startup, the import time of the entry points (the web app, the
+automation scripts, the batch CLI) is measured instead, in fresh
+interpreters, together with the heavy dependencies each import loads.
+
+Usage:
+  python benchmark.py --sizes 1k,10k --output results.json
+  python benchmark.py --sizes 1k,10k --baseline main.json --threshold 0.25
+  python benchmark.py --startup --output startup.json --baseline startup_main.json
+
+The owlready2 engine gets much slower as the ontology grows; use --timeout
+to bound each run (a run that exceeds it is recorded with status "timeout").
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import subprocess
+from contextlib import redirect_stdout
+from profiling import peak_rss_bytes
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG = os.path.join(SCRIPT_DIR, "ontology_config.json")
+
+DEFAULT_SIZES = "1k,10k,100k,1M"
+
+# Engine and mode combinations; "warm_cache" runs the triples engine twice
+# with a fragment cache and measures the second run; "workers" is passed to
+# the generator (None: one process per CPU); "canonical" sorts the output
+CASES = {
+    "owlready2-memory": {"engine": "owlready2", "world_backend": "memory"},
+    "owlready2-sqlite": {"engine": "owlready2", "world_backend": "sqlite"},
+    "triples": {"engine": "triples"},
+    "triples-cached": {"engine": "triples", "warm_cache": True},
+    "triples-parallel": {"engine": "triples", "workers": None},
+    "triples-canonical": {"engine": "triples", "canonical": True},
+}
+
+# Share of the rows that goes to each generated file
+FILE_SHARES = {"taxonomic_hierarchy": 0.70, "ecoregions": 0.15, "countries": 0.10, "biomes": 0.05}
+
+CONTINENTS = ["Africa", "Antarctica", "Asia", "Europe", "North America", "Oceania", "South America"]
+
+OBJECT_PROPERTIES = [
+    ["growsIn", "Species", "Ecoregion", "FALSE", "FALSE", "hosts", "Species grows in ecoregion"],
+    ["locatedIn", "Ecoregion", "Country", "TRUE", "FALSE", "", "Ecoregion located in country"],
+    ["partOfBiome", "Ecoregion", "Biome", "FALSE", "TRUE", "", "Ecoregion belongs to a biome"],
+    ["onContinent", "Country", "Continent", "FALSE", "FALSE", "hasCountry", "Country lies on continent"],
+]
+
+DATA_PROPERTIES = [
+    ["hasHeight", "Species", "float", "TRUE", "Max height"],
+    ["hasCommonName", "Species", "string", "FALSE", "Common name"],
+    ["hasArea", "Ecoregion", "float", "TRUE", "Area in square kilometres"],
+    ["hasPopulation", "Country", "integer", "FALSE", "Population"],
+]
+
+# Slack below which a time difference is never reported as a regression
+REGRESSION_MIN_SECONDS = 0.5
+
+# Entry points measured by the startup benchmark, and the heavy dependencies
+# whose presence after each import is recorded
+STARTUP_MODULES = ["app", "automation_script", "config_automation", "batch_generate", "generate_ontology"]
+HEAVY_MODULES = ["owlready2", "gspread", "google.oauth2", "requests", "flask"]
+STARTUP_REPEAT = 5
+
+# Slack below which an import time difference is never reported as a regression
+STARTUP_MIN_SECONDS = 0.05
+
+
+def parse_size(text):
+    """Parse a row count such as 1000, 10k or 1M."""
+    text = text.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    if multiplier > 1:
+        text = text[:-1]
+    return int(float(text) * multiplier)
+
+
+def _write_csv(path, header, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def generate_inputs(directory, rows, seed=0):
+    """
+    Write synthetic input CSVs for ontology_config.json.
+
+    The taxonomic hierarchy repeats families the way species-level exports
+    do, so it also exercises the collapsing of duplicate edges.
+
+    Args:
+        directory (str): Directory to write the ``<name>.csv`` files to.
+        rows (int): Approximate total number of rows over all files.
+        seed (int): Seed of the random generator; the same seed gives the
+            same files.
+
+    Returns:
+        dict: Number of rows written per file.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    counts = {name: max(1, int(rows * share)) for name, share in FILE_SHARES.items()}
+
+    hierarchy_rows = counts["taxonomic_hierarchy"]
+    families = max(1, hierarchy_rows // 2)
+    orders = max(1, hierarchy_rows // 40)
+    classes = max(1, hierarchy_rows // 1000)
+
+    def hierarchy():
+        for _ in range(hierarchy_rows):
+            family = rng.randrange(families)
+            order = family % orders
+            yield [f"Class{order % classes}opsida", f"Order{order}ales", f"Family{family}aceae"]
+
+    _write_csv(os.path.join(directory, "taxonomic_hierarchy.csv"),
+               ["class_name", "order_name", "family_name"], hierarchy())
+
+    biomes = counts["biomes"]
+    _write_csv(os.path.join(directory, "biomes.csv"), ["biome_id", "biome_name"],
+               ([i + 1, f"Biome {i + 1}"] for i in range(biomes)))
+
+    _write_csv(os.path.join(directory, "ecoregions.csv"), ["ecoregion_id", "ecoregion_name", "biome_id"],
+               ([i + 1, f"Ecoregion {i + 1}", rng.randrange(biomes) + 1] for i in range(counts["ecoregions"])))
+
+    _write_csv(os.path.join(directory, "countries.csv"), ["country_code", "country_name", "continent"],
+               ([f"C{i + 1}", f"Country {i + 1}", rng.choice(CONTINENTS)] for i in range(counts["countries"])))
+
+    _write_csv(os.path.join(directory, "object_properties.csv"),
+               ["property_name", "domain", "range", "is_transitive", "is_functional", "inverse_property",
+                "description"], OBJECT_PROPERTIES)
+    _write_csv(os.path.join(directory, "data_properties.csv"),
+               ["property_name", "domain", "range", "is_functional", "description"], DATA_PROPERTIES)
+
+    counts["object_properties"] = len(OBJECT_PROPERTIES)
+    counts["data_properties"] = len(DATA_PROPERTIES)
+    return counts
+
+
+def _count_lines(path):
+    with open(path, 'rb') as f:
+        return sum(1 for line in f if line.strip())
+
+
+def run_case(input_dir, config_path, case, reasoning="off"):
+    """
+    Run one generation in this process and measure it.
+
+    Output is always N-Triples, so the triple count is the number of lines.
+    Allocation tracing (profile_memory) stays off, so the time measures the
+    generator rather than tracemalloc; memory is the peak RSS of the run.
+
+    Returns:
+        dict: "seconds", "peak_rss_bytes", "output_bytes", "triples" and
+        "profile" (the generation's per-phase profile).
+    """
+    from generate_ontology import generate_ontology_from_directory
+
+    settings = CASES[case]
+    work_dir = tempfile.mkdtemp(prefix="ontology-bench-")
+    try:
+        for name in os.listdir(input_dir):
+            shutil.copy(os.path.join(input_dir, name), work_dir)
+        kwargs = {"config_path": config_path, "engine": settings["engine"], "output_format": "ntriples",
+                  "reasoning": reasoning, "profile_memory": False}
+        if "world_backend" in settings:
+            kwargs["world_backend"] = settings["world_backend"]
+        if "workers" in settings:
+            kwargs["workers"] = settings["workers"]
+        if settings.get("canonical"):
+            kwargs["canonical"] = True
+        if settings.get("warm_cache"):
+            kwargs["cache_dir"] = os.path.join(work_dir, "fragment_cache")
+
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            if settings.get("warm_cache"):
+                generate_ontology_from_directory(work_dir, **kwargs)
+            metadata = {}
+            start = time.perf_counter()
+            output_file = generate_ontology_from_directory(work_dir, metadata=metadata, **kwargs)
+            seconds = time.perf_counter() - start
+
+        output_path = os.path.join(work_dir, output_file)
+        return {
+            "seconds": round(seconds, 3),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "output_bytes": os.path.getsize(output_path),
+            "triples": _count_lines(output_path),
+            "profile": metadata.get("profile"),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def measure(input_dir, config_path, case, reasoning="off", timeout=None):
+    """Run one case in a fresh interpreter and return its result, or a failure status."""
+    command = [sys.executable, os.path.abspath(__file__), "--run-case", case,
+               "--input-dir", input_dir, "--config", config_path, "--reasoning", reasoning]
+    try:
+        completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   timeout=timeout, cwd=SCRIPT_DIR)
+    except subprocess.TimeoutExpired:
+        return {"status": "timeout", "error": f"exceeded {timeout}s"}
+    if completed.returncode != 0:
+        message = completed.stderr.decode("utf-8", errors="replace").strip()[-2000:]
+        return {"status": "failed", "error": message}
+    result = json.loads(completed.stdout.decode("utf-8").strip().splitlines()[-1])
+    result["status"] = "ok"
+    return result
+
+
+def measure_startup(module, repeat=STARTUP_REPEAT):
+    """
+    Import a module in ``repeat`` fresh interpreters and measure it.
+
+    The imports run in a temporary working directory, since the app and the
+    automation create their log files and folders when imported.
+
+    Returns:
+        dict: "module", "status", "import_seconds" (the fastest import),
+        "process_seconds" (the fastest interpreter run, startup included)
+        and "loaded" (the HEAVY_MODULES the import pulled in).
+    """
+    code = (f"import sys, time, json\n"
+            f"start = time.perf_counter()\n"
+            f"import {module}\n"
+            f"seconds = time.perf_counter() - start\n"
+            f"print(json.dumps({{'seconds': seconds, "
+            f"'loaded': [name for name in {HEAVY_MODULES!r} if name in sys.modules]}}))")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SCRIPT_DIR, os.environ.get("PYTHONPATH")])))
+    import_times = []
+    process_times = []
+    loaded = []
+    work_dir = tempfile.mkdtemp(prefix="ontology-bench-startup-")
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            completed = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE, cwd=work_dir, env=env)
+            process_times.append(time.perf_counter() - start)
+            if completed.returncode != 0:
+                message = completed.stderr.decode("utf-8", errors="replace").strip()[-2000:]
+                return {"module": module, "status": "failed", "error": message}
+            result = json.loads(completed.stdout.decode("utf-8").strip().splitlines()[-1])
+            import_times.append(result["seconds"])
+            loaded = result["loaded"]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "module": module,
+        "status": "ok",
+        "import_seconds": round(min(import_times), 4),
+        "process_seconds": round(min(process_times), 4),
+        "loaded": loaded,
+    }
+
+
+def run_startup_benchmarks(modules, repeat=STARTUP_REPEAT):
+    """Measure the import of every module; returns the startup report."""
+    report = _new_report()
+    report["startup"] = []
+    for module in modules:
+        print(f"Importing {module}...", flush=True)
+        result = measure_startup(module, repeat)
+        report["startup"].append(result)
+        if result["status"] == "ok":
+            print(f"  {result['import_seconds']}s import, {result['process_seconds']}s process, "
+                  f"loads {', '.join(result['loaded']) or 'none of ' + ', '.join(HEAVY_MODULES)}", flush=True)
+        else:
+            print(f"  {result['status']}: {result['error']}", flush=True)
+    return report
+
+
+def _new_report():
+    return {
+        "created": datetime.datetime.now().isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def _git_commit():
+    try:
+        completed = subprocess.run(["git", "rev-parse", "HEAD"], stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL, cwd=SCRIPT_DIR)
+        return completed.stdout.decode().strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmarks(sizes, cases, config_path=DEFAULT_CONFIG, reasoning="off", timeout=None, work_dir=None,
+                   seed=0):
+    """
+    Run every case at every size.
+
+    Args:
+        sizes (list): Row counts.
+        cases (list): Names from CASES.
+        config_path (str): Ontology configuration the inputs are generated for.
+        reasoning (str): Reasoning mode of every generation.
+        timeout (float, optional): Budget of a single run, in seconds.
+        work_dir (str, optional): Where to keep the generated inputs; a
+            temporary directory by default.
+        seed (int): Seed of the input generator.
+
+    Returns:
+        dict: The benchmark report, with one entry per (rows, case) in "results".
+    """
+    report = _new_report()
+    report.update({"reasoning": reasoning, "seed": seed, "results": []})
+    temp_dir = None if work_dir else tempfile.mkdtemp(prefix="ontology-bench-inputs-")
+    base_dir = work_dir or temp_dir
+    try:
+        for rows in sizes:
+            input_dir = os.path.join(base_dir, f"rows-{rows}")
+            files = generate_inputs(input_dir, rows, seed)
+            for case in cases:
+                print(f"{rows} rows, {case}...", flush=True)
+                result = measure(input_dir, os.path.abspath(config_path), case, reasoning, timeout)
+                result.update({"rows": rows, "case": case, "input_rows": sum(files.values())})
+                report["results"].append(result)
+                if result["status"] == "ok":
+                    print(f"  {result['seconds']}s, peak RSS {result['peak_rss_bytes']} bytes, "
+                          f"{result['triples']} triples, {result['output_bytes']} bytes", flush=True)
+                else:
+                    print(f"  {result['status']}: {result['error']}", flush=True)
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return report
+
+
+def check_regressions(report, baseline, threshold=0.25):
+    """
+    Compare a report with a baseline report.
+
+    A run regresses when its time or peak RSS grows by more than
+    ``threshold`` (a fraction) over the baseline, or when it no longer
+    completes. Time differences under REGRESSION_MIN_SECONDS are ignored.
+    An import regresses when its time grows by more than ``threshold`` and
+    STARTUP_MIN_SECONDS, or when it loads a heavy dependency it did not.
+
+    Returns:
+        list: One message per regression.
+    """
+    previous = {(r["rows"], r["case"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in report.get("results", []):
+        key = (result["rows"], result["case"])
+        before = previous.get(key)
+        if before is None or before.get("status") != "ok":
+            continue
+        label = f"{result['case']} at {result['rows']} rows"
+        if result["status"] != "ok":
+            regressions.append(f"{label}: {result['status']} (was ok)")
+            continue
+        if (result["seconds"] > before["seconds"] * (1 + threshold)
+                and result["seconds"] - before["seconds"] > REGRESSION_MIN_SECONDS):
+            regressions.append(f"{label}: {result['seconds']}s (was {before['seconds']}s)")
+        if (result.get("peak_rss_bytes") and before.get("peak_rss_bytes")
+                and result["peak_rss_bytes"] > before["peak_rss_bytes"] * (1 + threshold)):
+            regressions.append(f"{label}: peak RSS {result['peak_rss_bytes']} bytes "
+                               f"(was {before['peak_rss_bytes']} bytes)")
+
+    previous = {r["module"]: r for r in baseline.get("startup", [])}
+    for result in report.get("startup", []):
+        before = previous.get(result["module"])
+        if before is None or before.get("status") != "ok":
+            continue
+        label = f"import of {result['module']}"
+        if result["status"] != "ok":
+            regressions.append(f"{label}: {result['status']} (was ok)")
+            continue
+        if (result["import_seconds"] > before["import_seconds"] * (1 + threshold)
+                and result["import_seconds"] - before["import_seconds"] > STARTUP_MIN_SECONDS):
+            regressions.append(f"{label}: {result['import_seconds']}s (was {before['import_seconds']}s)")
+        added = [name for name in result["loaded"] if name not in before["loaded"]]
+        if added:
+            regressions.append(f"{label}: now loads {', '.join(added)}")
+    return regressions
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark the ontology generator on synthetic inputs')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'Comma-separated row counts (default: {DEFAULT_SIZES})')
+    parser.add_argument('--cases', default=','.join(CASES),
+                        help=f'Comma-separated engine/mode cases (default: all of {", ".join(CASES)})')
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help='Ontology configuration file')
+    parser.add_argument('--reasoning', default='off', help='Reasoning mode of the generations (default: off)')
+    parser.add_argument('--timeout', type=float, help='Budget of a single run in seconds')
+    parser.add_argument('--work-dir', help='Keep the generated inputs in this directory')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the input generator (default: 0)')
+    parser.add_argument('--output', default='benchmark_results.json', help='Results file (default: benchmark_results.json)')
+    parser.add_argument('--baseline', help='Results file of an earlier run to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed growth of time and peak RSS over the baseline (default: 0.25)')
+    parser.add_argument('--startup', action='store_true',
+                        help='Measure the import time of the entry points instead of generation runs')
+    parser.add_argument('--modules', default=','.join(STARTUP_MODULES),
+                        help=f'Comma-separated modules for --startup (default: {",".join(STARTUP_MODULES)})')
+    parser.add_argument('--repeat', type=int, default=STARTUP_REPEAT,
+                        help=f'Imports per module for --startup; the fastest counts (default: {STARTUP_REPEAT})')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--input-dir', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.run_case:
+        # Child process of measure(): print the result as the last line
+        result = run_case(args.input_dir, args.config, args.run_case, args.reasoning)
+        print(json.dumps(result))
+        return
+
+    if args.startup:
+        modules = [m.strip() for m in args.modules.split(',') if m.strip()]
+        report = run_startup_benchmarks(modules, args.repeat)
+    else:
+        cases = [c.strip() for c in args.cases.split(',') if c.strip()]
+        unknown = [c for c in cases if c not in CASES]
+        if unknown:
+            print(f"Unknown cases: {', '.join(unknown)}")
+            sys.exit(2)
+        sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+
+        report = run_benchmarks(sizes, cases, args.config, args.reasoning, args.timeout, args.work_dir, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = check_regressions(report, baseline, args.threshold)
+        for message in regressions:
+            print(f"Regression: {message}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
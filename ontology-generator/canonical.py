@@ -0,0 +1,265 @@
+"""
+Canonical serialization of generated ontologies.
+
+A canonical triple stream holds every triple of an ontology as an N-Triples
+line, with its blank nodes relabelled from their content and from the
+triples that use them, sorted and without duplicates. The same graph always
+gives the same stream, whichever engine built it and in whatever order the
+rows were read, so its hash identifies the ontology's content.
+
+The files are read as a stream in every format, the lines are sorted in
+bounded memory (sorted runs on disk that are merged) and the blank-node
+triples are labelled in a temporary SQLite database, so multi-million-triple
+ontologies never have to be loaded.
+"""
+
+import os
+import heapq
+import sqlite3
+import hashlib
+import tempfile
+from itertools import groupby
+
+import triple_readers
+from ontology_triples import open_output, open_writer, split_format
+from output_formats import output_format_of
+
+# Triples sorted in memory at once; larger ontologies are sorted in runs on disk
+DEFAULT_RUN_SIZE = 500000
+
+# SQLite page cache of the blank-node database, in KiB
+BLANK_NODE_CACHE_KB = 16384
+
+
+def _is_blank(term):
+    return term.startswith("_:")
+
+
+def _digest(parts):
+    return hashlib.sha256("\n".join(parts).encode('utf-8')).hexdigest()[:32]
+
+
+def read_triples(path):
+    """
+    Yield the (subject, predicate, object) triples of a generated ontology file.
+
+    The file is streamed whatever its format (see triple_readers); its
+    format is told by its extension, RDF/XML when it has none.
+    """
+    return triple_readers.read_triples(path, output_format_of(path) or "rdfxml")
+
+
+def sorted_unique(lines, work_dir, run_size=DEFAULT_RUN_SIZE):
+    """
+    Sort lines in bounded memory and drop duplicates.
+
+    Up to ``run_size`` lines are sorted in memory at a time; when there are
+    more, each sorted batch is written to a run file in ``work_dir`` and the
+    runs are merged.
+
+    Yields:
+        str: The unique lines in sorted order.
+    """
+    runs, files = [], []
+    try:
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= run_size:
+                runs.append(_write_run(batch, work_dir))
+                batch = []
+        batch.sort()
+        if runs:
+            runs.append(_write_run(batch, work_dir))
+            batch = None
+            files = [open(run, 'r', encoding='utf-8') for run in runs]
+            merged = heapq.merge(*((line[:-1] for line in f) for f in files))
+        else:
+            merged = batch
+
+        previous = None
+        for line in merged:
+            if line != previous:
+                yield line
+                previous = line
+    finally:
+        for f in files:
+            f.close()
+        for run in runs:
+            os.remove(run)
+
+
+def _write_run(batch, work_dir):
+    batch.sort()
+    fd, path = tempfile.mkstemp(suffix=".run", dir=work_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        for line in batch:
+            f.write(line)
+            f.write("\n")
+    return path
+
+
+def canonical_triples(path, work_dir, run_size=DEFAULT_RUN_SIZE):
+    """
+    Yield the triples of an ontology file as canonical N-Triples lines.
+
+    Blank node labels depend on the order an engine happened to create the
+    nodes in, so they are replaced by a hash of the node's own triples
+    (including the labels of nested blank nodes) and of the triples that use
+    it. Two versions of an ontology then share the labels of their unchanged
+    restrictions. Blank nodes with the same content that are used by the same
+    triples are merged.
+
+    Args:
+        path (str): The ontology file (see read_triples).
+        work_dir (str): Directory for the temporary sorted runs and database.
+        run_size (int): Lines sorted in memory at once.
+
+    Yields:
+        str: "subject predicate object ." lines, sorted and unique.
+    """
+    fd, db_path = tempfile.mkstemp(suffix=".sqlite3", dir=work_dir)
+    os.close(fd)
+    db = sqlite3.connect(db_path)
+    try:
+        db.executescript(f"""
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            PRAGMA cache_size = -{BLANK_NODE_CACHE_KB};
+            CREATE TABLE triples (s TEXT, p TEXT, o TEXT);
+        """)
+
+        def lines():
+            for s, p, o in read_triples(path):
+                if _is_blank(s) or _is_blank(o):
+                    db.execute("INSERT INTO triples VALUES (?, ?, ?)", (s, p, o))
+                else:
+                    yield f"{s} {p} {o} ."
+            yield from _relabelled_blank_triples(db)
+
+        yield from sorted_unique(lines(), work_dir, run_size)
+    finally:
+        db.close()
+        os.remove(db_path)
+
+
+def _relabelled_blank_triples(db):
+    """Label the blank nodes collected in ``db`` and yield their triples with the new labels."""
+    db.executescript("""
+        CREATE INDEX triples_s ON triples (s);
+        CREATE INDEX triples_o ON triples (o);
+        CREATE TABLE blanks AS
+            SELECT s AS blank FROM triples WHERE substr(s, 1, 2) = '_:'
+            UNION SELECT o FROM triples WHERE substr(o, 1, 2) = '_:';
+        CREATE TABLE content (blank TEXT PRIMARY KEY, digest TEXT);
+        CREATE TABLE resolved (blank TEXT, digest TEXT);
+        CREATE TABLE labels (blank TEXT PRIMARY KEY, label TEXT);
+    """)
+
+    # Hash the content of each blank node once the nodes it points to have
+    # their hash; nodes left in a cycle are hashed without their neighbours
+    force = False
+    while True:
+        rows = db.execute("""
+            SELECT b.blank, t.p, t.o, c.digest FROM blanks b
+            LEFT JOIN triples t ON t.s = b.blank
+            LEFT JOIN content c ON c.blank = t.o
+            WHERE b.blank NOT IN (SELECT blank FROM content)
+            ORDER BY b.blank""")
+        pending = added = 0
+        for blank, group in groupby(rows, key=lambda row: row[0]):
+            parts = []
+            for _, p, o, digest in group:
+                if p is None:
+                    continue
+                if _is_blank(o):
+                    if digest is None and not force:
+                        break
+                    o = f"_:{digest or ''}"
+                parts.append(f"{p} {o}")
+            else:
+                db.execute("INSERT INTO resolved VALUES (?, ?)", (blank, _digest(sorted(parts))))
+                added += 1
+                continue
+            pending += 1
+        db.execute("INSERT INTO content SELECT blank, digest FROM resolved")
+        db.execute("DELETE FROM resolved")
+        if not pending:
+            break
+        force = not added
+
+    # The label adds the triples that use the node, so equal restrictions
+    # on different classes stay apart
+    rows = db.execute("""
+        SELECT b.blank, c.digest, t.s, t.p, cs.digest FROM blanks b
+        JOIN content c ON c.blank = b.blank
+        LEFT JOIN triples t ON t.o = b.blank
+        LEFT JOIN content cs ON cs.blank = t.s
+        ORDER BY b.blank""")
+    for blank, group in groupby(rows, key=lambda row: row[0]):
+        digest, uses = None, []
+        for _, digest, s, p, subject_digest in group:
+            if s is not None:
+                uses.append(f"{'_:' + subject_digest if _is_blank(s) else s} {p}")
+        db.execute("INSERT INTO resolved VALUES (?, ?)", (blank, "_:b" + _digest([digest] + sorted(uses))))
+    db.execute("INSERT INTO labels SELECT blank, digest FROM resolved")
+
+    rows = db.execute("""
+        SELECT COALESCE(ls.label, t.s), t.p, COALESCE(lo.label, t.o) FROM triples t
+        LEFT JOIN labels ls ON ls.blank = t.s
+        LEFT JOIN labels lo ON lo.blank = t.o""")
+    for s, p, o in rows:
+        yield f"{s} {p} {o} ."
+
+
+def write_canonical(source_path, target, output_format, ontology_iri, run_size=DEFAULT_RUN_SIZE):
+    """
+    Write an ontology file out again in canonical form.
+
+    N-Triples and Turtle are written from the canonical triple stream, so
+    subjects and predicates are sorted and blank nodes carry their content
+    labels. RDF/XML is saved by owlready2 from the canonical N-Triples, which
+    it reads in memory; the result is stable too. Compressed formats carry
+    no timestamp (see ontology_triples.open_output), so the same graph is
+    always written as the same bytes.
+
+    Args:
+        source_path (str): The ontology to rewrite, e.g. a temporary N-Triples file.
+        target: Path of the file to write, or a binary file-like object.
+        output_format (str): Output format, e.g. "turtle" or "ntriples-gzip".
+        ontology_iri (str): Base IRI of the ontology, for Turtle prefixes.
+        run_size (int): Lines sorted in memory at once.
+
+    Returns:
+        str: SHA-256 hex digest of the canonical N-Triples, the same for
+        every output format.
+    """
+    serialization, _ = split_format(output_format)
+    digest = hashlib.sha256()
+    with tempfile.TemporaryDirectory(prefix="ontology-canonical-") as work_dir:
+        lines = canonical_triples(source_path, work_dir, run_size)
+        if serialization == "rdfxml":
+            from owlready2 import World
+
+            ntriples_path = os.path.join(work_dir, "canonical.nt")
+            with open(ntriples_path, 'w', encoding='utf-8') as f:
+                for line in lines:
+                    digest.update(f"{line}\n".encode('utf-8'))
+                    f.write(f"{line}\n")
+            world = World()
+            try:
+                with open(ntriples_path, 'rb') as f:
+                    onto = world.get_ontology(ontology_iri).load(fileobj=f)
+                with open_output(target, output_format, 'wb') as f:
+                    onto.save(file=f, format="rdfxml")
+            finally:
+                world.close()
+        else:
+            with open_output(target, output_format) as f:
+                writer = open_writer(f, output_format, ontology_iri)
+                for line in lines:
+                    digest.update(f"{line}\n".encode('utf-8'))
+                    s, p, o = line[:-2].split(" ", 2)
+                    writer.write(s, p, o)
+                writer.close()
+    return digest.hexdigest()
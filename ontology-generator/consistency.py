@@ -0,0 +1,248 @@
+"""
+Consistency checking for generated ontologies.
+
+Three kinds of check are available, selected by a reasoning mode:
+
+- "off": no check at all
+- "structural": a fast pure-Python check of the class and property structure
+  (dangling or empty domains and ranges, functional-property conflicts and
+  cycles in the class and relationship hierarchies)
+- "hermit" / "pellet": a full Java reasoner run on the serialized ontology,
+  stopped when it exceeds a wall-clock budget
+
+Every check returns a result dict that is stored in the generation metadata:
+``{"mode", "consistent", "issues", "error", "seconds"}``. ``consistent`` is
+None when the check was off, failed to run or ran out of time.
+"""
+
+import os
+import gzip
+import time
+import shutil
+import tempfile
+import subprocess
+
+REASONING_MODES = ["off", "structural", "hermit", "pellet"]
+
+# Wall-clock budget of a Java reasoner run, in seconds
+DEFAULT_REASONER_TIMEOUT = 300
+
+# Input formats of the Java reasoners, by file extension
+PELLET_INPUT_FORMATS = {".nt": "N-Triples", ".ttl": "Turtle", ".owl": "RDF/XML"}
+
+
+def check_result(mode, consistent=None, issues=None, error=None, seconds=0.0):
+    """Build a consistency result dict."""
+    return {
+        "mode": mode,
+        "consistent": consistent,
+        "issues": issues or [],
+        "error": error,
+        "seconds": round(seconds, 3),
+    }
+
+
+def new_structure():
+    """
+    Create an empty structure summary for check_structure.
+
+    The summary only uses entity names:
+
+    - "classes": class name -> list of named parent classes
+    - "properties": property name -> {"kind", "domain", "range",
+      "functional", "transitive"}; "kind" is "object" or "data" and data
+      property ranges are datatype names
+    - "restrictions": list of (class, property, target class) for every
+      existential restriction
+    """
+    return {"classes": {}, "properties": {}, "restrictions": []}
+
+
+def structure_from_ontology(onto):
+    """Summarize the classes and properties of an owlready2 ontology."""
+    from owlready2 import Thing, ThingClass, Restriction, SOME, FunctionalProperty, TransitiveProperty
+
+    structure = new_structure()
+    for cls in onto.classes():
+        structure["classes"][cls.name] = [
+            parent.name for parent in cls.is_a if isinstance(parent, ThingClass) and parent is not Thing
+        ]
+        for parent in cls.is_a:
+            if isinstance(parent, Restriction) and parent.type == SOME and isinstance(parent.value, ThingClass):
+                structure["restrictions"].append((cls.name, parent.property.name, parent.value.name))
+
+    for kind, properties in (("object", onto.object_properties()), ("data", onto.data_properties())):
+        for prop in properties:
+            structure["properties"][prop.name] = {
+                "kind": kind,
+                "domain": [d.name for d in prop.domain if isinstance(d, ThingClass)],
+                "range": [r.name if isinstance(r, ThingClass) else getattr(r, "__name__", str(r))
+                          for r in prop.range],
+                "functional": FunctionalProperty in prop.is_a,
+                "transitive": TransitiveProperty in prop.is_a,
+            }
+    return structure
+
+
+def _find_cycles(edges):
+    """
+    Find cycles in a directed graph given as node -> list of successors.
+
+    Returns one node path per back edge found by a depth-first search.
+    """
+    cycles = []
+    state = {}  # node -> 1 while on the DFS stack, 2 once finished
+    for root in edges:
+        if root in state:
+            continue
+        state[root] = 1
+        path = [root]
+        stack = [iter(edges.get(root, ()))]
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                state[path.pop()] = 2
+                stack.pop()
+            elif state.get(node) == 1:
+                cycles.append(path[path.index(node):] + [node])
+            elif node not in state:
+                state[node] = 1
+                path.append(node)
+                stack.append(iter(edges.get(node, ())))
+    return cycles
+
+
+def check_structure(structure):
+    """
+    Run the structural consistency check on a structure summary.
+
+    Errors make the ontology inconsistent; warnings are only reported.
+
+    Args:
+        structure (dict): A summary as described in new_structure.
+
+    Returns:
+        dict: The consistency result.
+    """
+    start = time.perf_counter()
+    classes = structure["classes"]
+    properties = structure["properties"]
+    issues = []
+
+    def issue(check, severity, message):
+        issues.append({"check": check, "severity": severity, "message": message})
+
+    # Classes that something else is declared under
+    has_members = {parent for parents in classes.values() for parent in parents}
+
+    for name, prop in properties.items():
+        ends = [("domain", prop["domain"])]
+        if prop["kind"] == "object":
+            ends.append(("range", prop["range"]))
+        for end, class_names in ends:
+            for class_name in class_names:
+                if class_name not in classes:
+                    issue("dangling_reference", "error", f"{end} of {name} is undeclared class {class_name}")
+                elif class_name not in has_members:
+                    issue("empty_domain_range", "warning", f"{end} of {name} is {class_name}, which has no subclasses")
+
+        if prop["functional"] and prop["transitive"]:
+            issue("functional_conflict", "error", f"{name} is both functional and transitive")
+        if prop["kind"] == "data" and prop["functional"] and len(set(prop["range"])) > 1:
+            issue("functional_conflict", "error",
+                  f"functional data property {name} has several ranges: {', '.join(prop['range'])}")
+
+    # Restrictions by property, and all of them together as the relationship
+    # hierarchy (e.g. family -> order -> class)
+    relations = {}
+    hierarchy = {}
+    for subject, prop_name, target in structure["restrictions"]:
+        if prop_name not in properties:
+            issue("dangling_reference", "error", f"restriction on {subject} uses undeclared property {prop_name}")
+        if target not in classes:
+            issue("dangling_reference", "error", f"restriction on {subject} points to undeclared class {target}")
+        relations.setdefault(prop_name, {}).setdefault(subject, []).append(target)
+        hierarchy.setdefault(subject, []).append(target)
+
+    for prop_name, edges in relations.items():
+        if properties.get(prop_name, {}).get("functional"):
+            for subject, targets in edges.items():
+                if len(set(targets)) > 1:
+                    issue("functional_conflict", "warning",
+                          f"{subject} has several values for functional property {prop_name}: "
+                          f"{', '.join(sorted(set(targets)))}")
+
+    for cycle in _find_cycles(hierarchy):
+        issue("hierarchy_cycle", "error", f"relationship cycle: {' -> '.join(cycle)}")
+
+    for cycle in _find_cycles(classes):
+        issue("hierarchy_cycle", "error", f"subclass cycle: {' -> '.join(cycle)}")
+
+    consistent = not any(i["severity"] == "error" for i in issues)
+    return check_result("structural", consistent, issues, seconds=time.perf_counter() - start)
+
+
+def run_java_reasoner(ontology_path, reasoner="hermit", timeout=DEFAULT_REASONER_TIMEOUT):
+    """
+    Check a serialized ontology with HermiT or Pellet, within a time budget.
+
+    owlready2's sync_reasoner waits for Java indefinitely; this runs the same
+    reasoners on a file in a subprocess that is killed after ``timeout``
+    seconds. Only consistency is checked, no inferred facts are kept.
+
+    Args:
+        ontology_path (str): An .owl (RDF/XML), .nt or .ttl file, or a
+            gzip-compressed one (e.g. .nt.gz), which is decompressed to a
+            temporary file for the reasoner.
+        reasoner (str): "hermit" or "pellet".
+        timeout (float): Wall-clock budget in seconds.
+
+    Returns:
+        dict: The consistency result.
+    """
+    if ontology_path.endswith(".gz"):
+        suffix = os.path.splitext(ontology_path[:-3])[1]
+        fd, plain_path = tempfile.mkstemp(suffix=suffix)
+        try:
+            with os.fdopen(fd, 'wb') as plain, gzip.open(ontology_path, 'rb') as compressed:
+                shutil.copyfileobj(compressed, plain)
+            return run_java_reasoner(plain_path, reasoner, timeout)
+        finally:
+            os.remove(plain_path)
+
+    import owlready2
+    from owlready2 import reasoning
+
+    java = [owlready2.JAVA_EXE, f"-Xmx{reasoning.JAVA_MEMORY}M"]
+    path = os.path.abspath(ontology_path)
+    if reasoner == "hermit":
+        command = java + ["-cp", reasoning._HERMIT_CLASSPATH, "org.semanticweb.HermiT.cli.CommandLine",
+                          "-c", "-O", "-D", "-I", "file:///%s" % path.replace('\\', '/').lstrip('/')]
+        inconsistent_marker = b"Inconsistent ontology"
+    elif reasoner == "pellet":
+        input_format = PELLET_INPUT_FORMATS.get(os.path.splitext(path)[1], "RDF/XML")
+        command = java + ["-cp", reasoning._PELLET_CLASSPATH, "pellet.Pellet", "consistency",
+                          "--loader", "Jena", "--input-format", input_format, "--ignore-imports", path]
+        inconsistent_marker = b"Consistent: No"
+    else:
+        raise ValueError(f"Unknown reasoner: {reasoner}")
+
+    start = time.perf_counter()
+    try:
+        completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return check_result(reasoner, error=f"{reasoner} exceeded its {timeout}s budget",
+                            seconds=time.perf_counter() - start)
+    except OSError as e:
+        return check_result(reasoner, error=f"Could not run {reasoner}: {e}", seconds=time.perf_counter() - start)
+
+    seconds = time.perf_counter() - start
+    output = completed.stdout or b""
+    if inconsistent_marker in output:
+        return check_result(reasoner, False, [{"check": reasoner, "severity": "error",
+                                                "message": "the reasoner found the ontology inconsistent"}],
+                            seconds=seconds)
+    if completed.returncode != 0:
+        message = output.decode("utf-8", errors="replace").strip()[-2000:]
+        return check_result(reasoner, error=f"{reasoner} failed: {message}", seconds=seconds)
+    return check_result(reasoner, True, seconds=seconds)
@@ -0,0 +1,196 @@
+"""
+Streaming CSV ingestion for the ontology generator.
+
+Each input CSV is read exactly once, row by row. Everything a file type needs
+(unique values per column, relationship edges, annotation values and property
+definitions) is collected during that single pass, so memory grows with the
+number of distinct entities in a file rather than with its number of rows.
+"""
+
+import csv
+
+
+def iter_csv_rows(file_path, scan=None):
+    """
+    Yield the rows of a CSV file one at a time as dictionaries.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        scan (dict, optional): If given, its "columns" and "row_count" keys are
+            kept up to date while the rows are consumed.
+    """
+    with open(file_path, mode='r', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        if scan is not None:
+            scan["columns"] = reader.fieldnames or []
+        for row in reader:
+            if scan is not None:
+                scan["row_count"] += 1
+            yield row
+
+
+def _is_true(row, column):
+    """Check whether a boolean-style column holds TRUE for this row."""
+    return bool(column) and column in row and (row[column] or "").upper() == "TRUE"
+
+
+def _value(row, column):
+    """Return a non-empty cell value, or None."""
+    if column and column in row and row[column]:
+        return row[column]
+    return None
+
+
+def _scan_class_rows(rows, file_config, scan):
+    """Collect related-class values, entity names, annotations, keys and lookup references of a class file."""
+    class_column = file_config["class_column"]
+    annotations = file_config.get("annotations", [])
+    lookups = [rel for rel in file_config.get("relationships", []) if rel.get("lookup_file")]
+
+    # Ordered unique values per related class column
+    related = {rel_class["column"]: {} for rel_class in file_config.get("related_classes", [])}
+    # Raw entity name -> stripped name and last non-empty annotation values
+    entities = {}
+    # Key column -> stripped value -> stripped name of the first entity with it
+    keys = scan["keys"]
+    # One {(from_name, value): occurrences} mapping per lookup relationship
+    references = [{} for _ in lookups]
+
+    for row in rows:
+        for column, values in related.items():
+            value = _value(row, column)
+            if value:
+                values.setdefault(value.strip(), None)
+
+        for rel, rel_references in zip(lookups, references):
+            from_name = _value(row, rel["from_column"])
+            value = _value(row, rel["to_column"])
+            if from_name and value:
+                key = (from_name.strip(), value.strip())
+                rel_references[key] = rel_references.get(key, 0) + 1
+
+        name = _value(row, class_column)
+        if not name:
+            continue
+        for column, values in keys.items():
+            value = _value(row, column)
+            if value:
+                values.setdefault(value.strip(), name.strip())
+        entry = entities.get(name)
+        if entry is None:
+            entry = entities[name] = {"name": name.strip(), "annotations": {}}
+        for ann in annotations:
+            value = _value(row, ann["column"])
+            if value:
+                entry["annotations"][ann["property"]] = value
+
+    scan["related"] = {column: list(values) for column, values in related.items()}
+    scan["entities"] = entities
+    scan["references"] = references
+
+
+def _scan_hierarchy_rows(rows, file_config, scan):
+    """Collect unique names per class column and relationship edges of a hierarchy file."""
+    class_columns = file_config.get("class_columns", [])
+    relationships = file_config.get("relationships", [])
+
+    names = {class_info["column"]: {} for class_info in class_columns}
+    # One {(from_name, to_name): occurrences} mapping per relationship entry
+    edges = [{} for _ in relationships]
+
+    for row in rows:
+        for column, values in names.items():
+            value = _value(row, column)
+            if value:
+                values.setdefault(value.strip(), None)
+
+        for rel, rel_edges in zip(relationships, edges):
+            from_name = row.get(rel["from_column"])
+            to_name = row.get(rel["to_column"])
+            # Skip if either name is empty or missing
+            if not from_name or not to_name:
+                print(f"Skipping row with missing names: {row}")
+                continue
+            key = (from_name, to_name)
+            rel_edges[key] = rel_edges.get(key, 0) + 1
+
+    scan["names"] = {column: list(values) for column, values in names.items()}
+    scan["edges"] = edges
+
+
+def _scan_object_property_rows(rows, file_config, scan):
+    """Collect object property definitions."""
+    columns = file_config["columns"]
+    properties = []
+    for row in rows:
+        properties.append({
+            "name": row[columns["property_name"]],
+            "domain": row[columns["domain"]],
+            "range": row[columns["range"]],
+            "transitive": _is_true(row, columns.get("is_transitive")),
+            "functional": _is_true(row, columns.get("is_functional")),
+            "inverse": _value(row, columns.get("inverse_property")),
+            "description": _value(row, columns.get("description")),
+        })
+    scan["properties"] = properties
+
+
+def _scan_data_property_rows(rows, file_config, scan):
+    """Collect data property definitions."""
+    columns = file_config["columns"]
+    properties = []
+    for row in rows:
+        properties.append({
+            "name": row[columns["property_name"]],
+            "domain": row[columns["domain"]],
+            "range": row[columns["range"]],
+            "functional": _is_true(row, columns.get("is_functional")),
+            "description": _value(row, columns.get("description")),
+        })
+    scan["properties"] = properties
+
+
+SCANNERS = {
+    "class": _scan_class_rows,
+    "hierarchy": _scan_hierarchy_rows,
+    "object_properties": _scan_object_property_rows,
+    "data_properties": _scan_data_property_rows,
+}
+
+
+def scan_csv_file(file_path, file_config, key_columns=()):
+    """
+    Read a CSV file once and collect everything its file type needs.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        file_config (dict): The file's entry from the ``files`` list of the config.
+        key_columns (list): Columns other files look this file's entities up
+            by (the task's "key_columns" in the plan).
+
+    Returns:
+        dict: The scan result. Always contains "type", "columns" and
+        "row_count"; the remaining keys depend on the file type:
+
+        - class: "related" (column -> unique values), "entities"
+          (raw name -> {"name", "annotations"}), "keys" (key column ->
+          value -> name of the first entity with it) and "references" (one
+          {(from_name, value): occurrences} mapping per relationship with a
+          "lookup_file")
+        - hierarchy: "names" (column -> unique names) and "edges" (one
+          {(from_name, to_name): occurrences} mapping per relationship)
+        - object_properties / data_properties: "properties" (one definition
+          dict per row)
+    """
+    scan = {"type": file_config["type"], "columns": [], "row_count": 0}
+    if file_config["type"] == "class":
+        scan["keys"] = {column: {} for column in key_columns}
+    scanner = SCANNERS.get(file_config["type"])
+    rows = iter_csv_rows(file_path, scan)
+    if scanner:
+        scanner(rows, file_config, scan)
+    else:
+        # Unknown file types are not processed, only counted
+        for _ in rows:
+            pass
+    return scan
@@ -0,0 +1,60 @@
+"""
+Global entity index for relationships between input files.
+
+A relationship of a class file with a "lookup_file" and a "lookup_column"
+is a foreign key: each row's entity is related to the entity of
+``lookup_file`` whose ``lookup_column`` holds the row's ``to_column`` value.
+While the files are processed, every file that others look values up in
+adds its keys to the index and every lookup relationship adds its
+references. Once all files are read, ``join`` resolves each reference with
+a single hash lookup, so no file is read twice and files are never scanned
+against each other.
+
+Entities are identified by their (safe) names, so both generation engines
+can use the index.
+"""
+
+
+class EntityIndex:
+    """Keys of the entities of every processed file and the references to them."""
+
+    def __init__(self):
+        # (file, column, value) -> entity name
+        self.keys = {}
+        # (property, from entity, lookup file, lookup column, value) -> occurrences
+        self.references = {}
+        self.duplicate_keys = 0
+        self.unresolved = 0
+
+    def add_key(self, file_name, column, value, name):
+        """Index an entity of ``file_name`` by the value of one of its key columns; the first entity wins."""
+        key = (file_name, column, value)
+        if key in self.keys:
+            if self.keys[key] != name:
+                self.duplicate_keys += 1
+            return
+        self.keys[key] = name
+
+    def add_reference(self, prop_name, from_name, lookup_file, lookup_column, value, occurrences=1):
+        """Record that ``from_name`` relates through ``prop_name`` to the entity ``value`` identifies."""
+        key = (prop_name, from_name, lookup_file, lookup_column, value)
+        self.references[key] = self.references.get(key, 0) + occurrences
+
+    def join(self):
+        """
+        Resolve the recorded references against the keys.
+
+        Yields:
+            tuple: (property name, from entity name, to entity name,
+            occurrences) for each reference whose key exists, in the order
+            the references were recorded. References without a matching key
+            are counted in ``unresolved``.
+        """
+        for (prop_name, from_name, lookup_file, lookup_column, value), occurrences in self.references.items():
+            to_name = self.keys.get((lookup_file, lookup_column, value))
+            if to_name is None:
+                print(f"Warning: No {lookup_file} entity has {lookup_column} = {value} "
+                      f"(referenced by {from_name} through {prop_name})")
+                self.unresolved += 1
+                continue
+            yield prop_name, from_name, to_name, occurrences
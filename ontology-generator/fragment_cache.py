@@ -0,0 +1,114 @@
+"""
+On-disk cache of per-file ontology fragments.
+
+A fragment is the stream of builder operations one input CSV produces (see
+``ontology_triples.file_fragment``). It only depends on the CSV content, the
+file's ``files[]`` config entry and the ontology IRI, so it is stored under a
+hash of exactly those. When a spreadsheet changes, only the worksheets whose
+hash changed have to be read and turned into triples again; every other
+fragment is replayed from the cache.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+# Bump when the fragment operations change so old cache entries are ignored
+FRAGMENT_FORMAT = 4
+
+# Entries not used for this long are removed by prune()
+FRAGMENT_MAX_AGE = 7 * 24 * 3600
+
+
+def fragment_key(file_path, file_config, ontology_iri, key_columns=()):
+    """
+    Hash a CSV file together with the config entry it is processed with.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        file_config (dict): The file's entry from the ``files`` list of the config.
+        ontology_iri (str): Base IRI of the ontology.
+        key_columns (list): Columns other files look the file's entities up by.
+
+    Returns:
+        str: Hex digest identifying the fragment.
+    """
+    digest = hashlib.sha256()
+    header = {"format": FRAGMENT_FORMAT, "ontology_iri": ontology_iri, "file": file_config}
+    if key_columns:
+        header["key_columns"] = list(key_columns)
+    digest.update(json.dumps(header, sort_keys=True).encode('utf-8'))
+    digest.update(b"\0")
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FragmentCache:
+    """A directory of cached fragments, one JSON-lines file per fragment key."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.jsonl")
+
+    def load(self, key):
+        """
+        Return the cached operations for a key, or None if there are none.
+
+        The operations are read lazily, one line at a time.
+        """
+        path = self.path(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Refresh the modification time so prune() keeps fragments in use
+        os.utime(path)
+        return self._read(path)
+
+    def _read(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield tuple(json.loads(line))
+
+    def store(self, key, ops):
+        """
+        Pass operations through while writing them to the cache.
+
+        The entry only becomes visible once every operation was consumed, so
+        a failed run never leaves a partial fragment behind.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for op in ops:
+                    f.write(json.dumps(op))
+                    f.write("\n")
+                    yield op
+            os.replace(temp_path, self.path(key))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def prune(self, max_age=FRAGMENT_MAX_AGE):
+        """
+        Remove fragments that have not been used for ``max_age`` seconds.
+
+        Returns:
+            int: Number of fragments removed.
+        """
+        cutoff = time.time() - max_age
+        removed = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith((".jsonl", ".tmp")) and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        return removed
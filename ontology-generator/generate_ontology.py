@@ -1,12 +1,45 @@
-import csv
+import io
 import os
 import json
+import queue
+import itertools
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from owlready2 import *
+from csv_ingest import scan_csv_file
+from entity_index import EntityIndex
+from iri_minting import NameTable, normalize_name, load_name_table, save_name_table
+from ontology_triples import split_format, open_output, open_writer, NTriplesConverter, write_ontology_triples
+from output_formats import ENGINE_FORMATS, DEFAULT_FORMATS, DEFAULT_CHUNK_SIZE, output_extension
+# Re-exported for callers that imported them from here before output_formats existed
+from output_formats import MEDIA_TYPES, output_format_of, stream_ontology_file
+from consistency import (REASONING_MODES, DEFAULT_REASONER_TIMEOUT, check_result, check_structure,
+                         structure_from_ontology, run_java_reasoner)
+from profiling import GenerationProfile, format_profile
+from generation_plan import load_plan, hierarchy_encoding
+from input_validation import VALIDATION_MODES, validate_inputs, format_validation, blocking_issues
+from canonical import write_canonical
 
-# Set Owlready2 to store the ontology in memory
-onto_path.append(".")
 ONTOLOGY_IRI = "http://www.example.org/biodiversity-ontology"
 
+# Consistency check run by each engine unless another reasoning mode is given
+DEFAULT_REASONING = {"owlready2": "hermit", "triples": "off"}
+
+# Quadstore backends for the per-generation owlready2 World
+WORLD_BACKENDS = ["memory", "sqlite"]
+
+# Serializes the removal of closed Worlds from owlready2's entity cache
+_entity_cache_lock = threading.Lock()
+
+# Settings of the disk-backed ("sqlite") quadstore
+QUADSTORE_DEFAULTS = {
+    "cache_mb": 64,         # SQLite page cache (owlready2 otherwise uses 200 MB)
+    "mmap_mb": 0,           # Memory-mapped I/O (owlready2 otherwise maps up to 30 GB)
+    "commit_every": 10000,  # Commit after this many created entities
+    "path": None,           # Keep the quadstore in this file instead of a temporary one
+}
+
 def load_config(config_path):
     """Load the ontology configuration from a JSON file."""
     try:
@@ -15,10 +48,80 @@ def load_config(config_path):
     except Exception as e:
         raise ValueError(f"Failed to load configuration file: {e}")
 
-def create_base_ontology(config):
-    """Create the base ontology with classes and annotation properties."""
+def open_world(backend="memory", options=None):
+    """
+    Create an isolated owlready2 World for a single generation.
+
+    Args:
+        backend (str): "memory" keeps the quadstore in memory; "sqlite" backs it
+            with a SQLite file, which keeps large generations out of RAM.
+        options (dict, optional): Settings of the "sqlite" backend, see
+            QUADSTORE_DEFAULTS.
+
+    Returns:
+        tuple: The World and the path of its temporary SQLite file (None in
+        memory, or when the quadstore is kept at ``options["path"]``).
+    """
+    if backend not in WORLD_BACKENDS:
+        raise ValueError(f"Unknown world backend: {backend}")
+    if backend != "sqlite":
+        return World(), None
+
+    options = {**QUADSTORE_DEFAULTS, **(options or {})}
+    if options["path"]:
+        if os.path.exists(options["path"]):
+            raise ValueError(f"Quadstore file already exists: {options['path']}")
+        sqlite_file = None
+        world = World(filename=options["path"])
+    else:
+        fd, sqlite_file = tempfile.mkstemp(prefix="ontology_world_", suffix=".sqlite3")
+        os.close(fd)
+        os.remove(sqlite_file)  # owlready2 creates the database itself
+        world = World(filename=sqlite_file)
+
+    world.graph.execute(f"PRAGMA cache_size = -{int(options['cache_mb'] * 1024)}")
+    world.graph.execute(f"PRAGMA mmap_size = {int(options['mmap_mb'] * 1024 * 1024)}")
+    return world, sqlite_file
+
+def close_world(world, sqlite_file=None):
+    """
+    Close a World created by open_world and delete its SQLite file.
+
+    owlready2 keeps the last 65536 created entities, of every World, in a
+    module-level cache; the closed World's entries are dropped from it so
+    the World can be garbage collected instead of staying alive until
+    other generations have pushed them out.
+    """
+    try:
+        world.close()
+    except Exception as e:
+        print(f"Warning: Failed to close world: {e}")
+
+    import owlready2.namespace
+    cache = owlready2.namespace._cache
+    with _entity_cache_lock:
+        for i, entity in enumerate(cache):
+            if entity is not None and getattr(getattr(entity, "namespace", None), "world", None) is world:
+                # Generations running in other threads keep adding entities;
+                # if one took this slot meanwhile, dropping it early is
+                # harmless, owlready2 evicts cache entries all the time
+                if cache[i] is entity:
+                    cache[i] = None
+
+    if sqlite_file:
+        for path in (sqlite_file, f"{sqlite_file}-journal"):
+            if os.path.exists(path):
+                os.remove(path)
+
+def create_base_ontology(config, world=None):
+    """Create the base ontology with classes and annotation properties.
+
+    ``config`` is the loaded configuration or its compiled plan; only the
+    base classes and annotation properties are used. The ontology is created
+    in ``world``, or in owlready2's ``default_world`` when no World is given.
+    """
     print("Creating base ontology...")
-    onto = get_ontology(ONTOLOGY_IRI)
+    onto = (world or default_world).get_ontology(ONTOLOGY_IRI)
     
     with onto:
         # Create base classes
@@ -57,321 +160,886 @@ def create_base_ontology(config):
     print("Base ontology annotation properties:", [prop.__name__ for prop in onto.annotation_properties()])
     return onto
 
-def process_csv_file(onto, file_path, file_config, directory_path, all_entities):
-    """Process a single CSV file based on its configuration."""
+class EntityRegistry:
+    """
+    Name and IRI index of the entities of one generation.
+
+    Looking an entity up with ``getattr(onto, name)`` queries the quadstore
+    every time; the registry answers the same question from a dictionary.
+    Every entity the generator creates goes through ``new_class`` so the
+    index stays complete. Entities made from CSV values are named by
+    ``mint`` through the name table of the generation (see iri_minting);
+    every other name the registry sees is reserved in it.
+
+    With ``keep_entities=False`` (the disk-backed mode) only storids are
+    indexed and entities are loaded back from the quadstore when needed, so
+    owlready2 can drop the Python objects of entities that are not in use.
+    ``commit_every`` commits the quadstore after that many created entities.
+    """
+
+    def __init__(self, onto, keep_entities=True, commit_every=None, names=None):
+        self.onto = onto
+        self.keep_entities = keep_entities
+        self.commit_every = commit_every
+        self.created = 0
+        self.by_name = {}
+        self.names = names if names is not None else NameTable()
+        # Index whatever the ontology already holds, e.g. the base classes
+        for entity in itertools.chain(onto.classes(), onto.properties()):
+            self.register(entity)
+
+    def register(self, entity):
+        self.names.reserve(entity.name)
+        self.by_name[entity.name] = entity if self.keep_entities else entity.storid
+        return entity
+
+    def get(self, name, default=None):
+        """Return the entity with this name, or ``default``."""
+        entity = self.by_name.get(name)
+        if entity is None:
+            return default
+        if not self.keep_entities:
+            entity = self.onto.world._get_by_storid(entity)
+        return entity
+
+    def get_iri(self, iri, default=None):
+        """Return the entity with this full IRI, or ``default``."""
+        if not iri.startswith(self.onto.base_iri):
+            return default
+        return self.get(iri[len(self.onto.base_iri):], default)
+
+    def mint(self, value, class_name):
+        """Return the entity name of a CSV value of a class."""
+        return self.names.mint(value, class_name)
+
+    def new_class(self, name, bases):
+        """Create (or extend, if it exists) an entity in the ontology and index it."""
+        with self.onto:
+            entity = types.new_class(name, bases)
+        if entity is not None:
+            self.register(entity)
+            self.created += 1
+            if self.commit_every and self.created % self.commit_every == 0:
+                self.onto.world.graph.commit()
+        return entity
+
+def process_csv_file(onto, file_path, file_config, directory_path, index=None, registry=None, stats=None, scan=None,
+                     key_columns=()):
+    """Process a single CSV file based on its configuration.
+
+    The file is read once by ``scan_csv_file``, unless its ``scan`` is given
+    (e.g. read in a worker process); entities are then created from the
+    collected values without keeping the rows in memory. Entities are
+    looked up and created through ``registry`` (one is built from ``onto``
+    if none is given). Counters such as "duplicate_edges" are added to
+    ``stats`` when it is given.
+
+    A class file adds the keys of its entities (by ``key_columns``) and its
+    lookup relationships to ``index``, an EntityIndex; join_references
+    turns them into restrictions once every file was processed.
+    """
     print(f"Processing file: {file_path}")
     if not os.path.exists(file_path):
         print(f"Warning: {file_path} not found.")
         return onto, {}
 
+    if registry is None:
+        registry = EntityRegistry(onto)
+
     file_type = file_config["type"]
     entities = {}
 
-    with open(file_path, mode='r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        rows = list(reader)  # Store rows for multiple passes
-        print(f"CSV columns: {reader.fieldnames}")
+    if scan is None:
+        scan = scan_csv_file(file_path, file_config, key_columns)
+    print(f"CSV columns: {scan['columns']} ({scan['row_count']} rows)")
+    if stats is not None:
+        stats["rows"] = stats.get("rows", 0) + scan["row_count"]
+
+    if file_type == "class":
+        # Create instances or subclasses for a class
+        class_type = file_config["class_type"]
+        class_obj = registry.get(class_type)
+        if not class_obj:
+            # Default to Thing if parent class can't be determined
+            parent_name = "Habitat" if "Habitat" in class_type else "Thing"
+            parent = registry.get(parent_name, Thing)
+            print(f"Creating class {class_type} with parent {parent.__name__}")
+            class_obj = registry.new_class(class_type, (parent,))
+            if class_obj is None:
+                print(f"Error: Failed to create class {class_type}")
+                return onto, entities
+
+        # Create related classes (e.g., Continent for Countries)
+        for rel_class in file_config.get("related_classes", []):
+            rel_class_type = rel_class["class"]
+            rel_class_obj = registry.get(rel_class_type)
+            if not rel_class_obj:
+                print(f"Creating related class {rel_class_type}")
+                rel_class_obj = registry.new_class(rel_class_type, (Thing,))
+                if rel_class_obj is None:
+                    print(f"Error: Failed to create related class {rel_class_type}")
+                    continue
+
+            # Unique values for the related class were collected during the scan
+            for value in scan["related"][rel_class["column"]]:
+                safe_name = registry.mint(value, rel_class_type)
+                print(f"Creating related entity {safe_name} for {rel_class_type}")
+                entity = registry.new_class(safe_name, (rel_class_obj,))
+                if entity is None:
+                    print(f"Error: Failed to create entity {safe_name} for {rel_class_type}")
+                elif registry.keep_entities:
+                    entities[value] = entity
+
+        # Resolve the annotation properties once for the whole file
+        annotations = [(ann["property"], registry.get(ann["property"]))
+                       for ann in file_config.get("annotations", [])]
 
-        if file_type == "class":
-            # Create instances or subclasses for a class
-            class_column = file_config["class_column"]
-            class_type = file_config["class_type"]
-            class_obj = getattr(onto, class_type, None)
+        # Create main class entities
+        for raw_name, entry in scan["entities"].items():
+            safe_name = registry.mint(entry["name"], class_type)
+            print(f"Creating entity {safe_name} for {class_type}")
+            entity = registry.new_class(safe_name, (class_obj,))
+            if entity is None:
+                print(f"Error: Failed to create entity {safe_name} for {class_type}")
+                continue
+
+            if registry.keep_entities:
+                entities[raw_name] = entity
+
+            # Add annotations
+            for prop_name, prop in annotations:
+                value = entry["annotations"].get(prop_name)
+                if prop and value:
+                    print(f"Adding annotation {prop_name} = {value} to {safe_name}")
+                    setattr(entity, prop_name, [value])
+                elif not prop:
+                    print(f"Warning: Annotation property {prop_name} not found.")
+
+        # Keys and lookups are joined once every file was processed
+        if index is not None:
+            for column, values in scan["keys"].items():
+                for value, name in values.items():
+                    index.add_key(file_config["name"], column, value, registry.mint(name, class_type))
+            lookups = [rel for rel in file_config.get("relationships", []) if rel.get("lookup_file")]
+            for rel, references in zip(lookups, scan["references"]):
+                for (from_name, value), occurrences in references.items():
+                    from_entity = registry.names.get(from_name, class_type) or normalize_name(from_name)
+                    index.add_reference(rel["property"], from_entity, rel["lookup_file"],
+                                        rel["lookup_column"], value, occurrences)
+
+    elif file_type == "hierarchy":
+        # Create classes and relationships for a hierarchy; names are
+        # resolved by column, and for the whole file
+        column_entities = {}
+        class_entities = {}
+        for class_info in file_config.get("class_columns", []):
+            class_type = class_info["class"]
+            class_obj = registry.get(class_type)
             if not class_obj:
-                # Default to Thing if parent class can't be determined
-                parent_name = "Habitat" if "Habitat" in class_type else "Thing"
-                parent = getattr(onto, parent_name, Thing)
+                # Try to get TaxonomicRank or default to Thing
+                parent = registry.get("TaxonomicRank", Thing)
                 print(f"Creating class {class_type} with parent {parent.__name__}")
-                class_obj = types.new_class(class_type, (parent,))
+                class_obj = registry.new_class(class_type, (parent,))
                 if class_obj is None:
                     print(f"Error: Failed to create class {class_type}")
-                    return onto, entities
-
-            # Create related classes (e.g., Continent for Countries)
-            for rel_class in file_config.get("related_classes", []):
-                rel_column = rel_class["column"]
-                rel_class_type = rel_class["class"]
-                rel_class_obj = getattr(onto, rel_class_type, None)
-                if not rel_class_obj:
-                    print(f"Creating related class {rel_class_type}")
-                    rel_class_obj = types.new_class(rel_class_type, (Thing,))
-                    if rel_class_obj is None:
-                        print(f"Error: Failed to create related class {rel_class_type}")
-                        continue
-                
-                # Collect unique values for related class
-                rel_values = set(row[rel_column].strip() for row in rows if rel_column in row and row[rel_column])
-                for value in rel_values:
-                    safe_name = value.replace(' ', '_')
-                    print(f"Creating related entity {safe_name} for {rel_class_type}")
-                    entity = types.new_class(safe_name, (rel_class_obj,))
-                    if entity is not None:
-                        entities[value] = entity
-                    else:
-                        print(f"Error: Failed to create entity {safe_name} for {rel_class_type}")
-
-            # Create main class entities
-            for row in rows:
-                if class_column in row and row[class_column]:
-                    safe_name = row[class_column].strip().replace(' ', '_')
-                    print(f"Creating entity {safe_name} for {class_type}")
-                    entity = types.new_class(safe_name, (class_obj,))
-                    if entity is None:
-                        print(f"Error: Failed to create entity {safe_name} for {class_type}")
-                        continue
-                    
-                    entities[row[class_column]] = entity
-
-                    # Add annotations
-                    for ann in file_config.get("annotations", []):
-                        prop = getattr(onto, ann["property"], None)
-                        if prop and ann["column"] in row and row[ann["column"]]:
-                            print(f"Adding annotation {ann['property']} = {row[ann['column']]} to {safe_name}")
-                            setattr(entity, ann["property"], [row[ann["column"]]])
-                        elif not prop:
-                            print(f"Warning: Annotation property {ann['property']} not found.")
-
-        elif file_type == "hierarchy":
-            # Create classes and relationships for a hierarchy
-            class_entities = {}
-            for class_info in file_config.get("class_columns", []):
-                class_type = class_info["class"]
-                class_obj = getattr(onto, class_type, None)
-                if not class_obj:
-                    # Try to get TaxonomicRank or default to Thing
-                    parent = getattr(onto, "TaxonomicRank", Thing)
-                    print(f"Creating class {class_type} with parent {parent.__name__}")
-                    class_obj = types.new_class(class_type, (parent,))
-                    if class_obj is None:
-                        print(f"Error: Failed to create class {class_type}")
-                        continue
+                    continue
 
-                # Collect unique names
-                names = set()
-                for row in rows:
-                    if class_info["column"] in row and row[class_info["column"]]:
-                        names.add(row[class_info["column"]].strip())
-
-                # Create classes
-                for name in names:
-                    safe_name = name.replace(' ', '_')
-                    print(f"Creating entity {safe_name} for {class_type}")
-                    entity = types.new_class(safe_name, (class_obj,))
-                    if entity is None:
-                        print(f"Error: Failed to create entity {safe_name} for {class_type}")
-                        continue
-                    
-                    class_entities[name] = entity
+            # Create classes
+            names = column_entities.setdefault(class_info["column"], {})
+            for name in scan["names"][class_info["column"]]:
+                safe_name = registry.mint(name, class_type)
+                print(f"Creating entity {safe_name} for {class_type}")
+                entity = registry.new_class(safe_name, (class_obj,))
+                if entity is None:
+                    print(f"Error: Failed to create entity {safe_name} for {class_type}")
+                    continue
+
+                # Only the name is kept; the registry gives the entity back
+                names[name] = class_entities[name] = safe_name
+                if registry.keep_entities:
                     entities[name] = entity
 
-            # Create relationships
-            for rel in file_config.get("relationships", []):
-                prop_name = rel["property"]
-                # Create the property if it doesn't exist
-                prop = getattr(onto, prop_name, None)
-                if not prop:
-                    print(f"Creating object property {prop_name} for hierarchy relationship")
-                    with onto:
-                        prop = types.new_class(prop_name, (ObjectProperty,))
-                    if prop is None:
-                        print(f"Error: Failed to create property {prop_name}")
-                        continue
+        # Create relationships
+        materialized = set()
+        duplicate_edges = 0
+        for rel, rel_edges in zip(file_config.get("relationships", []), scan["edges"]):
+            prop_name = rel["property"]
+            encoding = hierarchy_encoding(rel)
+            # Create the property if it doesn't exist; a plain subclass link needs none
+            prop = registry.get(prop_name)
+            if not prop and encoding != "subclass":
+                kind = ObjectProperty if encoding == "restriction" else AnnotationProperty
+                print(f"Creating {kind.__name__} {prop_name} for hierarchy relationship")
+                prop = registry.new_class(prop_name, (kind,))
+                if prop is None:
+                    print(f"Error: Failed to create property {prop_name}")
+                    continue
 
-                for row in rows:
-                    from_name = row.get(rel["from_column"])
-                    to_name = row.get(rel["to_column"])
-                    # Skip if either name is empty or missing
-                    if not from_name or not to_name:
-                        print(f"Skipping row with missing names: {row}")
+            # Each (property, from, to) edge becomes a single restriction, however
+            # many rows repeat it
+            from_entities = column_entities.get(rel["from_column"], class_entities)
+            to_entities = column_entities.get(rel["to_column"], class_entities)
+            for (from_name, to_name), occurrences in rel_edges.items():
+                if from_name in from_entities and to_name in to_entities:
+                    edge = (prop_name, from_entities[from_name], to_entities[to_name])
+                    if edge in materialized:
+                        duplicate_edges += occurrences
+                        continue
+                    materialized.add(edge)
+                    duplicate_edges += occurrences - 1
+                    from_entity = registry.get(edge[1])
+                    to_entity = registry.get(edge[2])
+                    if from_entity is None or to_entity is None:
+                        print(f"Warning: Entity is None for {from_name} or {to_name}")
                         continue
-                    if from_name in class_entities and to_name in class_entities:
-                        from_entity = class_entities[from_name]
-                        to_entity = class_entities[to_name]
-                        if from_entity is None or to_entity is None:
-                            print(f"Warning: Entity is None for {from_name} or {to_name} in row {row}")
+                    print(f"Creating relationship {prop_name} from {from_name} to {to_name}")
+                    try:
+                        if encoding == "restriction":
+                            from_entity.is_a.append(prop.some(to_entity))
                             continue
-                        print(f"Creating relationship {prop_name} from {from_name} to {to_name}")
-                        try:
-                            restriction = prop.some(to_entity)
-                            from_entity.is_a.append(restriction)
-                        except Exception as e:
-                            print(f"Error creating relationship: {e}")
-                    else:
-                        print(f"Warning: Entity {from_name} or {to_name} not found in class_entities for row {row}")
-
-        elif file_type == "object_properties":
-            # Create object properties
-            columns = file_config["columns"]
-            for row in rows:
-                prop_name = row[columns["property_name"]]
-                domain_name = row[columns["domain"]]
-                range_name = row[columns["range"]]
-
-                # Get or create the domain class
-                domain_class = getattr(onto, domain_name, None)
-                if not domain_class:
-                    print(f"Creating domain class {domain_name}")
-                    domain_class = types.new_class(domain_name, (Thing,))
-                if domain_class is None:
-                    print(f"Error: Failed to create domain class {domain_name}")
-                    continue
+                        # A parent that is a subclass of the entity would make a cycle
+                        if issubclass(to_entity, from_entity):
+                            print(f"Warning: {edge[2]} is a subclass of {edge[1]}; not added as its parent")
+                        elif to_entity not in from_entity.is_a:
+                            from_entity.is_a.append(to_entity)
+                        if encoding == "subclass_annotation" and \
+                                not onto._has_obj_triple_spo(from_entity.storid, prop.storid, to_entity.storid):
+                            onto._add_obj_triple_spo(from_entity.storid, prop.storid, to_entity.storid)
+                    except Exception as e:
+                        print(f"Error creating relationship: {e}")
+                else:
+                    print(f"Warning: Entity {from_name} or {to_name} not found in class_entities")
 
-                # Get or create the range class
-                range_class = getattr(onto, range_name, None)
-                if not range_class:
-                    print(f"Creating range class {range_name}")
-                    range_class = types.new_class(range_name, (Thing,))
-                if range_class is None:
-                    print(f"Error: Failed to create range class {range_name}")
-                    continue
+        if duplicate_edges:
+            print(f"Collapsed {duplicate_edges} duplicate hierarchy edges")
+        if stats is not None:
+            stats["duplicate_edges"] = stats.get("duplicate_edges", 0) + duplicate_edges
 
-                # Create the object property
-                print(f"Creating object property {prop_name} ({domain_name} -> {range_name})")
-                with onto:
-                    # Ensure ObjectProperty is imported
-                    new_prop = types.new_class(prop_name, (ObjectProperty,))
-                
-                if new_prop is None:
-                    print(f"Error: Failed to create property {prop_name}")
-                    continue
+    elif file_type == "object_properties":
+        # Create object properties
+        for definition in scan["properties"]:
+            prop_name = definition["name"]
+            domain_name = definition["domain"]
+            range_name = definition["range"]
 
-                # Set domain and range
-                new_prop.domain.append(domain_class)
-                new_prop.range.append(range_class)
-
-                # Optional attributes
-                if columns.get("is_transitive") in row and row[columns["is_transitive"]].upper() == "TRUE":
-                    new_prop.is_a.append(TransitiveProperty)
-                if columns.get("is_functional") in row and row[columns["is_functional"]].upper() == "TRUE":
-                    new_prop.is_a.append(FunctionalProperty)
-                if columns.get("description") in row and row[columns["description"]]:
-                    new_prop.comment.append(row[columns["description"]])
-
-                # Handle inverse property if specified
-                if columns.get("inverse_property") in row and row[columns["inverse_property"]]:
-                    inv_prop_name = row[columns["inverse_property"]]
-                    inv_prop = getattr(onto, inv_prop_name, None)
-                    if not inv_prop:
-                        print(f"Creating inverse property {inv_prop_name}")
-                        with onto:
-                            inv_prop = types.new_class(inv_prop_name, (ObjectProperty,))
-                    if inv_prop is None:
-                        print(f"Warning: Failed to create inverse property {inv_prop_name}. Skipping inverse relationship.")
-                        continue
-                    inv_prop.domain.append(range_class)
-                    inv_prop.range.append(domain_class)
-                    new_prop.inverse_property = inv_prop
-                    inv_prop.inverse_property = new_prop
-
-        elif file_type == "data_properties":
-            # Create data properties
-            columns = file_config["columns"]
-            for row in rows:
-                prop_name = row[columns["property_name"]]
-                domain_name = row[columns["domain"]]
-                range_type = row[columns["range"]]
-
-                # Get or create the domain class
-                domain_class = getattr(onto, domain_name, None)
-                if not domain_class:
-                    print(f"Creating domain class {domain_name}")
-                    domain_class = types.new_class(domain_name, (Thing,))
-                if domain_class is None:
-                    print(f"Error: Failed to create domain class {domain_name}")
-                    continue
+            # Get or create the domain class
+            domain_class = registry.get(domain_name)
+            if not domain_class:
+                print(f"Creating domain class {domain_name}")
+                domain_class = registry.new_class(domain_name, (Thing,))
+            if domain_class is None:
+                print(f"Error: Failed to create domain class {domain_name}")
+                continue
+
+            # Get or create the range class
+            range_class = registry.get(range_name)
+            if not range_class:
+                print(f"Creating range class {range_name}")
+                range_class = registry.new_class(range_name, (Thing,))
+            if range_class is None:
+                print(f"Error: Failed to create range class {range_name}")
+                continue
 
-                # Create the data property
-                print(f"Creating data property {prop_name} ({domain_name} -> {range_type})")
-                with onto:
-                    if columns.get("is_functional") in row and row[columns["is_functional"]].upper() == "TRUE":
-                        new_prop = types.new_class(prop_name, (DataProperty, FunctionalProperty))
-                    else:
-                        new_prop = types.new_class(prop_name, (DataProperty,))
-                
-                if new_prop is None:
-                    print(f"Error: Failed to create data property {prop_name}")
+            # Create the object property
+            print(f"Creating object property {prop_name} ({domain_name} -> {range_name})")
+            new_prop = registry.new_class(prop_name, (ObjectProperty,))
+
+            if new_prop is None:
+                print(f"Error: Failed to create property {prop_name}")
+                continue
+
+            # Set domain and range
+            new_prop.domain.append(domain_class)
+            new_prop.range.append(range_class)
+
+            # Optional attributes
+            if definition["transitive"]:
+                new_prop.is_a.append(TransitiveProperty)
+            if definition["functional"]:
+                new_prop.is_a.append(FunctionalProperty)
+            if definition["description"]:
+                new_prop.comment.append(definition["description"])
+
+            # Handle inverse property if specified
+            if definition["inverse"]:
+                inv_prop_name = definition["inverse"]
+                inv_prop = registry.get(inv_prop_name)
+                if not inv_prop:
+                    print(f"Creating inverse property {inv_prop_name}")
+                    inv_prop = registry.new_class(inv_prop_name, (ObjectProperty,))
+                if inv_prop is None:
+                    print(f"Warning: Failed to create inverse property {inv_prop_name}. Skipping inverse relationship.")
                     continue
+                inv_prop.domain.append(range_class)
+                inv_prop.range.append(domain_class)
+                new_prop.inverse_property = inv_prop
+                inv_prop.inverse_property = new_prop
 
-                # Set domain and range
-                new_prop.domain.append(domain_class)
-                if range_type == "string":
-                    new_prop.range.append(str)
-                elif range_type == "float":
-                    new_prop.range.append(float)
-                elif range_type == "integer":
-                    new_prop.range.append(int)
-                else:
-                    new_prop.range.append(str)
+    elif file_type == "data_properties":
+        # Create data properties
+        for definition in scan["properties"]:
+            prop_name = definition["name"]
+            domain_name = definition["domain"]
+            range_type = definition["range"]
 
-                # Optional description
-                if columns.get("description") in row and row[columns["description"]]:
-                    new_prop.comment.append(row[columns["description"]])
+            # Get or create the domain class
+            domain_class = registry.get(domain_name)
+            if not domain_class:
+                print(f"Creating domain class {domain_name}")
+                domain_class = registry.new_class(domain_name, (Thing,))
+            if domain_class is None:
+                print(f"Error: Failed to create domain class {domain_name}")
+                continue
+
+            # Create the data property
+            print(f"Creating data property {prop_name} ({domain_name} -> {range_type})")
+            if definition["functional"]:
+                new_prop = registry.new_class(prop_name, (DataProperty, FunctionalProperty))
+            else:
+                new_prop = registry.new_class(prop_name, (DataProperty,))
+
+            if new_prop is None:
+                print(f"Error: Failed to create data property {prop_name}")
+                continue
+
+            # Set domain and range
+            new_prop.domain.append(domain_class)
+            if range_type == "string":
+                new_prop.range.append(str)
+            elif range_type == "float":
+                new_prop.range.append(float)
+            elif range_type == "integer":
+                new_prop.range.append(int)
+            else:
+                new_prop.range.append(str)
+
+            # Optional description
+            if definition["description"]:
+                new_prop.comment.append(definition["description"])
 
     return onto, entities
 
-def generate_ontology_from_directory(directory_path, config_path="ontology_config.json", ontology_name="biodiversity-ontology"):
-    """Generate ontology from CSV files in the specified directory using a configuration file."""
-    original_dir = os.getcwd()
-    os.chdir(directory_path)
+def join_references(registry, index):
+    """
+    Turn the lookups between files recorded in ``index`` into restrictions.
+
+    Each resolved lookup adds ``prop.some(to_entity)`` to its entity, once
+    per (property, from, to).
+
+    Returns:
+        int: Number of restrictions added.
+    """
+    joined = set()
+    for prop_name, from_name, to_name, _ in index.join():
+        if (prop_name, from_name, to_name) in joined:
+            continue
+        prop = registry.get(prop_name)
+        from_entity = registry.get(from_name)
+        to_entity = registry.get(to_name)
+        if prop is None or from_entity is None or to_entity is None:
+            print(f"Warning: Entity not found for relationship {prop_name} from {from_name} to {to_name}")
+            continue
+        print(f"Creating relationship {prop_name} from {from_name} to {to_name}")
+        try:
+            from_entity.is_a.append(prop.some(to_entity))
+        except Exception as e:
+            print(f"Error creating relationship: {e}")
+            continue
+        joined.add((prop_name, from_name, to_name))
+    return len(joined)
 
+def save_ontology(onto, output_path, output_format="rdfxml"):
+    """
+    Serialize an owlready2 ontology in any of the owlready2 engine's formats.
+
+    owlready2 writes RDF/XML and N-Triples itself; Turtle is converted from
+    its N-Triples output while it is written, and "-gzip" formats are
+    compressed on the fly.
+
+    Args:
+        onto: The ontology to save.
+        output_path: File to write, or a binary file-like object to write into.
+        output_format (str): A format of ENGINE_FORMATS["owlready2"].
+    """
+    serialization, _ = split_format(output_format)
+    if serialization == "turtle":
+        with open_output(output_path, output_format) as f:
+            converter = NTriplesConverter(open_writer(f, serialization, onto.base_iri.rstrip("#")))
+            onto.save(file=converter, format="ntriples")
+            converter.close()
+    else:
+        with open_output(output_path, output_format, 'wb') as f:
+            onto.save(file=f, format=serialization)
+
+def export_quadstore(quadstore_path, output_path, output_format="rdfxml"):
+    """
+    Serialize the ontology of a quadstore kept by a disk-backed generation.
+
+    Args:
+        quadstore_path (str): The ``path`` the quadstore was kept at.
+        output_path (str): File to write.
+        output_format (str): A format of ENGINE_FORMATS["owlready2"].
+    """
+    if not os.path.exists(quadstore_path):
+        raise ValueError(f"Quadstore file not found: {quadstore_path}")
+    world = World(filename=quadstore_path)
     try:
-        # Load configuration
+        save_ontology(world.get_ontology(ONTOLOGY_IRI), output_path, output_format)
+    finally:
+        close_world(world)
+
+def report_consistency(result):
+    """Print the outcome of a consistency check."""
+    print(f"Consistency check ({result['mode']}) took {result['seconds']}s")
+    for issue in result["issues"]:
+        print(f"{issue['severity'].capitalize()}: {issue['message']}")
+    if result["error"]:
+        print(f"Consistency check did not complete: {result['error']}")
+    elif result["consistent"]:
+        print("Ontology is consistent!")
+    else:
+        print("Reasoner found inconsistencies")
+
+def _output_file_path(output):
+    """Return the path of the file behind a file-like object, if it has one on disk."""
+    name = getattr(output, "name", None)
+    return name if isinstance(name, str) and os.path.isfile(name) else None
+
+def generate_ontology_from_directory(directory_path, config_path="ontology_config.json", ontology_name="biodiversity-ontology",
+                                     engine="owlready2", output_format=None, world_backend="memory",
+                                     cache_dir=None, metadata=None, reasoning=None,
+                                     reasoner_timeout=DEFAULT_REASONER_TIMEOUT, quadstore=None, output=None,
+                                     workers=1, canonical=False, validation="report", name_table=None,
+                                     sharded=False, progress=None, profile_memory=False):
+    """
+    Generate ontology from CSV files in the specified directory using a configuration file.
+
+    All paths are used as given; the process working directory is never
+    changed and no module state is shared between calls, so several
+    generations can run at once (see generate_ontologies_parallel).
+
+    Args:
+        directory_path (str): Directory holding the ``<name>.csv`` input files.
+        config_path (str): Path to the ontology configuration file. It is
+            compiled into a plan (see generation_plan), so an invalid
+            configuration fails before any CSV is read.
+        ontology_name (str): Base name of the output file.
+        engine (str): "owlready2" builds the ontology in an owlready2 quadstore and
+            runs the reasoner; "triples" streams triples straight to the output
+            file without creating owlready2 classes (see ontology_triples).
+        output_format (str, optional): "rdfxml" (owlready2 engine only),
+            "ntriples" or "turtle", or one of them with a "-gzip" suffix
+            (e.g. "ntriples-gzip") for a gzip-compressed file. Defaults to
+            RDF/XML for the owlready2 engine and N-Triples for the triples
+            engine. See ENGINE_FORMATS for the file extensions.
+        world_backend (str): Quadstore backend of the owlready2 engine, "memory"
+            or "sqlite" (a temporary file). Each generation runs in its own
+            World, which is closed and discarded when the run finishes.
+        cache_dir (str, optional): Fragment cache directory for the triples
+            engine. Only input files that changed since an earlier run with the
+            same cache are processed again (see fragment_cache).
+        metadata (dict, optional): Filled in with details of the run: engine,
+            output format and file, "config_hash" (the plan's config hash),
+            "content_hash" (canonical output only), "duplicate_edges" (the number of repeated
+            hierarchy rows collapsed into an existing restriction),
+            "joined_edges" and "unresolved_references" (lookups between
+            files resolved into restrictions, and without a matching entity),
+            "consistency", the result of the consistency check, and
+            "profile", the per-phase report of profiling.GenerationProfile
+            (wall time, CPU time of the generating thread, RSS change and
+            traced peak memory, see ``profile_memory``, rows read and
+            entities and triples created by each phase).
+        reasoning (str, optional): Consistency check to run: "off",
+            "structural" (a fast pure-Python check), "hermit" or "pellet".
+            Defaults to "hermit" for the owlready2 engine and "off" for the
+            triples engine. An inconsistent ontology is still saved.
+        reasoner_timeout (float): Wall-clock budget of a HermiT or Pellet
+            run, in seconds.
+        quadstore (dict, optional): Settings of the "sqlite" world backend
+            (see QUADSTORE_DEFAULTS): SQLite cache sizes, how often to commit
+            and where to keep the quadstore. In this disk-backed mode the
+            generator keeps no entity objects of its own, so memory use is
+            bounded by the caches rather than by the size of the ontology.
+        output (optional): A binary file-like object to serialize the ontology
+            into instead of writing a file to ``directory_path``; it is
+            flushed but not closed. The Java reasoners check the file behind
+            it if it has one (its ``name`` is a path on disk), otherwise
+            their result records an error. See also iter_ontology_chunks.
+        workers (int, optional): Number of processes that read the input
+            files in parallel; 1 (the default) reads them one after the
+            other and None uses one process per CPU. The triples engine
+            builds each file's fragment in the pool and the owlready2 engine
+            scans each CSV there. The results are merged in plan order, so the
+            output does not depend on this setting.
+        canonical (bool): Write the ontology in canonical form (see
+            canonical.write_canonical): sorted subjects and predicates and
+            blank nodes labelled by their content, so the same graph always
+            gives the same bytes, whichever engine built it and in whatever
+            order the rows came. The SHA-256 of the canonical triples is
+            stored as "content_hash" in ``metadata``, e.g. to recognize an
+            unchanged regeneration.
+        validation (str): Check of the input CSV files before anything is
+            built (see input_validation): "off", "report" (the default; the
+            report is printed and stored as "validation" in ``metadata``, and
+            errors the generation could not get past, such as a missing
+            required column, fail it before anything is built) or "strict",
+            which fails the generation on any issue, warnings included.
+        name_table (str, optional): JSON file of the entity names minted
+            from CSV values (see iri_minting). The names it holds are kept,
+            so IRIs stay stable between runs, and the table is saved back
+            with the names of this run once it succeeded. The number of
+            names that had to be disambiguated is stored as
+            "name_collisions" in ``metadata``.
+        sharded (bool): Triples engine only: write one N-Triples or Turtle
+            file per ``files[]`` entry, plus the "base" and "lookups"
+            shards, into a directory named ``<ontology_name>_shards`` with a
+            manifest (see ontology_triples.ShardWriter), instead of a single
+            file. The manifest is also stored as "shards" in ``metadata``. Sharded
+            output cannot be canonical, streamed to ``output`` or checked by
+            a Java reasoner.
+        progress (callable, optional): Called with the name of each phase
+            of the run ("config load", "validation", ..., "save") as it
+            starts, e.g. to report on a generation running in the
+            background (see generation_jobs).
+        profile_memory (bool): Trace allocations with tracemalloc to record
+            the peak memory of each phase in the "profile". This slows the
+            generation down several times; by default the profile only
+            records how much each phase changed the resident set size of
+            the process.
+
+    Returns:
+        str: The name of the generated file (or shard directory), inside
+        ``directory_path`` (the name it would have had when ``output`` is
+        given).
+    """
+    if engine not in ENGINE_FORMATS:
+        raise ValueError(f"Unknown ontology engine: {engine}")
+    if sharded and engine != "triples":
+        raise ValueError("Sharded output is only supported by the triples engine")
+    output_format = output_format or DEFAULT_FORMATS[engine]
+    if sharded and split_format(output_format)[0] == "rdfxml":
+        raise ValueError(f"Sharded output is written as N-Triples or Turtle, not {output_format}")
+    if output_format not in ENGINE_FORMATS[engine]:
+        raise ValueError(f"The {engine} engine cannot write {output_format} output")
+    output_file = f"{ontology_name}{output_extension(engine, output_format)}"
+    if world_backend not in WORLD_BACKENDS:
+        raise ValueError(f"Unknown world backend: {world_backend}")
+    if cache_dir and engine != "triples":
+        raise ValueError("The fragment cache is only supported by the triples engine")
+    if quadstore and world_backend != "sqlite":
+        raise ValueError("Quadstore settings require the sqlite world backend")
+    reasoning = reasoning or DEFAULT_REASONING[engine]
+    if reasoning not in REASONING_MODES:
+        raise ValueError(f"Unknown reasoning mode: {reasoning}")
+    if sharded:
+        if canonical or output is not None or reasoning in ("hermit", "pellet"):
+            raise ValueError("Sharded output cannot be canonical, streamed or checked by a Java reasoner")
+        output_file = f"{ontology_name}_shards"
+    if validation not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode: {validation}")
+    world, sqlite_file, pool = None, None, None
+    if metadata is None:
+        metadata = {}
+    metadata.update({"engine": engine, "output_format": output_format, "output_file": output_file})
+
+    output_path = os.path.join(directory_path, output_file)
+    if output is not None:
+        target, output_path = output, _output_file_path(output)
+    else:
+        target = output_path
+    # Canonical output: the engine writes N-Triples to a temporary file, which
+    # is then written out sorted and relabelled in the requested format
+    engine_target, engine_format, canonical_source = target, output_format, None
+    if canonical:
+        fd, canonical_source = tempfile.mkstemp(suffix=".nt")
+        os.close(fd)
+        engine_target, engine_format = canonical_source, "ntriples"
+    profile = GenerationProfile(trace_memory=profile_memory, on_phase=progress)
+    profile.start()
+
+    def write_canonical_output():
+        if canonical:
+            with profile.phase("canonical output"):
+                metadata["content_hash"] = write_canonical(canonical_source, target, output_format, ONTOLOGY_IRI)
+
+    try:
+        # Load the configuration, compiled into a plan (cached by config hash)
         print("Loading configuration...")
-        config = load_config(os.path.join(original_dir, config_path))
-
-        # Create base ontology
-        onto = create_base_ontology(config)
-
-        # Add essential object properties needed for relationships
-        print("Creating essential properties...")
-        with onto:
-            # Create essential properties explicitly
-            for rel_config in config.get("files", []):
-                if rel_config["type"] == "hierarchy":
-                    for rel in rel_config.get("relationships", []):
-                        prop_name = rel["property"]
-                        if not hasattr(onto, prop_name):
-                            print(f"Pre-creating relationship property: {prop_name}")
-                            types.new_class(prop_name, (ObjectProperty,))
+        with profile.phase("config load"):
+            plan = load_plan(config_path)
+        metadata["config_hash"] = plan["config_hash"]
+        for warning in plan["warnings"]:
+            print(f"Warning: {warning}")
+
+        names = load_name_table(name_table)
+
+        # Check the inputs before the expensive part of the run
+        if validation != "off":
+            with profile.phase("validation"):
+                metadata["validation"] = validate_inputs(plan, directory_path, validation)
+            print(format_validation(metadata["validation"]))
+            blocking = blocking_issues(metadata["validation"])
+            if blocking:
+                raise ValueError("Input validation failed: " + "; ".join(issue["message"] for issue in blocking))
+
+        if engine == "triples":
+            print(f"Writing triples to {output_file}...")
+            counts = write_ontology_triples(plan, directory_path, engine_target, ONTOLOGY_IRI, engine_format,
+                                            cache_dir=cache_dir, with_structure=reasoning == "structural",
+                                            profile=profile, workers=workers, names=names, shards=sharded)
+            write_canonical_output()
+            if name_table:
+                save_name_table(names, name_table)
+            structure = counts.pop("structure", None)
+            if sharded:
+                metadata["shards"] = counts.pop("manifest")
+            metadata.update(counts)
+            if cache_dir:
+                print(f"Fragments rebuilt: {counts['fragments_built']}, reused from cache: {counts['fragments_reused']}")
+            if counts["duplicate_edges"]:
+                print(f"Collapsed {counts['duplicate_edges']} duplicate hierarchy edges")
+            print(f"Ontology saved successfully to {output_file} ({counts['triples']} triples)")
+
+            with profile.phase("reasoner"):
+                if reasoning == "structural":
+                    metadata["consistency"] = check_structure(structure)
+                elif reasoning == "off":
+                    metadata["consistency"] = check_result("off")
+                else:
+                    metadata["consistency"] = _check_saved_ontology(output_path, reasoning, reasoner_timeout)
+            report_consistency(metadata["consistency"])
+            print(format_profile(profile.report()))
+            return output_file
+
+        stats = {"duplicate_edges": 0, "rows": 0}
+
+        def counts():
+            return {"rows": stats["rows"], "entities": len(registry.by_name), "triples": len(world.graph)}
+
+        # Create base ontology in a World of its own, so nothing leaks between runs
+        with profile.phase("base ontology") as counters:
+            world, sqlite_file = open_world(world_backend, quadstore)
+            onto = create_base_ontology(plan, world)
+            if world_backend == "sqlite":
+                # Disk-backed: index storids only and commit in batches
+                commit_every = {**QUADSTORE_DEFAULTS, **(quadstore or {})}["commit_every"]
+                registry = EntityRegistry(onto, keep_entities=False, commit_every=commit_every, names=names)
+            else:
+                registry = EntityRegistry(onto, names=names)
+
+            # Add essential object properties needed for relationships
+            print("Creating essential properties...")
+            for prop_name in plan["required_properties"]:
+                if not registry.get(prop_name):
+                    print(f"Pre-creating relationship property: {prop_name}")
+                    registry.new_class(prop_name, (ObjectProperty,))
+            # Class types of the files, created when their file runs
+            for class_name in plan["required_classes"]:
+                names.reserve(class_name)
+            counters.update(counts())
+
+        # Parallel mode: scan every CSV in worker processes; the entities are
+        # still created here, in plan order
+        scans = {}
+        if workers != 1:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            for i, task in enumerate(plan["tasks"]):
+                file_path = os.path.join(directory_path, task["csv"])
+                if os.path.exists(file_path):
+                    scans[i] = pool.submit(scan_csv_file, file_path, task["file"], task["key_columns"])
+
+        def process_tasks(phase):
+            for i, task in enumerate(plan["tasks"]):
+                if task["phase"] == phase:
+                    file_path = os.path.join(directory_path, task["csv"])
+                    scan = scans.pop(i).result() if i in scans else None
+                    process_csv_file(onto, file_path, task["file"], directory_path, index,
+                                     registry, stats, scan, task["key_columns"])
 
         # Process object and data properties first to ensure properties are defined
         print("Processing properties...")
-        all_entities = {}
-        for file_config in config.get("files", []):
-            if file_config["type"] in ["object_properties", "data_properties"]:
-                file_path = f"{file_config['name']}.csv"
-                onto, entities = process_csv_file(onto, file_path, file_config, directory_path, all_entities)
-                all_entities.update(entities)
+        index = EntityIndex()
+        with profile.phase("properties", counts):
+            process_tasks("properties")
 
         # Process other files
         print("Processing other files...")
-        for file_config in config.get("files", []):
-            if file_config["type"] not in ["object_properties", "data_properties"]:
-                file_path = f"{file_config['name']}.csv"
-                onto, entities = process_csv_file(onto, file_path, file_config, directory_path, all_entities)
-                all_entities.update(entities)
-
-        # Run reasoner to check consistency
-        print("Running reasoner to check consistency...")
-        try:
-            sync_reasoner(onto)
-            print("Ontology is consistent!")
-        except Exception as e:
-            print(f"Reasoner found inconsistencies: {e}")
+        with profile.phase("classes and hierarchies", counts):
+            process_tasks("classes")
+        if pool is not None:
+            pool.shutdown()
+            pool = None
+
+        # Resolve the lookups between files against the keys of all files
+        with profile.phase("joins", counts):
+            stats["joined_edges"] = join_references(registry, index)
+            stats["unresolved_references"] = index.unresolved
+
+        metadata.update(stats)
+        metadata["entities"] = len(registry.by_name)
+        metadata["name_collisions"] = names.collisions
+
+        if reasoning == "structural":
+            with profile.phase("reasoner"):
+                metadata["consistency"] = check_structure(structure_from_ontology(onto))
+            report_consistency(metadata["consistency"])
 
-        # Save the ontology
-        output_file = f"{ontology_name}.owl"
+        # Save the ontology; a disk-backed store is serialized straight from SQLite
         print(f"Saving ontology to {output_file}...")
-        onto.save(file=output_file, format="rdfxml")
+        with profile.phase("save"):
+            if world_backend == "sqlite":
+                world.graph.commit()
+            save_ontology(onto, engine_target, engine_format)
+        write_canonical_output()
+        if name_table:
+            save_name_table(names, name_table)
         print(f"Ontology saved successfully to {output_file}")
 
+        # The Java reasoners check the saved file, within their time budget
+        if reasoning in ["hermit", "pellet"]:
+            with profile.phase("reasoner"):
+                metadata["consistency"] = _check_saved_ontology(output_path, reasoning, reasoner_timeout)
+            report_consistency(metadata["consistency"])
+        elif reasoning == "off":
+            metadata["consistency"] = check_result("off")
+
+        print(format_profile(profile.report()))
         return output_file
 
     except Exception as e:
         raise Exception(f"Ontology generation failed: {str(e)}")
 
     finally:
-        os.chdir(original_dir)
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        profile.stop()
+        # Kept for failed runs too, to show how far the generation got
+        metadata["profile"] = profile.report()
+        if world is not None:
+            close_world(world, sqlite_file)
+        if canonical_source is not None:
+            os.remove(canonical_source)
+
+def _check_saved_ontology(output_path, reasoner, timeout):
+    """Run a Java reasoner on the saved ontology, if it was saved to a file."""
+    if output_path is None:
+        return check_result(reasoner, error=f"{reasoner} needs the ontology in a file, but it was streamed")
+    return run_java_reasoner(output_path, reasoner, timeout)
+
+class _ChunkPipe(io.RawIOBase):
+    """Writable stream that hands what is written to it to another thread, chunk by chunk."""
+
+    def __init__(self, max_chunks=8):
+        self.chunks = queue.Queue(max_chunks)
+        self.cancelled = False
+
+    def writable(self):
+        return True
+
+    def put(self, chunk):
+        # Wait for the reader, unless it stopped reading
+        while not self.cancelled:
+            try:
+                self.chunks.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise BrokenPipeError("The reader of the ontology stream stopped reading")
+
+    def write(self, data):
+        self.put(bytes(data))
+        return len(data)
+
+def iter_ontology_chunks(directory_path, chunk_size=DEFAULT_CHUNK_SIZE, metadata=None, **kwargs):
+    """
+    Generate an ontology and yield its serialization as byte chunks.
+
+    The generation runs in a background thread and writes into a bounded
+    pipe, so at most a few chunks are held in memory and nothing is written
+    to ``directory_path``. Stopping the iteration early stops the
+    generation.
+
+    Args:
+        directory_path (str): Directory holding the ``<name>.csv`` input files.
+        chunk_size (int): Buffer size of the pipe; chunks are this size
+            unless the serializer writes larger blocks at once.
+        metadata (dict, optional): Filled in as by generate_ontology_from_directory
+            once the iteration is complete.
+        **kwargs: Further arguments of generate_ontology_from_directory. The
+            Java reasoners cannot check a streamed ontology.
+
+    Yields:
+        bytes: The serialized ontology.
+    """
+    pipe = _ChunkPipe()
+    done = object()
+    errors = []
+
+    def produce():
+        try:
+            with io.BufferedWriter(pipe, chunk_size) as buffered:
+                generate_ontology_from_directory(directory_path, metadata=metadata, output=buffered, **kwargs)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            try:
+                pipe.put(done)
+            except BrokenPipeError:
+                pass
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            chunk = pipe.chunks.get()
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        pipe.cancelled = True
+        producer.join()
+    if errors:
+        raise errors[0]
+
+def _run_generation(job):
+    """Run one generate_ontology_from_directory job and report its outcome."""
+    try:
+        return {"directory_path": job["directory_path"],
+                "output_file": generate_ontology_from_directory(**job),
+                "error": None}
+    except Exception as e:
+        return {"directory_path": job["directory_path"], "output_file": None, "error": str(e)}
+
+def generate_ontologies_parallel(jobs, max_workers=None, executor="process"):
+    """
+    Run several ontology generations concurrently in one process or pool.
+
+    Each job is a dict of keyword arguments for generate_ontology_from_directory
+    and must at least contain "directory_path". Every job gets its own World
+    and writes into its own directory, so jobs must not share a directory
+    with the same ontology_name.
+
+    Args:
+        jobs (list): Keyword-argument dicts, one per generation.
+        max_workers (int, optional): Pool size; defaults to the executor's default.
+        executor (str): "process" runs jobs in a process pool, which scales the
+            CPU-bound owlready2 engine with cores; "thread" runs them in a thread
+            pool inside this process, which suits I/O-bound or small jobs.
+
+    Returns:
+        list: One {"directory_path", "output_file", "error"} dict per job, in
+        the order of ``jobs``. A failed job has output_file None and the error
+        message set; it does not stop the other jobs.
+    """
+    if executor == "process":
+        pool_class = ProcessPoolExecutor
+    elif executor == "thread":
+        pool_class = ThreadPoolExecutor
+    else:
+        raise ValueError(f"Unknown executor: {executor}")
+
+    with pool_class(max_workers=max_workers) as pool:
+        return list(pool.map(_run_generation, jobs))
 
 if __name__ == "__main__":
     generate_ontology_from_directory(".")
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""
+Persistent queue of background generation jobs.
+
+The web routes enqueue a job and return straight away; a JobRunner runs
+the queued jobs on a bounded pool of worker threads. Jobs are kept in a
+SQLite database, so the queue survives a restart of the app and can be
+shared by several app processes:
+
+    queued -> running -> done
+                      -> failed
+
+A running job reports the phase it is in (see the progress argument of
+generate_ontology_from_directory) and its worker refreshes a heartbeat. A
+job whose heartbeat stopped, because the process running it died, is
+queued again for the next worker, up to MAX_ATTEMPTS times.
+
+Generations do not share module state, so several of them can run in
+threads of the same process (see generate_ontologies_parallel).
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+JOB_STATES = ["queued", "running", "done", "failed"]
+DEFAULT_WORKERS = 2
+HEARTBEAT_SECONDS = 10
+STALE_SECONDS = 60
+POLL_SECONDS = 5
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    phase TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    heartbeat REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+
+
+class JobQueue:
+    """Generation jobs stored in a SQLite database."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # One connection per call: the queue is used from several threads
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return closing(conn)
+
+    def enqueue(self, job_id, kind, payload):
+        """
+        Add a job to the queue.
+
+        Args:
+            job_id (str): Id of the job, e.g. the session id of an upload.
+            kind (str): Name of the handler that runs the job.
+            payload (dict): JSON-serializable arguments of the handler.
+
+        Returns:
+            dict: The queued job (see get).
+        """
+        with self._connect() as conn:
+            conn.execute("INSERT INTO jobs (id, kind, payload, status, created) VALUES (?, ?, ?, 'queued', ?)",
+                         (job_id, kind, json.dumps(payload), time.time()))
+        return self.get(job_id)
+
+    def claim(self):
+        """
+        Take the oldest queued job and mark it as running.
+
+        Running jobs whose heartbeat is older than STALE_SECONDS are queued
+        again first, or failed once they were tried MAX_ATTEMPTS times.
+
+        Returns:
+            dict: The claimed job, or None when the queue is empty.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                stale = now - STALE_SECONDS
+                conn.execute("UPDATE jobs SET status = 'failed', finished = ?, "
+                             "error = 'Interrupted ' || attempts || ' times' "
+                             "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+                             (now, stale, MAX_ATTEMPTS))
+                requeued = conn.execute("UPDATE jobs SET status = 'queued', phase = NULL "
+                                        "WHERE status = 'running' AND heartbeat < ?", (stale,)).rowcount
+                if requeued:
+                    logger.warning(f"Requeued {requeued} interrupted generation job(s)")
+                row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+                if row:
+                    conn.execute("UPDATE jobs SET status = 'running', started = ?, heartbeat = ?, "
+                                 "attempts = attempts + 1 WHERE id = ?", (now, now, row["id"]))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row else None
+
+    def set_phase(self, job_id, phase):
+        """Record the phase a running job is in."""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET phase = ?, heartbeat = ? WHERE id = ?", (phase, time.time(), job_id))
+
+    def heartbeat(self, job_ids):
+        """Mark running jobs as still alive."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany("UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = 'running'",
+                             [(now, job_id) for job_id in job_ids])
+
+    def finish(self, job_id, result=None):
+        """Mark a job as done, with the (JSON-serializable) result of its handler."""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'done', phase = NULL, finished = ?, result = ? WHERE id = ?",
+                         (time.time(), json.dumps(result), job_id))
+
+    def fail(self, job_id, error):
+        """Mark a job as failed, with the error message."""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE id = ?",
+                         (time.time(), error, job_id))
+
+    def get(self, job_id):
+        """
+        Return a job.
+
+        Returns:
+            dict: id, kind, payload, status, phase, created, started,
+            finished (epoch seconds), attempts, error and result, plus the
+            "position" of a queued job in the queue (1 runs next); None
+            when there is no such job.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            job["payload"] = json.loads(job["payload"])
+            job["result"] = json.loads(job["result"]) if job["result"] else None
+            if job["status"] == "queued":
+                job["position"] = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created <= ?",
+                                               (job["created"],)).fetchone()[0]
+        return job
+
+    def delete_finished(self, older_than):
+        """
+        Delete done and failed jobs that finished more than ``older_than`` seconds ago.
+
+        Returns:
+            int: The number of jobs deleted.
+        """
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished < ?",
+                                (time.time() - older_than,)).rowcount
+
+
+class JobRunner:
+    """
+    Run the jobs of a JobQueue on a bounded pool of worker threads.
+
+    Args:
+        queue (JobQueue): The queue to take jobs from.
+        handlers (dict): Maps each job kind to a callable taking the job id,
+            its payload and a progress callback (called with the name of the
+            phase the job is in), and returning the job's result.
+        workers (int): Number of jobs run at the same time.
+    """
+
+    def __init__(self, queue, handlers, workers=DEFAULT_WORKERS):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self._running = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Start the worker threads; does nothing if they already run."""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                self._threads.append(threading.Thread(target=self._work, name=f"generation-job-{i}", daemon=True))
+            self._threads.append(threading.Thread(target=self._beat, name="generation-job-heartbeat", daemon=True))
+            for thread in self._threads:
+                thread.start()
+        logger.info(f"Started {self.workers} generation job worker(s)")
+
+    def notify(self):
+        """Wake the workers up, e.g. after a job was enqueued."""
+        self._wake.set()
+
+    def run_next(self):
+        """
+        Claim and run one queued job in the calling thread.
+
+        Returns:
+            bool: Whether there was a job to run.
+        """
+        job = self.queue.claim()
+        if job is None:
+            return False
+        with self._lock:
+            self._running.add(job["id"])
+        try:
+            logger.info(f"Running {job['kind']} job {job['id']} (attempt {job['attempts']})")
+            handler = self.handlers[job["kind"]]
+            result = handler(job["id"], job["payload"], lambda phase: self.queue.set_phase(job["id"], phase))
+            self.queue.finish(job["id"], result)
+            logger.info(f"Finished {job['kind']} job {job['id']}")
+        except Exception as e:
+            logger.error(f"Error in {job['kind']} job {job['id']}: {str(e)}", exc_info=True)
+            self.queue.fail(job["id"], str(e))
+        finally:
+            with self._lock:
+                self._running.discard(job["id"])
+        return True
+
+    def _work(self):
+        while True:
+            try:
+                if self.run_next():
+                    continue
+            except Exception as e:
+                logger.error(f"Error claiming a generation job: {str(e)}")
+            self._wake.wait(POLL_SECONDS)
+            self._wake.clear()
+
+    def _beat(self):
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            with self._lock:
+                running = list(self._running)
+            if running:
+                try:
+                    self.queue.heartbeat(running)
+                except Exception as e:
+                    logger.error(f"Error updating the heartbeat of generation jobs: {str(e)}")
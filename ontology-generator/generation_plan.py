@@ -0,0 +1,337 @@
+"""
+Compiled generation plans.
+
+``ontology_config.json`` is validated and resolved once into an execution
+plan: the ordered file tasks with the CSV columns each one reads, the
+properties and classes the files need, and the dependency edges between
+files. Both generation engines run the plan instead of interpreting the
+config themselves, so configuration errors are reported before any CSV is
+read.
+
+Plans are cached in-process by the hash of the config, so repeated
+generations with the same config (the web app, the automation loop) compile
+it only once. A plan is a plain dict and must not be modified.
+
+Usage:
+  python generation_plan.py ontology_config.json
+"""
+
+import sys
+import json
+import hashlib
+
+# Bump when the plan layout changes
+PLAN_FORMAT = 3
+
+PROPERTY_FILE_TYPES = ["object_properties", "data_properties"]
+FILE_TYPES = ["class", "hierarchy"] + PROPERTY_FILE_TYPES
+
+# How a hierarchy relationship links an entity to its parent:
+# - restriction: ``child subClassOf (property some parent)``
+# - subclass: ``child subClassOf parent``; the property is not used
+# - subclass_annotation: ``child subClassOf parent`` and ``child property
+#   parent``, with the property declared as an annotation property
+HIERARCHY_ENCODINGS = ["restriction", "subclass", "subclass_annotation"]
+DEFAULT_HIERARCHY_ENCODING = "restriction"
+
+# Compiled plans by config hash
+_PLANS = {}
+
+
+def config_hash(config):
+    """Hash a loaded config independently of its key order and formatting."""
+    canonical = json.dumps({"format": PLAN_FORMAT, "config": config}, sort_keys=True)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _missing(entry, keys):
+    """Return the keys an entry lacks or leaves empty."""
+    if not isinstance(entry, dict):
+        return list(keys)
+    return [key for key in keys if not entry.get(key)]
+
+
+def _entries(file_config, key):
+    """Return the object entries of a list of a files[] entry; _file_columns reports the others."""
+    return [entry for entry in file_config.get(key, []) if isinstance(entry, dict)]
+
+
+def _file_columns(file_config, errors):
+    """Validate a files[] entry and return the CSV columns it reads."""
+    name = file_config["name"]
+    file_type = file_config["type"]
+    columns = []
+
+    def require(entry, keys, what):
+        missing = _missing(entry, keys)
+        if missing:
+            errors.append(f"{what} in file {name} lacks {', '.join(missing)}")
+            return False
+        return True
+
+    if file_type == "class":
+        if require(file_config, ["class_column", "class_type"], "entry"):
+            columns.append(file_config["class_column"])
+        for ann in file_config.get("annotations", []):
+            if require(ann, ["column", "property"], "annotation"):
+                columns.append(ann["column"])
+        for rel_class in file_config.get("related_classes", []):
+            if require(rel_class, ["column", "class"], "related class"):
+                columns.append(rel_class["column"])
+        for rel in file_config.get("relationships", []):
+            if require(rel, ["from_column", "to_column", "property"], "relationship"):
+                columns += [rel["from_column"], rel["to_column"]]
+            if isinstance(rel, dict) and rel.get("lookup_file"):
+                require(rel, ["lookup_column"], "lookup relationship")
+
+    elif file_type == "hierarchy":
+        for class_info in file_config.get("class_columns", []):
+            if require(class_info, ["column", "class"], "class column"):
+                columns.append(class_info["column"])
+        for rel in file_config.get("relationships", []):
+            if require(rel, ["from_column", "to_column", "property"], "relationship"):
+                columns += [rel["from_column"], rel["to_column"]]
+            encoding = hierarchy_encoding(rel) if isinstance(rel, dict) else DEFAULT_HIERARCHY_ENCODING
+            if encoding not in HIERARCHY_ENCODINGS:
+                errors.append(f"relationship in file {name} has unknown encoding {encoding}")
+
+    elif file_type in PROPERTY_FILE_TYPES:
+        mapping = file_config.get("columns")
+        if require(mapping, ["property_name", "domain", "range"], "column mapping"):
+            columns += [column for column in mapping.values() if column]
+
+    # Unique, in order of first use
+    return list(dict.fromkeys(columns))
+
+
+def hierarchy_encoding(rel):
+    """Return how a relationship of a hierarchy file is encoded (see HIERARCHY_ENCODINGS)."""
+    return rel.get("encoding") or DEFAULT_HIERARCHY_ENCODING
+
+
+def _order_tasks(tasks, edges, warnings):
+    """
+    Order tasks so every file comes after the files it depends on.
+
+    Ties keep the config order. Files caught in a dependency cycle keep
+    their config order and are reported as a warning.
+    """
+    index = {task["name"]: i for i, task in enumerate(tasks)}
+    pending = {task["name"]: set() for task in tasks}
+    for before, after in edges:
+        pending[after].add(before)
+
+    ordered = []
+    remaining = [task["name"] for task in tasks]
+    while remaining:
+        ready = [name for name in remaining if not pending[name]]
+        if not ready:
+            warnings.append(f"dependency cycle between files: {', '.join(remaining)}")
+            ready = remaining
+        name = min(ready, key=index.get)
+        ordered.append(tasks[index[name]])
+        remaining.remove(name)
+        for waiting in pending.values():
+            waiting.discard(name)
+    return ordered
+
+
+def compile_plan(config):
+    """
+    Validate a loaded ontology config and resolve it into an execution plan.
+
+    Args:
+        config (dict): The loaded ontology configuration.
+
+    Returns:
+        dict: The plan (shared between callers; do not modify):
+
+        - "config_hash": hash of the config the plan was compiled from
+        - "base_classes": as in the config
+        - "annotation_properties": as in the config, followed by the
+          properties of hierarchy relationships encoded as
+          "subclass_annotation"
+        - "tasks": one dict per input file, in execution order, with
+          "name", "csv" (file name), "type", "phase" ("properties" or
+          "classes"), "columns" (the CSV columns it reads), "key_columns"
+          (the columns other files look its entities up by, see
+          entity_index), "depends_on" (names of the files that must run
+          first) and "file" (its entry from the config)
+        - "required_properties": relationship properties of hierarchies
+          encoded as restrictions and of lookups between files, which exist
+          before any file runs
+        - "required_classes": classes the files create entities under
+        - "edges": (before, after) file dependencies
+        - "warnings": problems that do not stop a generation
+
+    Raises:
+        ValueError: If the config is invalid; the message lists every problem.
+    """
+    key = config_hash(config)
+    plan = _PLANS.get(key)
+    if plan is not None:
+        return plan
+
+    errors = []
+    warnings = []
+    if not isinstance(config, dict):
+        raise ValueError("Invalid ontology configuration: expected a JSON object")
+    files = config.get("files", [])
+    if not isinstance(files, list):
+        raise ValueError("Invalid ontology configuration: \"files\" must be a list")
+
+    base_classes = config.get("base_classes", [])
+    declared_classes = {"Thing"}
+    for base_class in base_classes:
+        missing = _missing(base_class, ["name", "parent"])
+        if missing:
+            errors.append(f"base class {base_class} lacks {', '.join(missing)}")
+            continue
+        if base_class["parent"] not in declared_classes:
+            warnings.append(f"parent class {base_class['parent']} of {base_class['name']} is not declared "
+                            f"before it, Thing is used instead")
+        declared_classes.add(base_class["name"])
+
+    annotation_properties = config.get("annotation_properties", [])
+    declared_annotations = set()
+    for ann_prop in annotation_properties:
+        if _missing(ann_prop, ["name"]):
+            errors.append(f"annotation property {ann_prop} lacks name")
+        else:
+            declared_annotations.add(ann_prop["name"])
+
+    tasks = []
+    names = set()
+    required_properties = []
+    link_properties = []
+    required_classes = []
+    for position, file_config in enumerate(files):
+        missing = _missing(file_config, ["name", "type"])
+        if missing:
+            errors.append(f"file entry {position} lacks {', '.join(missing)}")
+            continue
+        name = file_config["name"]
+        file_type = file_config["type"]
+        if name in names:
+            warnings.append(f"file {name} is listed more than once")
+        names.add(name)
+        if file_type not in FILE_TYPES:
+            warnings.append(f"file {name} has unknown type {file_type} and is only read, not processed")
+
+        columns = _file_columns(file_config, errors)
+
+        if file_type == "class":
+            required_classes.append(file_config.get("class_type"))
+            required_classes += [rel_class.get("class") for rel_class in _entries(file_config, "related_classes")]
+            for ann in _entries(file_config, "annotations"):
+                if ann.get("property") and ann["property"] not in declared_annotations:
+                    warnings.append(f"annotation property {ann['property']} of file {name} is not declared")
+            required_properties += [rel.get("property") for rel in _entries(file_config, "relationships")
+                                    if rel.get("lookup_file")]
+        elif file_type == "hierarchy":
+            required_classes += [class_info.get("class") for class_info in _entries(file_config, "class_columns")]
+            for rel in _entries(file_config, "relationships"):
+                encoding = hierarchy_encoding(rel)
+                if encoding == "restriction":
+                    required_properties.append(rel.get("property"))
+                elif encoding == "subclass_annotation":
+                    link_properties.append(rel.get("property"))
+
+        tasks.append({
+            "name": name,
+            "csv": f"{name}.csv",
+            "type": file_type,
+            "phase": "properties" if file_type in PROPERTY_FILE_TYPES else "classes",
+            "columns": columns,
+            "key_columns": [],
+            "depends_on": [],
+            "file": file_config,
+        })
+
+    # A property is either an object property or an annotation link
+    for prop_name in dict.fromkeys(link_properties):
+        if prop_name in required_properties:
+            errors.append(f"property {prop_name} is used both in restrictions and as an annotation link")
+        elif prop_name not in declared_annotations:
+            annotation_properties = annotation_properties + [{"name": prop_name}]
+            declared_annotations.add(prop_name)
+
+    if errors:
+        raise ValueError(f"Invalid ontology configuration: {'; '.join(errors)}")
+
+    # Property definitions run before every other file; lookups run after
+    # the file they look values up in, which indexes its entities by the
+    # looked-up column
+    edges = []
+    property_tasks = [task["name"] for task in tasks if task["phase"] == "properties"]
+    tasks_by_name = {}
+    for task in tasks:
+        tasks_by_name.setdefault(task["name"], task)
+    for task in tasks:
+        if task["phase"] == "classes":
+            edges += [(before, task["name"]) for before in property_tasks]
+        for rel in task["file"].get("relationships", []):
+            lookup_file = rel.get("lookup_file")
+            if not lookup_file:
+                continue
+            if lookup_file not in names:
+                warnings.append(f"file {task['name']} looks up values in unknown file {lookup_file}")
+                continue
+            if task["type"] != "class":
+                warnings.append(f"lookup of file {task['name']} in {lookup_file} is ignored, "
+                                f"only class files resolve lookups")
+                continue
+            target = tasks_by_name[lookup_file]
+            if target["type"] != "class":
+                warnings.append(f"file {task['name']} looks up values in {lookup_file}, "
+                                f"which is not a class file")
+                continue
+            if rel["lookup_column"] not in target["key_columns"]:
+                target["key_columns"].append(rel["lookup_column"])
+            if rel["lookup_column"] not in target["columns"]:
+                target["columns"].append(rel["lookup_column"])
+            if lookup_file != task["name"]:
+                edges.append((lookup_file, task["name"]))
+    edges = list(dict.fromkeys(edges))
+    for before, after in edges:
+        for task in tasks:
+            if task["name"] == after and before not in task["depends_on"]:
+                task["depends_on"].append(before)
+
+    plan = {
+        "format": PLAN_FORMAT,
+        "config_hash": key,
+        "base_classes": base_classes,
+        "annotation_properties": annotation_properties,
+        "tasks": _order_tasks(tasks, edges, warnings),
+        "required_properties": list(dict.fromkeys(p for p in required_properties if p)),
+        "required_classes": list(dict.fromkeys(c for c in required_classes if c)),
+        "edges": edges,
+        "warnings": warnings,
+    }
+    _PLANS[key] = plan
+    return plan
+
+
+def load_plan(config_path):
+    """
+    Load an ontology config file and return its compiled plan.
+
+    Raises:
+        ValueError: If the file cannot be read or the config is invalid.
+    """
+    try:
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+    except Exception as e:
+        raise ValueError(f"Failed to load configuration file: {e}")
+    return compile_plan(config)
+
+
+if __name__ == "__main__":
+    try:
+        compiled = load_plan(sys.argv[1] if len(sys.argv) > 1 else "ontology_config.json")
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    print(json.dumps({key: value for key, value in compiled.items() if key != "base_classes"}, indent=2))
@@ -0,0 +1,356 @@
+"""
+Validation of the input CSV files before an ontology is generated.
+
+Problems in the spreadsheets otherwise only show up halfway through a
+generation, as per-row warnings or a failed run. The validation reads only
+the columns the plan uses, column by column, and checks in one pass per
+file:
+
+- "missing_file" / "missing_column": inputs the config refers to
+- "empty_key": rows without an entity name, property name, domain or range
+- "name_collision": different values that normalize to the same entity
+  name and are given disambiguated names (see iri_minting)
+- "schema_conflict": values that normalize to a class or property of the
+  config itself and are renamed likewise
+- "invalid_iri": values with characters that are not allowed in IRIs,
+  which are percent-encoded in their entity names
+- "unknown_class" / "unknown_datatype": property domains and ranges the
+  config does not declare
+- "duplicate_key" / "unresolved_reference": lookups between files (see
+  entity_index) that are ambiguous or cannot be resolved
+
+Columns are read with pyarrow (a vectorized read and value count per
+column), which requirements.txt installs, and with the csv module where it
+is not installed. Both give the
+same report: ``{"mode", "valid", "reader", "seconds", "files", "issues"}``,
+with issues in the format of the consistency checks.
+
+blocking_issues tells which issues stop a generation: in "report" mode the
+errors that would otherwise fail it halfway (a missing required column),
+in "strict" mode every issue, warnings included.
+
+Usage:
+  python input_validation.py DIRECTORY [--config ontology_config.json] [--json]
+"""
+
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv as pa_csv
+except ImportError:  # Not installed: the csv module reads the columns instead
+    pa = None
+
+from generation_plan import PROPERTY_FILE_TYPES, load_plan
+from iri_minting import normalize_name
+
+VALIDATION_MODES = ["off", "report", "strict"]
+
+# Errors the generation cannot get past, so even the "report" mode stops on them
+BLOCKING_CHECKS = ["missing_column"]
+
+# Values listed per issue
+MAX_EXAMPLES = 5
+
+# Datatype names data property ranges can use (see ontology_triples.DATATYPE_RANGES)
+DATATYPES = ["string", "float", "integer"]
+
+
+
+def _read_with_pyarrow(file_path, columns):
+    table = pa_csv.read_csv(file_path, convert_options=pa_csv.ConvertOptions(
+        include_columns=columns, column_types={column: pa.string() for column in columns},
+        strings_can_be_null=False))
+    stats = {}
+    for column in columns:
+        counts = pc.value_counts(pc.utf8_trim_whitespace(table.column(column)))
+        values = dict(zip(counts.field("values").to_pylist(), counts.field("counts").to_pylist()))
+        stats[column] = {"empty": values.pop("", 0), "counts": values}
+    return table.num_rows, stats
+
+
+def _read_with_csv(file_path, columns):
+    with open(file_path, mode='r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        # The last column of a name wins, as with csv.DictReader
+        positions = {name: i for i, name in enumerate(header)}
+        indexes = [(positions[column], {}) for column in columns]
+        row_count = 0
+        empty = [0] * len(columns)
+        for row in reader:
+            if not row:
+                continue
+            row_count += 1
+            for j, (i, counts) in enumerate(indexes):
+                value = row[i].strip() if i < len(row) else ""
+                if value:
+                    counts[value] = counts.get(value, 0) + 1
+                else:
+                    empty[j] += 1
+    stats = {column: {"empty": empty[j], "counts": counts} for j, (column, (_, counts)) in
+             enumerate(zip(columns, indexes))}
+    return row_count, stats
+
+
+def read_columns(file_path, columns):
+    """
+    Read some columns of a CSV file and count their values.
+
+    Args:
+        file_path (str): Path to the CSV file.
+        columns (list): Columns to read; columns the file lacks are skipped.
+
+    Returns:
+        tuple: The header of the file, its number of rows, the name of the
+        reader used ("pyarrow" or "csv") and, for every column it has,
+        ``{"empty": rows without a value, "counts": stripped value -> rows}``
+        with the values in order of first appearance.
+    """
+    with open(file_path, mode='r', encoding='utf-8', newline='') as file:
+        header = next(csv.reader(file), [])
+    present = [column for column in dict.fromkeys(columns) if column in header]
+    if pa is not None and len(set(header)) == len(header):
+        try:
+            row_count, stats = _read_with_pyarrow(file_path, present)
+            return header, row_count, "pyarrow", stats
+        except pa.ArrowInvalid:
+            # E.g. rows with a missing cell, which the csv module reads as empty
+            pass
+    row_count, stats = _read_with_csv(file_path, present)
+    return header, row_count, "csv", stats
+
+
+def _column_spec(task):
+    """
+    Return the columns a file's config uses, as (column, required, severity
+    of rows without a value or None) tuples.
+
+    Only the columns the generation cannot do without are required: the
+    property name, domain and range of the property files. Class and
+    hierarchy files read every column with a guard and skip the rows that
+    lack it, so a missing column there is a warning.
+    """
+    file_config = task["file"]
+    spec = []
+    if task["type"] == "class":
+        spec.append((file_config["class_column"], False, "warning"))
+        spec += [(ann["column"], False, None) for ann in file_config.get("annotations", [])]
+        spec += [(rel_class["column"], False, None) for rel_class in file_config.get("related_classes", [])]
+        for rel in file_config.get("relationships", []):
+            spec += [(rel["from_column"], False, None), (rel["to_column"], False, None)]
+        spec += [(column, False, None) for column in task["key_columns"]]
+    elif task["type"] == "hierarchy":
+        spec += [(class_info["column"], False, None) for class_info in file_config.get("class_columns", [])]
+        for rel in file_config.get("relationships", []):
+            spec += [(rel["from_column"], False, "warning"), (rel["to_column"], False, "warning")]
+    elif task["type"] in PROPERTY_FILE_TYPES:
+        for key, column in file_config["columns"].items():
+            if column:
+                required = key in ("property_name", "domain", "range")
+                spec.append((column, required, "error" if required else None))
+    # A column used several times is checked with its strictest use
+    merged = {}
+    for column, required, severity in spec:
+        previous = merged.get(column, (False, None))
+        merged[column] = (required or previous[0], "error" if "error" in (severity, previous[1])
+                          else severity or previous[1])
+    return [(column, required, severity) for column, (required, severity) in merged.items()]
+
+
+def _entity_columns(task):
+    """Return the columns whose values become entity names, with the class of the entities (None for properties)."""
+    file_config = task["file"]
+    if task["type"] == "class":
+        return [(file_config["class_column"], file_config["class_type"])] + \
+            [(rel_class["column"], rel_class["class"]) for rel_class in file_config.get("related_classes", [])]
+    if task["type"] == "hierarchy":
+        return [(class_info["column"], class_info["class"]) for class_info in file_config.get("class_columns", [])]
+    if task["type"] in PROPERTY_FILE_TYPES:
+        columns = file_config["columns"]
+        return [(column, None) for column in (columns.get("property_name"), columns.get("inverse_property")) if column]
+    return []
+
+
+def validation_result(mode, issues=None, files=None, reader=None, seconds=0.0):
+    """Build a validation report dict."""
+    issues = issues or []
+    return {
+        "mode": mode,
+        "valid": not any(issue["severity"] == "error" for issue in issues),
+        "reader": reader,
+        "seconds": round(seconds, 3),
+        "files": files or {},
+        "issues": issues,
+    }
+
+
+def validate_inputs(plan, directory_path, mode="report"):
+    """
+    Check the input CSV files of a generation against its plan.
+
+    Args:
+        plan (dict): The compiled generation plan (see generation_plan).
+        directory_path (str): Directory holding the ``<name>.csv`` input files.
+        mode (str): A mode of VALIDATION_MODES; "off" returns an empty report
+            without reading any file. The mode is only recorded otherwise:
+            the caller decides what the report stops (see blocking_issues).
+
+    Returns:
+        dict: ``{"mode", "valid", "reader", "seconds", "files", "issues"}``.
+        "files" maps each file read to its "rows" and "columns"; each issue
+        has a "check", "severity" ("error" or "warning"), "message", "file",
+        "column", "count" (the rows or values concerned) and "examples".
+        The report is valid when no issue is an error.
+    """
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode: {mode}")
+    if mode == "off":
+        return validation_result(mode)
+    started = time.perf_counter()
+    issues = []
+
+    def issue(check, severity, message, file=None, column=None, count=None, examples=()):
+        issues.append({"check": check, "severity": severity, "message": message, "file": file,
+                       "column": column, "count": count, "examples": list(examples)[:MAX_EXAMPLES]})
+
+    classes = {"Thing"} | {base_class["name"] for base_class in plan["base_classes"]} | set(plan["required_classes"])
+    schema = classes | set(plan["required_properties"]) | {ann["name"] for ann in plan["annotation_properties"]}
+    files, readers = {}, set()
+    column_stats = {}  # (file, column) -> value counts
+    names = {}  # entity name -> the first (stripped value, class) that gives it
+    class_refs = []  # (file, column, value counts) of domains and ranges
+
+    for task in plan["tasks"]:
+        name = task["name"]
+        file_path = os.path.join(directory_path, task["csv"])
+        if not os.path.exists(file_path):
+            issue("missing_file", "warning", f"{task['csv']} not found, file {name} is skipped", name)
+            continue
+        spec = _column_spec(task)
+        header, row_count, reader, stats = read_columns(file_path, [column for column, _, _ in spec])
+        files[name] = {"rows": row_count, "columns": header}
+        readers.add(reader)
+
+        for column, required, severity in spec:
+            if column not in stats:
+                issue("missing_column", "error" if required else "warning",
+                      f"{task['csv']} has no column {column}", name, column)
+                continue
+            column_stats[(name, column)] = stats[column]["counts"]
+            empty = stats[column]["empty"]
+            if severity and empty:
+                issue("empty_key", severity, f"{empty} rows of {task['csv']} have no {column}", name, column, empty)
+
+        for column, class_name in _entity_columns(task):
+            if column not in stats:
+                continue
+            collisions, conflicts, invalid = [], [], []
+            for value in stats[column]["counts"]:
+                safe_name = normalize_name(value)
+                first = names.setdefault(safe_name, (value, class_name))
+                if first != (value, class_name):
+                    collisions.append(f"{first[0]!r} ({first[1]}) / {value!r} ({class_name})")
+                if safe_name in schema and task["type"] not in PROPERTY_FILE_TYPES:
+                    conflicts.append(value)
+                if safe_name != value.replace(' ', '_'):
+                    invalid.append(value)
+            if collisions:
+                issue("name_collision", "warning", f"{len(collisions)} values of {column} in {task['csv']} "
+                      f"give the same entity name as another value and are renamed", name, column,
+                      len(collisions), collisions)
+            if conflicts:
+                issue("schema_conflict", "warning", f"{len(conflicts)} values of {column} in {task['csv']} "
+                      f"are classes or properties of the config and are renamed", name, column,
+                      len(conflicts), conflicts)
+            if invalid:
+                issue("invalid_iri", "warning", f"{len(invalid)} values of {column} in {task['csv']} "
+                      f"have characters that are not valid in an IRI and are percent-encoded", name, column,
+                      len(invalid), invalid)
+
+        if task["type"] in PROPERTY_FILE_TYPES:
+            columns = task["file"]["columns"]
+            class_columns = ["domain", "range"] if task["type"] == "object_properties" else ["domain"]
+            class_refs += [(name, columns[key], stats[columns[key]]["counts"]) for key in class_columns
+                           if columns[key] in stats]
+            if task["type"] == "data_properties" and columns["range"] in stats:
+                unknown = [value for value in stats[columns["range"]]["counts"] if value not in DATATYPES]
+                if unknown:
+                    issue("unknown_datatype", "warning", f"{len(unknown)} ranges in {task['csv']} are not "
+                          f"{', '.join(DATATYPES)} and are read as string", name, columns["range"],
+                          len(unknown), unknown)
+
+        for column in task["key_columns"]:
+            duplicates = [value for value, rows in stats.get(column, {"counts": {}})["counts"].items() if rows > 1]
+            if duplicates:
+                issue("duplicate_key", "warning", f"{len(duplicates)} values of {column} in {task['csv']} "
+                      f"identify several rows; lookups use the first", name, column, len(duplicates), duplicates)
+
+    # Domains and ranges may name classes of the config or entities of any file
+    for name, column, counts in class_refs:
+        unknown = [value for value in counts if value not in classes and normalize_name(value) not in names]
+        if unknown:
+            issue("unknown_class", "warning", f"{len(unknown)} classes in column {column} of {name}.csv are "
+                  f"not declared and are created under Thing", name, column, len(unknown), unknown)
+
+    for task in plan["tasks"]:
+        if task["type"] != "class":
+            continue
+        for rel in task["file"].get("relationships", []):
+            references = column_stats.get((task["name"], rel["to_column"]))
+            keys = column_stats.get((rel.get("lookup_file"), rel.get("lookup_column")))
+            if references is None or keys is None:
+                continue
+            unresolved = [value for value in references if value not in keys]
+            if unresolved:
+                issue("unresolved_reference", "warning", f"{len(unresolved)} values of {rel['to_column']} in "
+                      f"{task['csv']} match no {rel['lookup_column']} of {rel['lookup_file']}",
+                      task["name"], rel["to_column"], len(unresolved), unresolved)
+
+    reader = "pyarrow" if "pyarrow" in readers else ("csv" if readers else None)
+    return validation_result(mode, issues, files, reader, time.perf_counter() - started)
+
+
+def blocking_issues(report):
+    """
+    Return the issues of a validation report that stop the generation.
+
+    In "strict" mode every issue does; otherwise only errors of
+    BLOCKING_CHECKS, which would make the generation fail halfway.
+    """
+    if report["mode"] == "strict":
+        return list(report["issues"])
+    return [issue for issue in report["issues"] if issue["severity"] == "error" and issue["check"] in BLOCKING_CHECKS]
+
+
+def format_validation(report):
+    """Describe a validation report, one line per issue."""
+    errors = sum(issue["severity"] == "error" for issue in report["issues"])
+    lines = [f"Input validation ({report['reader'] or 'no files'}) took {report['seconds']}s: "
+             f"{len(report['files'])} files, {errors} errors, {len(report['issues']) - errors} warnings"]
+    for issue in report["issues"]:
+        examples = f" (e.g. {', '.join(map(str, issue['examples']))})" if issue["examples"] else ""
+        lines.append(f"{issue['severity'].capitalize()}: {issue['message']}{examples}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the input CSV files of an ontology generation.")
+    parser.add_argument('directory', help='Directory holding the <name>.csv input files')
+    parser.add_argument('--config', default='ontology_config.json', help='Ontology configuration file')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    try:
+        result = validate_inputs(load_plan(args.config), args.directory)
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+    print(json.dumps(result, indent=2) if args.json else format_validation(result))
+    sys.exit(0 if result["valid"] else 1)
@@ -0,0 +1,134 @@
+"""
+Entity names (the local part of their IRIs) minted from CSV values.
+
+Every entity the generator creates from a CSV value gets its name from one
+NameTable per generation, so both engines agree on it:
+
+- values are normalized once (spaces become underscores, characters that
+  are not allowed in an IRI are percent-encoded) and interned per
+  (value, class) pair
+- the classes and properties of the config are reserved, so a value never
+  turns into one of them
+- a name claimed by a different value or class is disambiguated
+  deterministically: with the class name for a value of another class
+  (``Rosales_Family``), then with a counter (``Oak_Forest_2``)
+
+The table can be saved and given to a later run, which then keeps every
+name it minted before, whatever order the values come in.
+"""
+
+import os
+import json
+import tempfile
+
+# Bump when the layout of saved tables changes
+NAME_TABLE_FORMAT = 1
+
+# Characters that may not appear in an IRI fragment, besides controls
+_ILLEGAL = set('<>"{}|\\^`#[]')
+_HEX = set("0123456789abcdefABCDEF")
+
+
+def _illegal(name, i):
+    char = name[i]
+    if char == '%':
+        # Only a percent sign that starts an escape is kept
+        escape = name[i + 1:i + 3]
+        return len(escape) < 2 or not set(escape) <= _HEX
+    return char in _ILLEGAL or ord(char) < 0x20 or 0x7f <= ord(char) <= 0x9f
+
+
+def normalize_name(value):
+    """
+    Turn a stripped CSV value into an entity name.
+
+    Spaces become underscores, as they always have; any other character
+    that is not allowed in an IRI is percent-encoded as UTF-8.
+    """
+    name = value.replace(' ', '_')
+    if all(not _illegal(name, i) for i in range(len(name))):
+        return name
+    return "".join("".join(f"%{byte:02X}" for byte in char.encode('utf-8')) if _illegal(name, i) else char
+                   for i, char in enumerate(name))
+
+
+class NameTable:
+    """The entity names of one generation, by (value, class)."""
+
+    def __init__(self, mapping=None):
+        # (value, class name) -> entity name
+        self.names = {}
+        # entity name -> (value, class name) it was minted for; (name, None) when reserved
+        self.owners = {}
+        self.collisions = 0
+        for value, class_name, name in (mapping or {}).get("names", []):
+            self.names[(value, class_name)] = name
+            self.owners[name] = (value, class_name)
+
+    def reserve(self, name):
+        """Keep a class or property name of the config from being minted for a value."""
+        self.owners.setdefault(name, (name, None))
+
+    def get(self, value, class_name):
+        """Return the name minted for a value of a class, or None."""
+        return self.names.get((value, class_name))
+
+    def mint(self, value, class_name):
+        """
+        Return the entity name of a value of a class, minting it on first use.
+
+        Args:
+            value (str): The stripped CSV value.
+            class_name (str): The class the value is an entity of.
+        """
+        key = (value, class_name)
+        name = self.names.get(key)
+        if name is not None:
+            return name
+        name = normalize_name(value)
+        owner = self.owners.get(name)
+        if owner is not None and owner != key:
+            self.collisions += 1
+            base = name
+            if owner[1] != class_name and class_name:
+                name = f"{base}_{normalize_name(class_name)}"
+            counter = 2
+            while name in self.owners:
+                name = f"{base}_{counter}"
+                counter += 1
+            print(f"Warning: {value!r} ({class_name}) would be named like {owner[0]!r} ({owner[1] or 'config'}), "
+                  f"named {name} instead")
+        self.names[key] = name
+        self.owners[name] = key
+        return name
+
+    def mapping(self):
+        """Return the table as a JSON-serializable dict, e.g. for a later run."""
+        return {"format": NAME_TABLE_FORMAT,
+                "names": [[value, class_name, name] for (value, class_name), name in self.names.items()]}
+
+
+def load_name_table(path):
+    """Load a saved name table; a missing file gives an empty one."""
+    if not path or not os.path.exists(path):
+        return NameTable()
+    with open(path, 'r', encoding='utf-8') as f:
+        mapping = json.load(f)
+    if mapping.get("format") != NAME_TABLE_FORMAT:
+        print(f"Warning: Name table {path} has an unknown format and is not used")
+        return NameTable()
+    return NameTable(mapping)
+
+
+def save_name_table(table, path):
+    """Write a name table atomically, so an interrupted run keeps the previous one."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(table.mapping(), f)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
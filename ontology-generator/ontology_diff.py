@@ -0,0 +1,276 @@
+"""
+Triple-level differences between two generated ontologies.
+
+Both ontologies are read as canonical triple streams (see canonical): every
+triple as an N-Triples line, blank nodes relabelled from their content,
+sorted in bounded memory and without duplicates, so two versions of a
+multi-million-triple ontology can be compared without loading either of
+them. Walking both streams side by side gives the added and removed triples
+and summary counts per class of the subjects they describe.
+
+The results feed the changelog of the automation (format_diff_summary) and
+incremental triple store updates (sparql_update_requests).
+
+Usage:
+  python ontology_diff.py OLD NEW [--added added.nt] [--removed removed.nt]
+"""
+
+import sys
+import gzip
+import json
+import argparse
+import tempfile
+from itertools import groupby
+from contextlib import ExitStack
+
+from canonical import DEFAULT_RUN_SIZE, canonical_triples
+from ontology_triples import OWL, RDF_TYPE, open_output
+
+# Triples per request of an incremental triple store update
+DEFAULT_UPDATE_BATCH = 10000
+
+OWL_NAMED_INDIVIDUAL = f"<{OWL}NamedIndividual>"
+
+# Class under which triples about subjects without an rdf:type are counted
+UNTYPED = "untyped"
+
+
+def _is_blank(term):
+    return term.startswith("_:")
+
+
+def _subject(line):
+    return line.split(" ", 1)[0]
+
+
+def _object(line):
+    return line[:-2].split(" ", 2)[2]
+
+
+def _class_of(lines):
+    """Return the class a subject's triples are counted under: its first rdf:type."""
+    for line in lines:
+        _, p, o = line[:-2].split(" ", 2)
+        if p == RDF_TYPE and o != OWL_NAMED_INDIVIDUAL:
+            return o.strip("<>")
+    return UNTYPED
+
+
+def _open_lines_output(target):
+    """Open a path (gzip-compressed for .gz) or binary file object for N-Triples lines."""
+    output_format = "ntriples-gzip" if isinstance(target, str) and target.endswith(".gz") else "ntriples"
+    return open_output(target, output_format)
+
+
+def diff_ontologies(old_path, new_path, added=None, removed=None, work_dir=None, run_size=DEFAULT_RUN_SIZE):
+    """
+    Compare two generated ontologies triple by triple.
+
+    Both files are read as canonical triple streams (see canonical_triples),
+    so neither is loaded in memory and blank nodes are matched by content.
+
+    Args:
+        old_path (str): The previous ontology file, in any output format of
+            the generator (see canonical.read_triples).
+        new_path (str): The new ontology file.
+        added: Path or binary file-like object the added triples are written
+            to as N-Triples (gzip-compressed for a ".gz" path), or None.
+        removed: Same, for the removed triples.
+        work_dir (str, optional): Directory for temporary files; a temporary
+            directory is used by default.
+        run_size (int): Lines sorted in memory at once.
+
+    Returns:
+        dict: "added", "removed" and "unchanged" triple counts, and
+        "classes": class IRI -> {"added", "removed", "entities_added",
+        "entities_removed"}. Triples are counted under the class of their
+        subject (its rdf:type, e.g. owl:Class for class declarations, or
+        "untyped"); entities are subjects that only occur in one version.
+    """
+    summary = {"added": 0, "removed": 0, "unchanged": 0, "classes": {}}
+    with ExitStack() as stack:
+        if work_dir is None:
+            work_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="ontology-diff-"))
+        added_file = stack.enter_context(_open_lines_output(added)) if added is not None else None
+        removed_file = stack.enter_context(_open_lines_output(removed)) if removed is not None else None
+
+        old_groups = groupby(canonical_triples(old_path, work_dir, run_size), key=_subject)
+        new_groups = groupby(canonical_triples(new_path, work_dir, run_size), key=_subject)
+        old, new = next(old_groups, None), next(new_groups, None)
+        while old is not None or new is not None:
+            if new is None or (old is not None and old[0] < new[0]):
+                old_lines, new_lines = list(old[1]), []
+                old = next(old_groups, None)
+            elif old is None or new[0] < old[0]:
+                old_lines, new_lines = [], list(new[1])
+                new = next(new_groups, None)
+            else:
+                old_lines, new_lines = list(old[1]), list(new[1])
+                old, new = next(old_groups, None), next(new_groups, None)
+
+            old_set, new_set = set(old_lines), set(new_lines)
+            added_lines = [line for line in new_lines if line not in old_set]
+            removed_lines = [line for line in old_lines if line not in new_set]
+            summary["unchanged"] += len(new_lines) - len(added_lines)
+            if not added_lines and not removed_lines:
+                continue
+
+            counts = summary["classes"].setdefault(_class_of(new_lines or old_lines), {
+                "added": 0, "removed": 0, "entities_added": 0, "entities_removed": 0})
+            counts["added"] += len(added_lines)
+            counts["removed"] += len(removed_lines)
+            counts["entities_added"] += not old_lines
+            counts["entities_removed"] += not new_lines
+            summary["added"] += len(added_lines)
+            summary["removed"] += len(removed_lines)
+            for lines, f in ((added_lines, added_file), (removed_lines, removed_file)):
+                if f is not None:
+                    for line in lines:
+                        f.write(line)
+                        f.write("\n")
+    return summary
+
+
+def _local_name(iri):
+    return iri.rsplit("#", 1)[-1].rsplit("/", 1)[-1]
+
+
+def format_diff_summary(summary, limit=5):
+    """
+    Describe a diff summary in one line, e.g. for a changelog.
+
+    Args:
+        summary (dict): As returned by diff_ontologies.
+        limit (int): Number of classes listed, the most changed first.
+
+    Returns:
+        str: E.g. "+12/-3 triples; Taxon: +2/-0 entities, +10/-1 triples".
+    """
+    if not summary["added"] and not summary["removed"]:
+        return "no triple changes"
+    parts = [f"+{summary['added']}/-{summary['removed']} triples"]
+    classes = sorted(summary["classes"].items(), key=lambda item: (-(item[1]["added"] + item[1]["removed"]), item[0]))
+    for iri, counts in classes[:limit]:
+        parts.append(f"{_local_name(iri)}: +{counts['entities_added']}/-{counts['entities_removed']} entities, "
+                     f"+{counts['added']}/-{counts['removed']} triples")
+    if len(classes) > limit:
+        parts.append(f"{len(classes) - limit} more classes changed")
+    return "; ".join(parts)
+
+
+def _read_lines(path):
+    """Yield the lines of an N-Triples diff file (gzip-compressed for .gz)."""
+    with (gzip.open(path, 'rt', encoding='utf-8') if path.endswith(".gz") else open(path, 'r', encoding='utf-8')) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def _blank_structures(lines):
+    """
+    Group blank-node triples into structures, each with the triple that uses
+    the top blank node (e.g. the rdfs:subClassOf of a restriction) and the
+    triples of every blank node it reaches.
+    """
+    by_subject, roots = {}, []
+    for line in lines:
+        subject = _subject(line)
+        if _is_blank(subject):
+            by_subject.setdefault(subject, []).append(line)
+        else:
+            roots.append(line)
+
+    def reach(structure, pending):
+        while pending:
+            for line in by_subject.pop(pending.pop(), []):
+                structure.append(line)
+                if _is_blank(_object(line)):
+                    pending.append(_object(line))
+        return structure
+
+    for root in roots:
+        yield reach([root], [_object(root)])
+    # Blank nodes no named subject uses
+    while by_subject:
+        yield reach([], [min(by_subject)])
+
+
+def _pattern(line):
+    """Turn a triple into a SPARQL pattern, with variables for its blank nodes."""
+    s, p, o = line[:-2].split(" ", 2)
+    s, o = (f"?{term[2:]}" if _is_blank(term) else term for term in (s, o))
+    return f"{s} {p} {o} ."
+
+
+def sparql_update_requests(removed_path, added_path, graph_uri, batch_size=DEFAULT_UPDATE_BATCH):
+    """
+    Turn a diff into SPARQL 1.1 update requests for a named graph.
+
+    Triples without blank nodes are deleted and inserted as data. Blank nodes
+    cannot be addressed in a store, so each removed blank-node structure
+    (e.g. a restriction with the rdfs:subClassOf that uses it) is deleted by
+    matching its shape with DELETE WHERE, and each added one is inserted
+    within a single INSERT DATA operation. Only the blank-node triples of
+    the diff are held in memory.
+
+    Args:
+        removed_path (str): N-Triples file of the removed triples (see diff_ontologies).
+        added_path (str): N-Triples file of the added triples.
+        graph_uri (str): The named graph to update.
+        batch_size (int): Triples per request.
+
+    Yields:
+        str: Update requests, all deletions before the insertions.
+    """
+    for path, operation in ((removed_path, "DELETE"), (added_path, "INSERT")):
+        data, blank_lines = [], []
+        for line in _read_lines(path):
+            if _is_blank(_subject(line)) or _is_blank(_object(line)):
+                blank_lines.append(line)
+                continue
+            data.append(line)
+            if len(data) >= batch_size:
+                yield f"{operation} DATA {{ GRAPH <{graph_uri}> {{\n" + "\n".join(data) + "\n} }"
+                data = []
+        if data:
+            yield f"{operation} DATA {{ GRAPH <{graph_uri}> {{\n" + "\n".join(data) + "\n} }"
+
+        operations, count = [], 0
+        for structure in _blank_structures(blank_lines):
+            if operation == "DELETE":
+                operations.append(f"DELETE WHERE {{ GRAPH <{graph_uri}> {{\n"
+                                  + "\n".join(_pattern(line) for line in structure) + "\n} }")
+            else:
+                operations.append("\n".join(structure))
+            count += len(structure)
+            if count >= batch_size:
+                yield _join_operations(operation, operations, graph_uri)
+                operations, count = [], 0
+        if operations:
+            yield _join_operations(operation, operations, graph_uri)
+
+
+def _join_operations(operation, operations, graph_uri):
+    if operation == "DELETE":
+        return " ;\n".join(operations)
+    return f"INSERT DATA {{ GRAPH <{graph_uri}> {{\n" + "\n".join(operations) + "\n} }"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two generated ontologies triple by triple.")
+    parser.add_argument('old', help='The previous ontology (.nt or .owl, optionally .gz)')
+    parser.add_argument('new', help='The new ontology')
+    parser.add_argument('--added', help='Write the added triples to this N-Triples file')
+    parser.add_argument('--removed', help='Write the removed triples to this N-Triples file')
+    parser.add_argument('--run-size', type=int, default=DEFAULT_RUN_SIZE,
+                        help=f'Lines sorted in memory at once (default: {DEFAULT_RUN_SIZE})')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+    args = parser.parse_args()
+
+    try:
+        result = diff_ontologies(args.old, args.new, added=args.added, removed=args.removed, run_size=args.run_size)
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+    print(json.dumps(result, indent=2) if args.json else format_diff_summary(result, limit=20))
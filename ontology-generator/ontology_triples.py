@@ -0,0 +1,918 @@
+"""
+Direct triple emission for the ontology generator.
+
+This is an alternative engine to the owlready2 one in generate_ontology.py.
+The same ontology_config.json plan is turned straight into RDF triples, which
+are written to the output file as they are produced instead of being built
+as Python classes in a quadstore and serialized afterwards. The resulting
+graph matches what the owlready2 engine saves for the ``class``,
+``hierarchy``, ``object_properties`` and ``data_properties`` file types.
+"""
+
+import io
+import os
+import gzip
+import json
+import hashlib
+import tempfile
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ProcessPoolExecutor
+from csv_ingest import scan_csv_file
+from entity_index import EntityIndex
+from iri_minting import NameTable, normalize_name
+from generation_plan import hierarchy_encoding
+from fragment_cache import FragmentCache, fragment_key
+from profiling import GenerationProfile
+from consistency import new_structure
+
+RDF = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+RDFS = "http://www.w3.org/2000/01/rdf-schema#"
+OWL = "http://www.w3.org/2002/07/owl#"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+RDF_TYPE = f"<{RDF}type>"
+RDFS_SUBCLASSOF = f"<{RDFS}subClassOf>"
+RDFS_DOMAIN = f"<{RDFS}domain>"
+RDFS_RANGE = f"<{RDFS}range>"
+RDFS_COMMENT = f"<{RDFS}comment>"
+OWL_THING = f"<{OWL}Thing>"
+OWL_CLASS = f"<{OWL}Class>"
+OWL_ONTOLOGY = f"<{OWL}Ontology>"
+OWL_RESTRICTION = f"<{OWL}Restriction>"
+OWL_ON_PROPERTY = f"<{OWL}onProperty>"
+OWL_SOME_VALUES_FROM = f"<{OWL}someValuesFrom>"
+OWL_INVERSE_OF = f"<{OWL}inverseOf>"
+
+# Entity kinds and the rdf:type each one is declared with
+ENTITY_TYPES = {
+    "class": OWL_CLASS,
+    "object_property": f"<{OWL}ObjectProperty>",
+    "data_property": f"<{OWL}DatatypeProperty>",
+    "annotation_property": f"<{OWL}AnnotationProperty>",
+}
+TRANSITIVE_PROPERTY = f"<{OWL}TransitiveProperty>"
+FUNCTIONAL_PROPERTY = f"<{OWL}FunctionalProperty>"
+
+# Data property ranges, as owlready2 maps str, float and int
+DATATYPE_RANGES = {
+    "string": f"<{XSD}string>",
+    "float": f"<{XSD}decimal>",
+    "integer": f"<{XSD}integer>",
+}
+
+# Output formats with a "-gzip" suffix are written gzip-compressed
+GZIP_SUFFIX = "-gzip"
+
+TRIPLE_FORMATS = {
+    "ntriples": ".nt",
+    "turtle": ".ttl",
+    "ntriples" + GZIP_SUFFIX: ".nt.gz",
+    "turtle" + GZIP_SUFFIX: ".ttl.gz",
+}
+
+
+def split_format(output_format):
+    """Split an output format into its serialization and whether it is gzip-compressed."""
+    if output_format.endswith(GZIP_SUFFIX):
+        return output_format[:-len(GZIP_SUFFIX)], True
+    return output_format, False
+
+
+@contextmanager
+def open_output(target, output_format, mode='w'):
+    """
+    Open an output for a format, compressing it for "-gzip" formats.
+
+    Args:
+        target: Path of the file to write, or a binary file-like object to
+            write into. A file-like object is flushed but left open.
+        output_format (str): The output format, e.g. "turtle" or "ntriples-gzip".
+        mode (str): 'w' for text (UTF-8) or 'wb' for bytes.
+
+    Yields:
+        The text or binary stream to write the serialization to.
+    """
+    _, compressed = split_format(output_format)
+    owned = isinstance(target, str)
+    raw = open(target, 'wb') if owned else target
+    compressor = text = None
+    try:
+        stream = raw
+        if compressed:
+            # No file name or timestamp in the header: the same content always
+            # compresses to the same bytes
+            stream = compressor = gzip.GzipFile(filename="", fileobj=raw, mode='wb', mtime=0)
+        if 'b' not in mode:
+            stream = text = io.TextIOWrapper(stream, encoding='utf-8')
+        yield stream
+    finally:
+        # Flush the layers without closing a caller's file object
+        if text is not None:
+            text.detach()
+        if compressor is not None:
+            compressor.close()
+        if owned:
+            raw.close()
+        else:
+            raw.flush()
+
+
+def literal(value):
+    """Format a string as an N-Triples literal, typed the way owlready2 writes it."""
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"')
+               .replace('\n', '\\n').replace('\r', '\\r'))
+    return f'"{escaped}"^^<{XSD}string>'
+
+
+class NTriplesWriter:
+    """Write triples to a text file, one N-Triples statement per line."""
+
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+
+    def write(self, s, p, o):
+        self.file.write(f"{s} {p} {o} .\n")
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+class TurtleWriter:
+    """Write triples to a text file as Turtle, grouping consecutive triples by subject."""
+
+    def __init__(self, file, ontology_iri):
+        self.file = file
+        self.count = 0
+        self.prefixes = [
+            ("", f"{ontology_iri}#"),
+            ("owl", OWL),
+            ("rdf", RDF),
+            ("rdfs", RDFS),
+            ("xsd", XSD),
+        ]
+        self._subject = None
+        for prefix, namespace in self.prefixes:
+            file.write(f"@prefix {prefix}: <{namespace}> .\n")
+        file.write("\n")
+
+    def _term(self, term):
+        """Shorten an IRI term to a prefixed name where Turtle allows it."""
+        if not term.startswith("<"):
+            return self._datatype(term) if term.startswith('"') else term
+        iri = term[1:-1]
+        for prefix, namespace in self.prefixes:
+            if iri.startswith(namespace):
+                local = iri[len(namespace):]
+                if local and (local[0].isalpha() or local[0] == "_") and all(c.isalnum() or c in "_-" for c in local):
+                    return f"{prefix}:{local}"
+        return term
+
+    def _datatype(self, term):
+        """Shorten the datatype IRI of a typed literal."""
+        if not term.endswith(">"):
+            return term
+        value, _, datatype = term.rpartition("^^")
+        return f"{value}^^{self._term(datatype)}" if value else term
+
+    def write(self, s, p, o):
+        p = "a" if p == RDF_TYPE else self._term(p)
+        if s == self._subject:
+            self.file.write(f" ;\n    {p} {self._term(o)}")
+        else:
+            if self._subject is not None:
+                self.file.write(" .\n")
+            self._subject = s
+            self.file.write(f"{self._term(s)} {p} {self._term(o)}")
+        self.count += 1
+
+    def close(self):
+        if self._subject is not None:
+            self.file.write(" .\n")
+            self._subject = None
+
+
+def open_writer(file, output_format, ontology_iri):
+    """Create the triple writer for an output format."""
+    output_format, _ = split_format(output_format)
+    if output_format == "ntriples":
+        return NTriplesWriter(file)
+    if output_format == "turtle":
+        return TurtleWriter(file, ontology_iri)
+    raise ValueError(f"Unsupported triple output format: {output_format}")
+
+
+# Name of the manifest of a directory of shards
+SHARD_MANIFEST = "manifest.json"
+
+# Bump when the manifest layout changes
+SHARD_MANIFEST_FORMAT = 1
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_shard_manifest(shard_dir):
+    """Return the manifest of a directory of shards, or None if it has none."""
+    path = os.path.join(shard_dir, SHARD_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class ShardWriter:
+    """
+    Write triples to one file per shard, in a directory with a manifest.
+
+    ``switch`` starts the next shard; every triple goes to the current one.
+    ``close`` writes the manifest, which lists each shard's file, source CSV,
+    triple count and SHA-256, and removes the files of shards an earlier run
+    wrote to the directory that this run did not.
+    """
+
+    def __init__(self, directory, output_format, ontology_iri):
+        self.directory = directory
+        self.output_format = output_format
+        self.ontology_iri = ontology_iri
+        self.extension = TRIPLE_FORMATS[output_format]
+        self.count = 0
+        self.shards = []
+        self._output = self._writer = None
+        os.makedirs(directory, exist_ok=True)
+
+    def switch(self, name, source=None):
+        """Close the current shard and start writing to a new one."""
+        self._close_shard()
+        file_name = f"{name}{self.extension}"
+        used = {shard["file"] for shard in self.shards}
+        counter = 2
+        while file_name in used:
+            file_name = f"{name}_{counter}{self.extension}"
+            counter += 1
+        self._output = ExitStack()
+        file = self._output.enter_context(open_output(os.path.join(self.directory, file_name), self.output_format))
+        self._writer = open_writer(file, self.output_format, self.ontology_iri)
+        self.shards.append({"name": file_name[:-len(self.extension)], "file": file_name, "source": source,
+                            "triples": 0})
+
+    def write(self, s, p, o):
+        self._writer.write(s, p, o)
+        self.shards[-1]["triples"] += 1
+        self.count += 1
+
+    def _close_shard(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._output.close()
+        self._writer = self._output = None
+        shard = self.shards[-1]
+        shard["sha256"] = _file_sha256(os.path.join(self.directory, shard["file"]))
+
+    def close(self, **details):
+        """Finish the last shard and write the manifest, with ``details`` added to it."""
+        self._close_shard()
+        previous = load_shard_manifest(self.directory) or {}
+        written = {shard["file"] for shard in self.shards}
+        for shard in previous.get("shards", []):
+            path = os.path.join(self.directory, shard["file"])
+            # Only plain file names of this directory are removed
+            if shard["file"] not in written and os.path.basename(shard["file"]) == shard["file"] \
+                    and os.path.exists(path):
+                os.remove(path)
+        manifest = {"format": SHARD_MANIFEST_FORMAT, "ontology_iri": self.ontology_iri,
+                    "output_format": self.output_format, "triples": self.count, **details, "shards": self.shards}
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(temp_path, os.path.join(self.directory, SHARD_MANIFEST))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return manifest
+
+    def abort(self):
+        """Close the current shard file after a failure, without a manifest."""
+        if self._output is not None:
+            self._output.close()
+            self._writer = self._output = None
+
+
+class NTriplesConverter:
+    """
+    Binary file-like object that passes the N-Triples written to it on to a
+    triple writer, e.g. to save an owlready2 ontology as Turtle.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self._pending = b""
+
+    def write(self, data):
+        lines = (self._pending + data).split(b"\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._convert(line)
+        return len(data)
+
+    def _convert(self, line):
+        line = line.decode('utf-8').strip()
+        if not line or line.startswith("#"):
+            return
+        # Subjects and predicates never contain spaces; the object is the rest
+        s, p, o = line.split(" ", 2)
+        self.writer.write(s, p, o.rstrip()[:-1].rstrip())
+
+    def close(self):
+        self._convert(self._pending)
+        self._pending = b""
+        self.writer.close()
+
+
+class TripleBuilder:
+    """
+    Turn ontology config entries and CSV scans into triples.
+
+    Keeps the same bookkeeping owlready2 does for the generator: which names
+    are already declared (the equivalent of ``getattr(onto, name)``) and
+    which parents a class has, so re-declarations add the same triples the
+    owlready2 engine would.
+    """
+
+    def __init__(self, writer, ontology_iri, names=None):
+        self.writer = writer
+        self.ontology_iri = ontology_iri
+        self.namespace = f"{ontology_iri}#"
+        self.entities = {}
+        self.parents = {}
+        self.statements = set()
+        self.restrictions = set()
+        self.bnode_count = 0
+        # Names of the entities minted from CSV values
+        self.names = names if names is not None else NameTable()
+        # Keys and lookup references of the class files, joined by join()
+        self.index = EntityIndex()
+        # Statistics reported by fragments, e.g. collapsed duplicate edges
+        self.counts = {}
+
+    def iri(self, name):
+        return f"<{self.namespace}{name}>"
+
+    def has(self, name):
+        return name in self.entities
+
+    def class_term(self, name, default=OWL_THING):
+        """Return the term of a declared class, or ``default``."""
+        return self.iri(name) if self.has(name) else default
+
+    def emit(self, s, p, o):
+        self.writer.write(s, p, o)
+
+    def emit_once(self, s, p, o):
+        """Emit a triple unless it was already written by this builder."""
+        if (s, p, o) not in self.statements:
+            self.statements.add((s, p, o))
+            self.writer.write(s, p, o)
+
+    def declare_ontology(self):
+        self.emit(f"<{self.ontology_iri}>", RDF_TYPE, OWL_ONTOLOGY)
+
+    def declare_class(self, name, parent=OWL_THING):
+        """Declare a class with a parent, like ``types.new_class(name, (parent,))``."""
+        subject = self.iri(name)
+        if name not in self.entities:
+            self.names.reserve(name)
+            self.entities[name] = "class"
+            self.parents[name] = {parent}
+            self.emit(subject, RDF_TYPE, OWL_CLASS)
+            self.emit(subject, RDFS_SUBCLASSOF, parent)
+        elif parent != OWL_THING:
+            # owlready2 adds new bases to an existing class, except a bare Thing
+            parents = self.parents.setdefault(name, set())
+            if parent not in parents:
+                parents.add(parent)
+                self.emit(subject, RDFS_SUBCLASSOF, parent)
+        return subject
+
+    def declare_property(self, name, kind):
+        """Declare an object, data or annotation property."""
+        subject = self.iri(name)
+        if name not in self.entities:
+            self.names.reserve(name)
+            self.entities[name] = kind
+            self.emit(subject, RDF_TYPE, ENTITY_TYPES[kind])
+        return subject
+
+    def some_values_from(self, subject, prop, target):
+        """Add ``prop.some(target)`` to the parents of ``subject`` once."""
+        key = (subject, prop, target)
+        if key in self.restrictions:
+            return False
+        self.restrictions.add(key)
+        self.bnode_count += 1
+        bnode = f"_:r{self.bnode_count}"
+        self.emit(subject, RDFS_SUBCLASSOF, bnode)
+        self.emit(bnode, RDF_TYPE, OWL_RESTRICTION)
+        self.emit(bnode, OWL_ON_PROPERTY, prop)
+        self.emit(bnode, OWL_SOME_VALUES_FROM, target)
+        return True
+
+    def subclass_of(self, name, parent_name):
+        """
+        Add a declared class as a parent of another, like ``is_a.append(parent)``.
+
+        A parent that is already a subclass of ``name`` would make the
+        hierarchy cyclic, which owlready2 refuses; it is skipped with a warning.
+
+        Returns:
+            bool: Whether the parent was added.
+        """
+        pending = [parent_name]
+        seen = set()
+        while pending:
+            ancestor = pending.pop()
+            if ancestor == name:
+                print(f"Warning: {parent_name} is a subclass of {name}; not added as its parent")
+                return False
+            if ancestor not in seen:
+                seen.add(ancestor)
+                pending += [self.name(term) for term in self.parents.get(ancestor, ()) if self.name(term)]
+        self.declare_class(name, self.iri(parent_name))
+        return True
+
+    def name(self, term):
+        """Return the entity name of a term in the ontology namespace, or None."""
+        if term.startswith(f"<{self.namespace}"):
+            return term[len(self.namespace) + 1:-1]
+        return None
+
+    def structure(self):
+        """Summarize the declared classes and properties for consistency.check_structure."""
+        structure = new_structure()
+        datatypes = {term: name for name, term in DATATYPE_RANGES.items()}
+        for name, kind in self.entities.items():
+            if kind == "class":
+                structure["classes"][name] = [self.name(p) for p in self.parents.get(name, ()) if self.name(p)]
+            elif kind in ("object_property", "data_property"):
+                structure["properties"][name] = {
+                    "kind": "object" if kind == "object_property" else "data",
+                    "domain": [], "range": [], "functional": False, "transitive": False,
+                }
+        for s, p, o in self.statements:
+            prop = structure["properties"].get(self.name(s))
+            if prop is None:
+                continue
+            if p == RDFS_DOMAIN:
+                prop["domain"].append(self.name(o))
+            elif p == RDFS_RANGE:
+                prop["range"].append(self.name(o) or datatypes.get(o, o))
+            elif p == RDF_TYPE and o == FUNCTIONAL_PROPERTY:
+                prop["functional"] = True
+            elif p == RDF_TYPE and o == TRANSITIVE_PROPERTY:
+                prop["transitive"] = True
+        for subject, prop, target in self.restrictions:
+            structure["restrictions"].append((self.name(subject), self.name(prop), self.name(target)))
+        return structure
+
+    def add_base(self, plan):
+        """Emit the ontology header, base classes, annotation properties and required properties of a plan."""
+        self.declare_ontology()
+        for base_class in plan["base_classes"]:
+            parent_name = base_class["parent"]
+            if parent_name == "Thing":
+                parent = OWL_THING
+            else:
+                parent = self.class_term(parent_name, None)
+                if parent is None:
+                    print(f"Warning: Parent class {parent_name} not found, using Thing")
+                    parent = OWL_THING
+            self.declare_class(base_class["name"], parent)
+
+        for ann_prop in plan["annotation_properties"]:
+            self.declare_property(ann_prop["name"], "annotation_property")
+
+        # Relationship properties used by hierarchy files and lookups
+        for prop_name in plan["required_properties"]:
+            self.declare_property(prop_name, "object_property")
+
+        # Class types of the files, declared when their file runs
+        for class_name in plan["required_classes"]:
+            self.names.reserve(class_name)
+
+    def join(self):
+        """
+        Resolve the lookup references of all files (see entity_index).
+
+        Returns:
+            int: Number of restrictions added.
+        """
+        joined = 0
+        for prop_name, from_name, to_name, _ in self.index.join():
+            if not self.has(from_name):
+                print(f"Warning: Entity {from_name} not found for relationship {prop_name}")
+                continue
+            prop = self.declare_property(prop_name, "object_property")
+            joined += self.some_values_from(self.iri(from_name), prop, self.iri(to_name))
+        return joined
+
+    def add_file(self, scan, file_config):
+        """Emit the triples for one scanned CSV file."""
+        self.apply(file_fragment(scan, file_config, self.ontology_iri))
+
+    def apply(self, ops):
+        """
+        Replay the operations of a file fragment (see ``file_fragment``).
+
+        Lookups that depend on what earlier files declared are resolved here,
+        so a fragment gives the same triples whether it was just built or read
+        back from the fragment cache.
+        """
+        for op in ops:
+            kind = op[0]
+            if kind == "class":
+                self.declare_class(op[1], op[2])
+            elif kind == "class_if_missing":
+                if not self.has(op[1]):
+                    self.declare_class(op[1], self.class_term(op[2]))
+            elif kind == "property":
+                self.declare_property(op[1], op[2])
+            elif kind == "entity":
+                _, value, class_name, parent = op
+                self.declare_class(self.names.mint(value, class_name), parent)
+            elif kind == "annotation":
+                _, entity, class_name, prop_name, value = op
+                if self.has(prop_name) and value:
+                    self.emit(self.iri(self.names.mint(entity, class_name)), self.iri(prop_name), literal(value))
+                elif not self.has(prop_name):
+                    print(f"Warning: Annotation property {prop_name} not found.")
+            elif kind == "entity_some":
+                _, from_value, from_class, prop, to_value, to_class = op
+                self.some_values_from(self.iri(self.names.mint(from_value, from_class)), prop,
+                                      self.iri(self.names.mint(to_value, to_class)))
+            elif kind == "entity_parent":
+                _, from_value, from_class, to_value, to_class = op
+                self.subclass_of(self.names.mint(from_value, from_class), self.names.mint(to_value, to_class))
+            elif kind == "entity_link":
+                _, from_value, from_class, prop, to_value, to_class = op
+                self.emit_once(self.iri(self.names.mint(from_value, from_class)), prop,
+                               self.iri(self.names.mint(to_value, to_class)))
+            elif kind == "once":
+                self.emit_once(op[1], op[2], op[3])
+            elif kind == "count":
+                self.counts[op[1]] = self.counts.get(op[1], 0) + op[2]
+            elif kind == "key":
+                _, file_name, column, key, entity, class_name = op
+                self.index.add_key(file_name, column, key, self.names.mint(entity, class_name))
+            elif kind == "reference":
+                _, prop_name, from_value, from_class, lookup_file, lookup_column, value, occurrences = op
+                from_name = self.names.get(from_value, from_class) or normalize_name(from_value)
+                self.index.add_reference(prop_name, from_name, lookup_file, lookup_column, value, occurrences)
+            else:
+                raise ValueError(f"Unknown fragment operation: {kind}")
+
+
+def file_fragment(scan, file_config, ontology_iri):
+    """
+    Turn one scanned CSV file into its fragment: a stream of builder operations.
+
+    Operations are plain tuples so fragments can be cached as JSON.
+    Entities made from CSV values are given as (value, class name) pairs and
+    only named when the fragment is applied (see iri_minting), so a fragment
+    does not depend on the other files:
+
+    - ("class", name, parent_term): declare a class
+    - ("class_if_missing", name, parent_name): declare a class unless it
+      exists, under ``parent_name`` if that is declared and Thing otherwise
+    - ("entity", value, class_name, parent_term): declare the entity of a value
+    - ("property", name, kind): declare a property
+    - ("annotation", value, class_name, property_name, annotation_value):
+      annotate an entity if the annotation property exists
+    - ("entity_some", from_value, from_class, property_term, to_value,
+      to_class): add a restriction between two entities
+    - ("entity_parent", from_value, from_class, to_value, to_class): make
+      an entity a subclass of another, unless that makes a cycle
+    - ("entity_link", from_value, from_class, property_term, to_value,
+      to_class): annotate an entity with another
+    - ("once", s, p, o): emit a triple unless already written
+    - ("count", name, n): add ``n`` to a statistic of the run
+    - ("key", file_name, column, key, value, class_name): index an entity by
+      a key column value for the lookups of other files
+    - ("reference", property_name, from_value, from_class, lookup_file,
+      lookup_column, value, occurrences): a lookup, resolved by
+      TripleBuilder.join once every file was applied
+
+    Args:
+        scan (dict): The result of ``scan_csv_file`` for the file.
+        file_config (dict): The file's entry from the ``files`` list of the config.
+        ontology_iri (str): Base IRI of the ontology.
+    """
+    namespace = f"{ontology_iri}#"
+    fragments = {
+        "class": _class_fragment,
+        "hierarchy": _hierarchy_fragment,
+        "object_properties": _object_property_fragment,
+        "data_properties": _data_property_fragment,
+    }
+    make_fragment = fragments.get(file_config["type"])
+    if make_fragment:
+        yield from make_fragment(scan, file_config, lambda name: f"<{namespace}{name}>")
+
+
+def _class_fragment(scan, file_config, iri):
+    class_type = file_config["class_type"]
+    parent_name = "Habitat" if "Habitat" in class_type else "Thing"
+    yield ("class_if_missing", class_type, parent_name)
+    class_term = iri(class_type)
+
+    for rel_class in file_config.get("related_classes", []):
+        rel_class_type = rel_class["class"]
+        yield ("class", rel_class_type, OWL_THING)
+        rel_term = iri(rel_class_type)
+        for value in scan["related"][rel_class["column"]]:
+            yield ("entity", value, rel_class_type, rel_term)
+
+    annotations = file_config.get("annotations", [])
+    for entry in scan["entities"].values():
+        yield ("entity", entry["name"], class_type, class_term)
+        for ann in annotations:
+            yield ("annotation", entry["name"], class_type, ann["property"], entry["annotations"].get(ann["property"]))
+
+    for column, values in scan["keys"].items():
+        for value, name in values.items():
+            yield ("key", file_config["name"], column, value, name, class_type)
+    lookups = [rel for rel in file_config.get("relationships", []) if rel.get("lookup_file")]
+    for rel, references in zip(lookups, scan["references"]):
+        for (from_name, value), occurrences in references.items():
+            yield ("reference", rel["property"], from_name, class_type, rel["lookup_file"],
+                   rel["lookup_column"], value, occurrences)
+
+
+def _hierarchy_fragment(scan, file_config, iri):
+    # Class of each name, by column and for the whole file
+    column_classes = {}
+    class_entities = {}
+    for class_info in file_config.get("class_columns", []):
+        class_type = class_info["class"]
+        yield ("class_if_missing", class_type, "TaxonomicRank")
+        class_term = iri(class_type)
+        classes = column_classes.setdefault(class_info["column"], {})
+        for name in scan["names"][class_info["column"]]:
+            yield ("entity", name, class_type, class_term)
+            classes[name] = class_entities[name] = class_type
+
+    # Each (property, from, to) edge is emitted once, however many rows repeat it
+    materialized = set()
+    duplicate_edges = 0
+    for rel, rel_edges in zip(file_config.get("relationships", []), scan["edges"]):
+        encoding = hierarchy_encoding(rel)
+        if encoding == "restriction":
+            yield ("property", rel["property"], "object_property")
+        elif encoding == "subclass_annotation":
+            yield ("property", rel["property"], "annotation_property")
+        prop = iri(rel["property"])
+        from_classes = column_classes.get(rel["from_column"], class_entities)
+        to_classes = column_classes.get(rel["to_column"], class_entities)
+        for (from_name, to_name), occurrences in rel_edges.items():
+            if from_name in from_classes and to_name in to_classes:
+                edge = (from_name, from_classes[from_name], prop, to_name, to_classes[to_name])
+                if edge in materialized:
+                    duplicate_edges += occurrences
+                    continue
+                materialized.add(edge)
+                duplicate_edges += occurrences - 1
+                if encoding == "restriction":
+                    yield ("entity_some",) + edge
+                    continue
+                yield ("entity_parent", edge[0], edge[1], edge[3], edge[4])
+                if encoding == "subclass_annotation":
+                    yield ("entity_link",) + edge
+            else:
+                print(f"Warning: Entity {from_name} or {to_name} not found in class_entities")
+    yield ("count", "duplicate_edges", duplicate_edges)
+
+
+def _object_property_fragment(scan, file_config, iri):
+    for definition in scan["properties"]:
+        # Declaring an existing class with Thing as parent changes nothing
+        yield ("class", definition["domain"], OWL_THING)
+        yield ("class", definition["range"], OWL_THING)
+        domain = iri(definition["domain"])
+        range_ = iri(definition["range"])
+
+        yield ("property", definition["name"], "object_property")
+        prop = iri(definition["name"])
+        yield ("once", prop, RDFS_DOMAIN, domain)
+        yield ("once", prop, RDFS_RANGE, range_)
+        if definition["transitive"]:
+            yield ("once", prop, RDF_TYPE, TRANSITIVE_PROPERTY)
+        if definition["functional"]:
+            yield ("once", prop, RDF_TYPE, FUNCTIONAL_PROPERTY)
+        if definition["description"]:
+            yield ("once", prop, RDFS_COMMENT, literal(definition["description"]))
+
+        if definition["inverse"]:
+            yield ("property", definition["inverse"], "object_property")
+            inverse = iri(definition["inverse"])
+            yield ("once", inverse, RDFS_DOMAIN, range_)
+            yield ("once", inverse, RDFS_RANGE, domain)
+            yield ("once", prop, OWL_INVERSE_OF, inverse)
+            yield ("once", inverse, OWL_INVERSE_OF, prop)
+
+
+def _data_property_fragment(scan, file_config, iri):
+    for definition in scan["properties"]:
+        yield ("class", definition["domain"], OWL_THING)
+        domain = iri(definition["domain"])
+
+        yield ("property", definition["name"], "data_property")
+        prop = iri(definition["name"])
+        if definition["functional"]:
+            yield ("once", prop, RDF_TYPE, FUNCTIONAL_PROPERTY)
+        yield ("once", prop, RDFS_DOMAIN, domain)
+        yield ("once", prop, RDFS_RANGE, DATATYPE_RANGES.get(definition["range"], DATATYPE_RANGES["string"]))
+        if definition["description"]:
+            yield ("once", prop, RDFS_COMMENT, literal(definition["description"]))
+
+
+def build_fragment(file_path, file_config, ontology_iri, key_columns=()):
+    """
+    Read one CSV file and build its complete fragment.
+
+    This is the unit of work of the parallel mode of write_ontology_triples
+    and runs in a worker process, so everything it returns is picklable.
+
+    Returns:
+        tuple: The CSV columns, the number of rows and the list of fragment
+        operations.
+    """
+    scan = scan_csv_file(file_path, file_config, key_columns)
+    return scan["columns"], scan["row_count"], list(file_fragment(scan, file_config, ontology_iri))
+
+
+def write_ontology_triples(plan, directory_path, output_file, ontology_iri, output_format="ntriples",
+                           cache_dir=None, with_structure=False, profile=None, workers=1, names=None,
+                           shards=False):
+    """
+    Generate the ontology for a directory of CSV files straight to a triple file.
+
+    Args:
+        plan (dict): The compiled generation plan (see generation_plan).
+        directory_path (str): Directory holding the ``<name>.csv`` input files.
+        output_file: Path of the file to write, or a binary file-like object
+            to write into. With ``shards``, the directory to write the shards to.
+        ontology_iri (str): Base IRI of the ontology.
+        output_format (str): "ntriples" or "turtle", optionally with the
+            "-gzip" suffix for a compressed file.
+        cache_dir (str, optional): Directory of a fragment cache. Files whose
+            content and config entry are unchanged since a previous run are
+            replayed from it instead of being read again.
+        with_structure (bool): Also return a "structure" summary of the
+            ontology for consistency.check_structure.
+        profile (profiling.GenerationProfile, optional): Records the base
+            ontology, properties, classes and hierarchies, joins and save
+            phases.
+        workers (int, optional): With 1 (the default) files are read one
+            after the other. Otherwise the fragments of all files that are
+            not cached are built at once in a pool of this many processes
+            (None: one per CPU) and applied in plan order as they complete,
+            so the output is the same as in serial mode.
+        names (iri_minting.NameTable, optional): The table entity names are
+            minted in; a new one is used by default. It is updated in place.
+        shards (bool): Write one file per shard instead of a single file
+            (see ShardWriter): "base" with the ontology header and the
+            config's classes and properties, one per ``files[]`` entry with
+            the triples its file adds, and "lookups" with the restrictions
+            joined between files. Each shard is a complete document with
+            its own blank nodes, so it can be loaded into a named graph of
+            its own and reloaded alone when it changes.
+
+    Returns:
+        dict: Counts of triples and entities written, of fragments rebuilt
+        and reused, of duplicate hierarchy edges collapsed, of lookups
+        between files joined into restrictions and left unresolved, and of
+        entity names disambiguated; with ``shards``, also the "manifest".
+    """
+    cache = FragmentCache(cache_dir) if cache_dir else None
+    profile = profile or GenerationProfile()
+    built = reused = 0
+
+    def load_cached(file_path, task):
+        """Return the cache key and the cached operations of a file, if any."""
+        if not cache:
+            return None, None
+        key = fragment_key(file_path, task["file"], ontology_iri, task["key_columns"])
+        return key, cache.load(key)
+
+    # Parallel mode: start building every fragment that is not cached
+    pool = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+    prepared = {}  # task index -> (cache key, cached operations, future)
+    if pool:
+        for i, task in enumerate(plan["tasks"]):
+            file_path = os.path.join(directory_path, task["csv"])
+            if os.path.exists(file_path):
+                key, ops = load_cached(file_path, task)
+                future = None
+                if ops is None:
+                    future = pool.submit(build_fragment, file_path, task["file"], ontology_iri, task["key_columns"])
+                prepared[i] = (key, ops, future)
+
+    def add_files(phase, counters):
+        nonlocal built, reused
+        for i, task in enumerate(plan["tasks"]):
+            if task["phase"] != phase:
+                continue
+            file_config = task["file"]
+            file_path = os.path.join(directory_path, task["csv"])
+            print(f"Processing file: {file_path}")
+            if not os.path.exists(file_path):
+                print(f"Warning: {file_path} not found.")
+                continue
+            start_shard(task["name"], task["csv"])
+
+            if i in prepared:
+                key, ops, future = prepared.pop(i)
+            else:
+                (key, ops), future = load_cached(file_path, task), None
+            if ops is not None:
+                print(f"Reusing cached fragment for {file_config['name']}")
+                reused += 1
+            else:
+                if future is not None:
+                    columns, row_count, ops = future.result()
+                else:
+                    scan = scan_csv_file(file_path, file_config, task["key_columns"])
+                    columns, row_count = scan["columns"], scan["row_count"]
+                    ops = file_fragment(scan, file_config, ontology_iri)
+                print(f"CSV columns: {columns} ({row_count} rows)")
+                counters["rows"] += row_count
+                if cache:
+                    ops = cache.store(key, ops)
+                built += 1
+            builder.apply(ops)
+
+    def start_shard(name, source=None):
+        if shards:
+            writer.switch(name, source)
+            # Blank node labels only have to be unique within a document
+            builder.bnode_count = 0
+
+    manifest = None
+    try:
+        with ExitStack() as stack:
+            if shards:
+                f = None
+                writer = ShardWriter(output_file, output_format, ontology_iri)
+                stack.callback(writer.abort)
+            else:
+                f = stack.enter_context(open_output(output_file, output_format))
+                writer = open_writer(f, output_format, ontology_iri)
+            builder = TripleBuilder(writer, ontology_iri, names)
+
+            def counts():
+                return {"entities": len(builder.entities), "triples": writer.count}
+
+            with profile.phase("base ontology", counts):
+                start_shard("base")
+                builder.add_base(plan)
+
+            # Properties first, as the owlready2 engine does
+            with profile.phase("properties", counts) as counters:
+                add_files("properties", counters)
+            with profile.phase("classes and hierarchies", counts) as counters:
+                add_files("classes", counters)
+            with profile.phase("joins", counts):
+                if builder.index.references:
+                    start_shard("lookups")
+                joined_edges = builder.join()
+
+            with profile.phase("save"):
+                if shards:
+                    manifest = writer.close(config_hash=plan["config_hash"])
+                else:
+                    writer.close()
+                    f.flush()
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+    if cache:
+        cache.prune()
+
+    result = {"triples": writer.count, "entities": len(builder.entities),
+              "fragments_built": built, "fragments_reused": reused,
+              "duplicate_edges": builder.counts.get("duplicate_edges", 0),
+              "joined_edges": joined_edges, "unresolved_references": builder.index.unresolved,
+              "name_collisions": builder.names.collisions}
+    if manifest is not None:
+        result["manifest"] = manifest
+    if with_structure:
+        result["structure"] = builder.structure()
+    return result
@@ -0,0 +1,64 @@
+"""
+Output formats of the ontology generator.
+
+The formats (and file extensions) each generation engine can write, and
+how a generated file is streamed back, e.g. for a download or a triple
+store upload. Kept apart from generate_ontology so the web app and the
+automation can use them without importing owlready2, which is only loaded
+once an ontology is actually generated.
+"""
+
+import gzip
+
+from ontology_triples import GZIP_SUFFIX, TRIPLE_FORMATS, split_format
+
+# Output formats (and file extensions) each generation engine can write
+ENGINE_FORMATS = {
+    "owlready2": {
+        "rdfxml": ".owl",
+        "ntriples": ".nt",
+        "turtle": ".ttl",
+        "rdfxml" + GZIP_SUFFIX: ".owl.gz",
+        "ntriples" + GZIP_SUFFIX: ".nt.gz",
+        "turtle" + GZIP_SUFFIX: ".ttl.gz",
+    },
+    "triples": TRIPLE_FORMATS,
+}
+DEFAULT_FORMATS = {"owlready2": "rdfxml", "triples": "ntriples"}
+
+# Media types of the serializations, for downloads and triple store uploads
+MEDIA_TYPES = {"rdfxml": "application/rdf+xml", "ntriples": "text/plain", "turtle": "application/x-turtle"}
+
+# Size of the byte chunks of streamed ontologies
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def output_extension(engine="owlready2", output_format=None):
+    """Return the file extension of an engine's output format, e.g. ".nt.gz"."""
+    return ENGINE_FORMATS[engine][output_format or DEFAULT_FORMATS[engine]]
+
+
+def output_format_of(filename):
+    """Return the output format of a generated file from its extension, or None."""
+    matches = [(extension, output_format) for formats in ENGINE_FORMATS.values()
+               for output_format, extension in formats.items() if filename.endswith(extension)]
+    return max(matches, key=lambda match: len(match[0]))[1] if matches else None
+
+
+def stream_ontology_file(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream a generated ontology file, e.g. as the body of a triple store upload.
+
+    Returns:
+        tuple: An iterator of byte chunks of the serialized ontology,
+        decompressed for "-gzip" formats, and its media type. The file is
+        only opened once the iteration starts.
+    """
+    serialization, compressed = split_format(output_format_of(path) or "rdfxml")
+
+    def chunks():
+        with (gzip.open(path, 'rb') if compressed else open(path, 'rb')) as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                yield chunk
+
+    return chunks(), MEDIA_TYPES[serialization]
@@ -0,0 +1,190 @@
+"""
+Per-phase timing and memory profile of an ontology generation.
+
+A generation is split into phases (configuration, base ontology, properties,
+classes and hierarchies, reasoner, save). For each phase the profile records
+wall time, CPU time, memory and how many rows, entities and triples the
+phase processed or created. The report is a plain
+dict, so it can be stored with the session metadata or the automation state
+as JSON.
+
+A caller can follow a running generation through ``on_phase``, which is
+called with the name of each phase as it starts (see the progress argument
+of generate_ontology_from_directory).
+
+CPU time is that of the thread running the generation (time.thread_time),
+so generations running in threads of the same process (see
+generate_ontologies_parallel) do not count each other's work; CSV files
+read by worker processes (``workers``) are not included.
+
+By default each phase records how much the resident set size of the process
+changed during it ("rss_delta_bytes"), which costs nothing; the report's
+total adds the peak RSS the process reached over its whole lifetime
+("process_peak_rss_bytes"). With ``trace_memory`` the profile also traces
+allocations with tracemalloc, which gives the peak of each phase
+("peak_memory_bytes") but slows the generation down several times, so it
+is meant for explicit profiling runs. The report's "memory" says which one
+was used.
+
+Memory is measured process wide: when several generations run in threads of
+the same process, their RSS changes and traced peaks include each other's
+allocations. Tracing stays on until the last traced profile stops, but each
+phase resets the traced peak for all of them; a report whose phases
+overlapped another traced generation is marked "shared_tracing".
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+COUNTERS = ["rows", "entities", "triples"]
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Profiles tracing allocations at the moment, and whether they started tracemalloc
+_tracing_lock = threading.Lock()
+_tracing_profiles = 0
+_tracing_started = False
+
+
+def peak_rss_bytes():
+    """Return the peak resident set size of this process in bytes, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes():
+    """Return the current resident set size of this process in bytes, or None if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):  # No procfs, e.g. on macOS or Windows
+        return None
+
+
+class GenerationProfile:
+    """Collect the phases of one generation."""
+
+    def __init__(self, trace_memory=False, on_phase=None):
+        self.trace_memory = trace_memory
+        self.on_phase = on_phase
+        self.phases = []
+        self.shared_tracing = False
+        self._tracing = False
+
+    def start(self):
+        global _tracing_profiles, _tracing_started
+        if not self.trace_memory or self._tracing:
+            return
+        with _tracing_lock:
+            if _tracing_profiles == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracing_started = True
+            _tracing_profiles += 1
+        self._tracing = True
+
+    def stop(self):
+        global _tracing_profiles, _tracing_started
+        if not self._tracing:
+            return
+        with _tracing_lock:
+            _tracing_profiles -= 1
+            if _tracing_profiles == 0 and _tracing_started:
+                tracemalloc.stop()
+                _tracing_started = False
+        self._tracing = False
+
+    def _peak_memory(self):
+        return tracemalloc.get_traced_memory()[1] if self._tracing else None
+
+    @contextmanager
+    def phase(self, name, counts=None):
+        """
+        Time a phase of the generation.
+
+        Args:
+            name (str): Name of the phase.
+            counts (callable, optional): Returns the current totals of some of
+                COUNTERS, e.g. {"entities": ..., "triples": ...}. The phase
+                records how much they grew.
+
+        Yields:
+            dict: The phase's counters; the caller may add to them, e.g.
+            the number of CSV rows read.
+        """
+        if self.on_phase:
+            self.on_phase(name)
+        counters = dict.fromkeys(COUNTERS, 0)
+        before = counts() if counts else {}
+        if self._tracing:
+            if _tracing_profiles > 1:
+                self.shared_tracing = True
+            tracemalloc.reset_peak()
+        rss = current_rss_bytes()
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield counters
+        finally:
+            rss_after = current_rss_bytes()
+            entry = {
+                "name": name,
+                "wall_seconds": round(time.perf_counter() - wall, 4),
+                "cpu_seconds": round(time.thread_time() - cpu, 4),
+                "rss_delta_bytes": None if rss is None or rss_after is None else rss_after - rss,
+                "peak_memory_bytes": self._peak_memory(),
+            }
+            after = counts() if counts else {}
+            for key in COUNTERS:
+                entry[key] = counters[key] + after.get(key, 0) - before.get(key, 0)
+            self.phases.append(entry)
+
+    def report(self):
+        """Return the phases, their totals and how memory was measured ("rss" or "tracemalloc")."""
+        deltas = [p["rss_delta_bytes"] for p in self.phases if p["rss_delta_bytes"] is not None]
+        peaks = [p["peak_memory_bytes"] for p in self.phases if p["peak_memory_bytes"] is not None]
+        total = {
+            "wall_seconds": round(sum(p["wall_seconds"] for p in self.phases), 4),
+            "cpu_seconds": round(sum(p["cpu_seconds"] for p in self.phases), 4),
+            "rss_delta_bytes": sum(deltas) if deltas else None,
+            "peak_memory_bytes": max(peaks) if peaks else None,
+            "process_peak_rss_bytes": peak_rss_bytes(),
+        }
+        for key in COUNTERS:
+            total[key] = sum(p[key] for p in self.phases)
+        report = {"phases": list(self.phases), "total": total,
+                  "memory": "tracemalloc" if self.trace_memory else "rss"}
+        if self.shared_tracing:
+            report["shared_tracing"] = True
+        return report
+
+
+def _megabytes(value, signed=False):
+    if value is None:
+        return "-"
+    return f"{value / 2**20:+.1f}" if signed else f"{value / 2**20:.1f}"
+
+
+def format_profile(report):
+    """Format a profile report as a small text table."""
+    lines = [f"{'phase':<24}{'wall s':>9}{'cpu s':>9}{'rss +MB':>9}{'peak MB':>9}{'rows':>9}{'entities':>10}"
+             f"{'triples':>9}"]
+    for p in report["phases"] + [dict(report["total"], name="total")]:
+        lines.append(f"{p['name']:<24}{p['wall_seconds']:>9.3f}{p['cpu_seconds']:>9.3f}"
+                     f"{_megabytes(p['rss_delta_bytes'], signed=True):>9}{_megabytes(p['peak_memory_bytes']):>9}"
+                     f"{p['rows']:>9}{p['entities']:>10}{p['triples']:>9}")
+    process_peak = report["total"].get("process_peak_rss_bytes")
+    if process_peak is not None:
+        lines.append(f"peak RSS of the process: {_megabytes(process_peak)} MB")
+    return "\n".join(lines)
@@ -1,8 +1,6 @@
 import os
 import json
-import gspread
 import datetime
-from google.oauth2.service_account import Credentials
 
 class SheetsIntegration:
     """
@@ -14,6 +12,10 @@ class SheetsIntegration:
         """
         Initialize the Google Sheets integration.
         
+        The credentials are only loaded, and gspread and the Google auth
+        libraries only imported, when the integration is first used, so
+        creating it costs nothing for a process that never talks to Sheets.
+        
         Args:
             service_account_file (str, optional): Path to the service account JSON file.
             service_account_json (str, optional): JSON string of the service account credentials.
@@ -24,34 +26,64 @@ class SheetsIntegration:
             'https://www.googleapis.com/auth/drive.file',
             'https://www.googleapis.com/auth/drive.readonly'
         ]
-        
+        self.service_account_file = service_account_file
+        self.service_account_json = service_account_json
+        self._credentials = None
+        self._client = None
+        self._initialized = None  # Not connected yet
+    
+    def _connect(self):
+        """Load the credentials and authorize the gspread client, once."""
+        if self._initialized is not None:
+            return
         try:
+            import gspread
+            from google.oauth2.service_account import Credentials
+            
             # Try to use service account file first
-            if service_account_file and os.path.exists(service_account_file):
-                self.credentials = Credentials.from_service_account_file(
-                    service_account_file, scopes=self.scopes
+            if self.service_account_file and os.path.exists(self.service_account_file):
+                self._credentials = Credentials.from_service_account_file(
+                    self.service_account_file, scopes=self.scopes
                 )
             # Otherwise, try to use service account JSON string from environment variable
-            elif service_account_json:
-                service_account_info = json.loads(service_account_json)
-                self.credentials = Credentials.from_service_account_info(
+            elif self.service_account_json:
+                service_account_info = json.loads(self.service_account_json)
+                self._credentials = Credentials.from_service_account_info(
                     service_account_info, scopes=self.scopes
                 )
             # Otherwise, try to get from environment variable
             elif os.environ.get('GOOGLE_SERVICE_ACCOUNT_JSON'):
                 service_account_info = json.loads(os.environ.get('GOOGLE_SERVICE_ACCOUNT_JSON'))
-                self.credentials = Credentials.from_service_account_info(
+                self._credentials = Credentials.from_service_account_info(
                     service_account_info, scopes=self.scopes
                 )
             else:
                 raise ValueError("No service account credentials provided.")
                 
             # Create the gspread client
-            self.client = gspread.authorize(self.credentials)
-            self.initialized = True
+            self._client = gspread.authorize(self._credentials)
+            self._initialized = True
         except Exception as e:
             print(f"Error initializing Google Sheets integration: {str(e)}")
-            self.initialized = False
+            self._initialized = False
+    
+    @property
+    def credentials(self):
+        """The service account credentials, loaded on first use."""
+        self._connect()
+        return self._credentials
+    
+    @property
+    def client(self):
+        """The authorized gspread client, created on first use."""
+        self._connect()
+        return self._client
+    
+    @property
+    def initialized(self):
+        """Whether the credentials could be loaded and the client authorized."""
+        self._connect()
+        return self._initialized
     
     def is_initialized(self):
         """Check if the integration is properly initialized."""
@@ -83,6 +115,7 @@ class SheetsIntegration:
     
     def get_worksheet_data(self, spreadsheet, worksheet_name=None, worksheet_index=0):
         """Get all data from a worksheet as a list of dictionaries."""
+        import gspread  # Already loaded by the client that opened the spreadsheet
         try:
             # Get the worksheet
             if worksheet_name:
@@ -245,6 +278,7 @@ class SheetsIntegration:
         Returns:
             bool: Success or failure.
         """
+        import gspread
         try:
             # Get the metadata worksheet
             try:
@@ -0,0 +1,256 @@
+"""
+Streaming readers of generated ontology files.
+
+Each reader yields the (subject, predicate, object) triples of a file as
+N-Triples terms, formatted the way owlready2 writes N-Triples, without
+loading the file: memory stays bounded however large the ontology is.
+
+- N-Triples: one statement per line
+- Turtle: the Turtle written by ontology_triples.TurtleWriter (both engines
+  write Turtle through it), one statement or ``;`` continuation per line;
+  other Turtle documents are not supported
+- RDF/XML: parsed with xml.sax as the file is read. Node and property
+  elements, rdf:about / rdf:ID / rdf:nodeID, rdf:resource, typed and
+  language-tagged literals, property attributes, xml:base and the
+  "Resource" and "Collection" parse types are supported, which covers what
+  owlready2 writes
+"""
+
+import gzip
+import xml.sax
+from urllib.parse import urljoin
+from xml.sax.handler import ContentHandler, feature_namespaces
+
+from ontology_triples import split_format
+
+RDF = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+XML = "http://www.w3.org/XML/1998/namespace"
+RDF_TYPE = f"<{RDF}type>"
+
+# Bytes of RDF/XML parsed before the triples found so far are handed out
+READ_CHUNK_SIZE = 1 << 16
+
+# Attributes of RDF/XML elements that are syntax, not property attributes
+_SYNTAX_ATTRIBUTES = {(RDF, name) for name in ("about", "ID", "nodeID", "resource", "datatype", "parseType")}
+
+
+def _open_text(path, compressed):
+    return gzip.open(path, 'rt', encoding='utf-8') if compressed else open(path, 'r', encoding='utf-8')
+
+
+def read_triples(path, output_format):
+    """
+    Yield the triples of a generated ontology file.
+
+    Args:
+        path (str): The file.
+        output_format (str): Its format, e.g. "rdfxml" or "turtle-gzip".
+
+    Yields:
+        tuple: (subject, predicate, object) N-Triples terms.
+    """
+    serialization, compressed = split_format(output_format)
+    if serialization == "rdfxml":
+        with (gzip.open(path, 'rb') if compressed else open(path, 'rb')) as f:
+            yield from read_rdfxml(f)
+    elif serialization == "turtle":
+        with _open_text(path, compressed) as f:
+            yield from read_turtle(f)
+    else:
+        with _open_text(path, compressed) as f:
+            yield from read_ntriples(f)
+
+
+def read_ntriples(lines):
+    """Yield the triples of N-Triples lines."""
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        # Subjects and predicates never contain spaces; the object is the rest
+        s, p, o = line.split(" ", 2)
+        yield s, p, o.rstrip()[:-1].rstrip()
+
+
+def read_turtle(lines):
+    """
+    Yield the triples of Turtle lines written by ontology_triples.TurtleWriter.
+
+    Raises:
+        ValueError: For a line TurtleWriter does not write.
+    """
+    prefixes = {}
+    subject = None
+
+    def term(text):
+        if text == "a":
+            return RDF_TYPE
+        if text.startswith(("<", "_:")):
+            return text
+        if text.startswith('"'):
+            value, separator, datatype = text.rpartition("^^")
+            return f"{value}^^{term(datatype)}" if separator and not datatype.startswith("<") else text
+        prefix, separator, local = text.partition(":")
+        if not separator or prefix not in prefixes:
+            raise ValueError(f"Unsupported Turtle term: {text}")
+        return f"<{prefixes[prefix]}{local}>"
+
+    for line in lines:
+        if line.startswith("@prefix"):
+            _, prefix, namespace, _ = line.split()
+            prefixes[prefix[:-1]] = namespace[1:-1]
+            continue
+        statement = line.strip()
+        if not statement:
+            continue
+        if statement[-2:] not in (" ;", " ."):
+            raise ValueError(f"Unsupported Turtle statement: {statement}")
+        statement = statement[:-2]
+        if line[0].isspace():
+            if subject is None:
+                raise ValueError(f"Unsupported Turtle statement: {statement}")
+            p, o = statement.split(" ", 1)
+        else:
+            s, p, o = statement.split(" ", 2)
+            subject = term(s)
+        yield subject, term(p), term(o)
+
+
+def _literal(value, datatype=None, lang=None):
+    """Format a literal like owlready2's N-Triples output."""
+    value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    if datatype:
+        return f'"{value}"^^<{datatype}>'
+    return f'"{value}"@{lang}' if lang else f'"{value}"'
+
+
+class _RDFXMLHandler(ContentHandler):
+    """Turn RDF/XML parsing events into triples, collected in ``triples``."""
+
+    def __init__(self):
+        super().__init__()
+        self.triples = []
+        # One frame per open element: ("node", subject), ("property", ...),
+        # ("collection", ...) or ("skip",) for an empty property element
+        self.frames = []
+        self.bases = [""]
+        self.langs = [None]
+        self.blank_count = 0
+
+    def _blank(self):
+        self.blank_count += 1
+        return f"_:g{self.blank_count}"
+
+    def _iri(self, reference):
+        return f"<{urljoin(self.bases[-1], reference)}>"
+
+    def startElementNS(self, name, qname, attrs):
+        self.bases.append(urljoin(self.bases[-1], attrs.get((XML, "base"), "")) if (XML, "base") in attrs
+                          else self.bases[-1])
+        self.langs.append(attrs.get((XML, "lang"), self.langs[-1]))
+        parent = self.frames[-1] if self.frames else None
+        if name == (RDF, "RDF"):
+            self.frames.append(("rdf",))
+        elif parent is None or parent[0] in ("rdf", "property", "collection"):
+            self._start_node(name, attrs, parent)
+        elif parent[0] == "node":
+            self._start_property(name, attrs, parent[1])
+        else:
+            raise ValueError(f"Unexpected RDF/XML element {name[0]}{name[1]}")
+
+    def _start_node(self, name, attrs, parent):
+        if (RDF, "about") in attrs:
+            subject = self._iri(attrs[(RDF, "about")])
+        elif (RDF, "ID") in attrs:
+            subject = self._iri("#" + attrs[(RDF, "ID")])
+        elif (RDF, "nodeID") in attrs:
+            subject = "_:n" + attrs[(RDF, "nodeID")]
+        else:
+            subject = self._blank()
+        if name != (RDF, "Description"):
+            self.triples.append((subject, RDF_TYPE, f"<{name[0]}{name[1]}>"))
+        self._property_attributes(subject, attrs)
+        if parent is not None and parent[0] == "property":
+            self.triples.append((parent[1], parent[2], subject))
+            parent[3]["node"] = True
+        elif parent is not None and parent[0] == "collection":
+            parent[3].append(subject)
+        self.frames.append(("node", subject))
+
+    def _property_attributes(self, subject, attrs):
+        for (namespace, local), value in attrs.items():
+            if namespace == XML or (namespace, local) in _SYNTAX_ATTRIBUTES or not namespace:
+                continue
+            if (namespace, local) == (RDF, "type"):
+                self.triples.append((subject, RDF_TYPE, self._iri(value)))
+            else:
+                self.triples.append((subject, f"<{namespace}{local}>", _literal(value, lang=self.langs[-1])))
+
+    def _start_property(self, name, attrs, subject):
+        predicate = f"<{name[0]}{name[1]}>"
+        parse_type = attrs.get((RDF, "parseType"))
+        if (RDF, "resource") in attrs or (RDF, "nodeID") in attrs:
+            target = (self._iri(attrs[(RDF, "resource")]) if (RDF, "resource") in attrs
+                      else "_:n" + attrs[(RDF, "nodeID")])
+            self.triples.append((subject, predicate, target))
+            self._property_attributes(target, attrs)
+            self.frames.append(("skip",))
+        elif parse_type == "Resource":
+            target = self._blank()
+            self.triples.append((subject, predicate, target))
+            self.frames.append(("node", target))
+        elif parse_type == "Collection":
+            self.frames.append(("collection", subject, predicate, []))
+        elif parse_type is not None:
+            raise ValueError(f"Unsupported RDF/XML parse type: {parse_type}")
+        elif any(key not in _SYNTAX_ATTRIBUTES and key[0] and key[0] != XML for key in attrs.keys()):
+            # Property attributes on an empty property element describe a blank node
+            target = self._blank()
+            self.triples.append((subject, predicate, target))
+            self._property_attributes(target, attrs)
+            self.frames.append(("skip",))
+        else:
+            self.frames.append(("property", subject, predicate,
+                                {"node": False, "text": [], "datatype": attrs.get((RDF, "datatype"))}))
+
+    def characters(self, content):
+        if self.frames and self.frames[-1][0] == "property":
+            self.frames[-1][3]["text"].append(content)
+
+    def endElementNS(self, name, qname):
+        frame = self.frames.pop()
+        if frame[0] == "property" and not frame[3]["node"]:
+            state = frame[3]
+            self.triples.append((frame[1], frame[2], _literal("".join(state["text"]), state["datatype"],
+                                                              self.langs[-1])))
+        elif frame[0] == "collection":
+            items = frame[3]
+            head = f"<{RDF}nil>"
+            nodes = [self._blank() for _ in items]
+            for i, (node, item) in enumerate(zip(nodes, items)):
+                self.triples.append((node, f"<{RDF}first>", item))
+                self.triples.append((node, f"<{RDF}rest>", nodes[i + 1] if i + 1 < len(nodes) else head))
+            self.triples.append((frame[1], frame[2], nodes[0] if nodes else head))
+        self.bases.pop()
+        self.langs.pop()
+
+
+def read_rdfxml(f, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yield the triples of an RDF/XML document while it is parsed.
+
+    Args:
+        f: A binary file-like object.
+        chunk_size (int): Bytes parsed before the triples found so far are
+            yielded.
+    """
+    handler = _RDFXMLHandler()
+    parser = xml.sax.make_parser()
+    parser.setFeature(feature_namespaces, True)
+    parser.setContentHandler(handler)
+    for chunk in iter(lambda: f.read(chunk_size), b""):
+        parser.feed(chunk)
+        yield from handler.triples
+        handler.triples.clear()
+    parser.close()
+    yield from handler.triples